@@ -91,6 +91,8 @@ class CLI( threading.Thread,Cmd,object ):
         logdir <directory to store logs in>
         testcases <list of testcases separated by comma or range of testcases separated by hypen>
         mail <mail-id or list of mail-ids seperated by comma>
+        profile <all or list of testcases to run under cProfile, separated by comma>
+        trace true, to save a timeline of all the driver calls as a Chrome trace file
         example 1, to execute the examples specified in the ~/examples diretory.
         '''
         args = args.split()
@@ -255,7 +257,7 @@ class CLI( threading.Thread,Cmd,object ):
         try :
             for index, option in enumerate(args):
                 if index > 0 :
-                    if re.match("logdir|mail|example|testdir|testcases|onoscell", option, flags = 0):
+                    if re.match("logdir|mail|example|testdir|testcases|onoscell|profile|trace", option, flags = 0):
                         index = index+1
                         options[option] = args[index]
                         options = self.testcasesInRange(index,option,args,options)
@@ -276,6 +278,8 @@ class CLI( threading.Thread,Cmd,object ):
         options['testdir'] = None
         options['testcases'] = None
         options['onoscell'] = None
+        options['profile'] = None
+        options['trace'] = None
         return options
 
     def testcasesInRange(self,index,option,args,options):
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+'''
+Compares the records several sources have of the same objects, i.e. the
+intents each ONOS node knows, by content hash instead of by text.
+
+Each record is turned into a canonical json string and hashed, each source
+gets a digest of all its ( key, record hash ) pairs, and only the keys whose
+hashes differ between sources are reported.
+
+    TestON is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 2 of the License, or
+    (at your option) any later version.
+
+    TestON is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TestON.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import hashlib
+import json
+
+
+def canonical( record, unordered=False ):
+    '''
+    Returns a canonical json string of the record. If unordered is True the
+    order of the lists in the record is ignored too.
+    '''
+    if unordered:
+        record = sortLists( record )
+    return json.dumps( record, sort_keys=True, separators=( ',', ':' ) )
+
+
+def sortLists( record ):
+    if isinstance( record, dict ):
+        return dict( ( key, sortLists( value ) )
+                     for key, value in record.items() )
+    if isinstance( record, list ):
+        return sorted( ( sortLists( value ) for value in record ),
+                       key=canonical )
+    return record
+
+
+def digest( record, unordered=False ):
+    '''
+    Returns the content hash of the record
+    '''
+    return hashlib.sha1( canonical( record, unordered ) ).hexdigest()
+
+
+class RecordSet( object ):
+    '''
+    The content hash of each record of a source, keyed by the record key
+    '''
+    def __init__( self, records=(), key=None, ignore=(), unordered=False ):
+        '''
+        records - iterable of records
+        key - function returning the key of a record
+        ignore - top level fields left out of the hash, i.e. counters
+        unordered - ignore the order of the lists in the records
+        '''
+        self.ignore = ignore
+        self.unordered = unordered
+        self.digests = {}
+        self.duplicates = []
+        self.setDigest = None
+        for record in records:
+            self.add( key( record ), record )
+
+    def add( self, recordKey, record ):
+        if self.ignore and isinstance( record, dict ):
+            record = dict( ( field, value )
+                           for field, value in record.items()
+                           if field not in self.ignore )
+        if recordKey in self.digests:
+            self.duplicates.append( recordKey )
+        self.digests[ recordKey ] = digest( record, self.unordered )
+        self.setDigest = None
+
+    def __len__( self ):
+        return len( self.digests )
+
+    def digest( self ):
+        '''
+        Returns the hash of the whole set, equal for two sets only if they
+        have the same keys with the same records
+        '''
+        if self.setDigest is None:
+            setHash = hashlib.sha1()
+            for item in sorted( self.digests.items() ):
+                setHash.update( repr( item ) )
+            self.setDigest = setHash.hexdigest()
+        return self.setDigest
+
+
+def compare( recordSets ):
+    '''
+    Compares the record sets of several sources. Returns a dictionary with:
+    'consistent' - True if all the sources have the same records
+    'digests' - the digest of the set of each source
+    'differences' - dictionary of the keys which differ to the list of the
+                    hash of the record of each source, None where a source
+                    does not have the key
+    '''
+    digests = [ recordSet.digest() for recordSet in recordSets ]
+    result = { 'consistent': len( set( digests ) ) <= 1,
+               'digests': digests,
+               'differences': {} }
+    if result[ 'consistent' ]:
+        return result
+    keys = set()
+    for recordSet in recordSets:
+        keys.update( recordSet.digests )
+    for key in keys:
+        hashes = [ recordSet.digests.get( key ) for recordSet in recordSets ]
+        if len( set( hashes ) ) > 1:
+            result[ 'differences' ][ key ] = hashes
+    return result
+
+
+def report( result, names, limit=20 ):
+    '''
+    Returns at most limit lines describing the differences of a compare
+    result, naming the sources with names
+    '''
+    differences = result[ 'differences' ]
+    if result[ 'consistent' ]:
+        return [ "All " + str( len( names ) ) + " sources are consistent" ]
+    lines = [ str( len( differences ) ) + " keys differ between " +
+              ", ".join( names ) ]
+    for key in sorted( differences )[ :limit ]:
+        hashes = differences[ key ]
+        # Group the sources by the version of the record they have
+        versions = {}
+        for name, recordHash in zip( names, hashes ):
+            versions.setdefault( recordHash, [] ).append( name )
+        line = "  " + str( key ) + ": "
+        parts = []
+        for recordHash, sources in versions.items():
+            label = "missing" if recordHash is None else recordHash[ :8 ]
+            parts.append( label + " on " + ",".join( sources ) )
+        lines.append( line + "; ".join( sorted( parts ) ) )
+    if len( differences ) > limit:
+        lines.append( "  ... and " + str( len( differences ) - limit ) +
+                      " more" )
+    return lines
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+DriverTracer wraps the public methods of the component drivers to record
+every driver call: the component, the method, how long it took, the size of
+the response and the exception it raised, if any.
+
+The calls are aggregated into a latency histogram per component method and
+can be saved as a trace file in the Chrome trace event format, which can be
+opened as a timeline in chrome://tracing or https://ui.perfetto.dev
+"""
+import time
+import json
+import types
+import inspect
+import threading
+import functools
+
+
+class DriverTracer( object ):
+
+    # Upper bounds, in seconds, of the latency histogram buckets
+    buckets = [ 0.01, 0.1, 1, 10, 60 ]
+
+    def __init__( self, timer=None ):
+        self.timer = timer
+        self.lock = threading.Lock()
+        self.calls = []
+        self.local = threading.local()
+        self.startTime = time.time()
+
+    def wrapDriver( self, component, driverObject ):
+        """
+        Trace the public methods of the driver object of a component
+        """
+        for name, func in inspect.getmembers( driverObject.__class__,
+                                              inspect.ismethod ):
+            if name.startswith( "_" ) or func.im_self is not None:
+                continue
+            setattr( driverObject, name,
+                     types.MethodType( self.wrapMethod( component, name,
+                                                        func.im_func ),
+                                       driverObject,
+                                       driverObject.__class__ ) )
+
+    def wrapMethod( self, component, name, func ):
+        tracer = self
+
+        @functools.wraps( func )
+        def traced( driverSelf, *args, **kwargs ):
+            return tracer.call( component, name, func,
+                                driverSelf, *args, **kwargs )
+        return traced
+
+    def call( self, component, name, func, *args, **kwargs ):
+        """
+        Calls a driver method and records the call
+        """
+        timerDepth = self.timer.enterDriver() if self.timer else 0
+        depth = getattr( self.local, "depth", 0 )
+        self.local.depth = depth + 1
+        error = None
+        response = None
+        start = time.time()
+        try:
+            response = func( *args, **kwargs )
+            return response
+        except BaseException as e:
+            error = e.__class__.__name__
+            raise
+        finally:
+            duration = time.time() - start
+            self.local.depth = depth
+            if self.timer:
+                self.timer.exitDriver( timerDepth, duration )
+                case, step = self.timer.currentStep()
+            else:
+                case, step = "", ""
+            if isinstance( response, ( basestring, list, dict, tuple ) ):
+                size = len( response )
+            else:
+                size = 0
+            with self.lock:
+                self.calls.append( ( start, duration, component, name,
+                                     depth, threading.current_thread().name,
+                                     size, error, case, step ) )
+
+    def histogram( self ):
+        """
+        Returns a dictionary of "component.method" to the call statistics
+        of that method: count, total, mean, p50, p95 and max latency,
+        number of errors, response bytes and the number of calls in each
+        latency bucket.
+        """
+        with self.lock:
+            calls = list( self.calls )
+        durations = {}
+        stats = {}
+        for call in calls:
+            key = call[ 2 ] + "." + call[ 3 ]
+            durations.setdefault( key, [] ).append( call[ 1 ] )
+            entry = stats.setdefault( key, { "errors": 0, "bytes": 0,
+                                             "buckets": [ 0 ] * ( len( self.buckets ) + 1 ) } )
+            if call[ 7 ]:
+                entry[ "errors" ] += 1
+            entry[ "bytes" ] += call[ 6 ]
+            index = 0
+            while index < len( self.buckets ) and call[ 1 ] >= self.buckets[ index ]:
+                index += 1
+            entry[ "buckets" ][ index ] += 1
+        for key, values in durations.items():
+            values.sort()
+            entry = stats[ key ]
+            entry[ "count" ] = len( values )
+            entry[ "total" ] = sum( values )
+            entry[ "mean" ] = entry[ "total" ] / len( values )
+            entry[ "p50" ] = values[ ( len( values ) - 1 ) / 2 ]
+            entry[ "p95" ] = values[ int( ( len( values ) - 1 ) * 0.95 ) ]
+            entry[ "max" ] = values[ -1 ]
+        return stats
+
+    def report( self ):
+        """
+        Returns the histogram as a text table, slowest methods first
+        """
+        stats = self.histogram()
+        bucketNames = [ "<" + str( bound ) + "s" for bound in self.buckets ] +\
+                      [ ">=" + str( self.buckets[ -1 ] ) + "s" ]
+        header = "%-45s %7s %10s %9s %9s %9s %9s %6s %12s  " % \
+                 ( "Driver call", "count", "total(s)", "mean(s)", "p50(s)",
+                   "p95(s)", "max(s)", "errors", "bytes" ) +\
+                 " ".join( [ "%7s" % name for name in bucketNames ] )
+        lines = [ header, "-" * len( header ) ]
+        for key in sorted( stats, key=lambda k: stats[ k ][ "total" ],
+                           reverse=True ):
+            entry = stats[ key ]
+            lines.append( "%-45s %7d %10.3f %9.3f %9.3f %9.3f %9.3f %6d %12d  " %
+                          ( key, entry[ "count" ], entry[ "total" ],
+                            entry[ "mean" ], entry[ "p50" ], entry[ "p95" ],
+                            entry[ "max" ], entry[ "errors" ],
+                            entry[ "bytes" ] ) +
+                          " ".join( [ "%7d" % count for count in entry[ "buckets" ] ] ) )
+        return "\n".join( lines ) + "\n"
+
+    def writeReport( self, fileName ):
+        reportFile = open( fileName, "w" )
+        reportFile.write( self.report() )
+        reportFile.close()
+
+    def writeTrace( self, fileName ):
+        """
+        Write the calls as a Chrome trace event file, one timeline row per
+        component, with nested driver calls shown inside their caller
+        """
+        with self.lock:
+            calls = list( self.calls )
+        events = []
+        for call in calls:
+            start, duration, component, name, depth, thread, size, error, case, step = call
+            events.append( { "name": name,
+                             "cat": component,
+                             "ph": "X",
+                             "ts": int( ( start - self.startTime ) * 1000000 ),
+                             "dur": int( duration * 1000000 ),
+                             "pid": component,
+                             "tid": thread,
+                             "args": { "size": size, "error": error,
+                                       "depth": depth,
+                                       "step": str( case ) + "." + str( step ) } } )
+        traceFile = open( fileName, "w" )
+        json.dump( { "traceEvents": events, "displayTimeUnit": "ms" },
+                   traceFile )
+        traceFile.close()
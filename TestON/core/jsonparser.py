@@ -21,7 +21,12 @@ Created on 07-Jan-2013
 
 '''
 
+import collections
+import hashlib
 import json
+import re
+import threading
+
 class JsonParser:
     '''
     Module that parses the response Json to Dictionary and Vice versa.
@@ -53,3 +58,100 @@ class JsonParser:
             main.log.error("Json Parser is unable to parse the string")
         return json_response
     '''
+
+
+whitespace = re.compile(r'[ \t\n\r]*')
+
+def iterArray(jsonString, key=None):
+    '''
+     Yields the elements of a json array one at a time, so a big document
+     like the flows of a large network is never held as one parsed object.
+     If key is given, the array is the value of that key in the top level
+     object, like the 'flows' of the ONOS REST api.
+    '''
+    decoder = json.JSONDecoder()
+    index = whitespace.match(jsonString, 0).end()
+    if key is not None:
+        if jsonString[index:index + 1] != '{':
+            raise ValueError("Expecting a json object at " + str(index))
+        index = whitespace.match(jsonString, index + 1).end()
+        while True:
+            if jsonString[index:index + 1] == '}':
+                return
+            name, index = decoder.raw_decode(jsonString, index)
+            index = whitespace.match(jsonString, index).end()
+            if jsonString[index:index + 1] != ':':
+                raise ValueError("Expecting : at " + str(index))
+            index = whitespace.match(jsonString, index + 1).end()
+            if name == key:
+                break
+            # Skip the values of the other keys
+            value, index = decoder.raw_decode(jsonString, index)
+            index = whitespace.match(jsonString, index).end()
+            if jsonString[index:index + 1] == ',':
+                index = whitespace.match(jsonString, index + 1).end()
+    if jsonString[index:index + 1] != '[':
+        raise ValueError("Expecting a json array at " + str(index))
+    index = whitespace.match(jsonString, index + 1).end()
+    if jsonString[index:index + 1] == ']':
+        return
+    while True:
+        value, index = decoder.raw_decode(jsonString, index)
+        yield value
+        index = whitespace.match(jsonString, index).end()
+        if jsonString[index:index + 1] == ']':
+            return
+        if jsonString[index:index + 1] != ',':
+            raise ValueError("Expecting , or ] at " + str(index))
+        index = whitespace.match(jsonString, index + 1).end()
+
+class JsonMemo:
+    '''
+     Keeps the results of the last parsed documents, keyed by a digest of
+     the raw string and the parse function, so parsing the same output
+     again is free. Only the digest of the raw string is kept. Each driver
+     has its own memo, see driverMemo, and the parsed objects it returns
+     are shared with the other callers of that driver and must not be
+     changed.
+    '''
+    def __init__(self, size=4):
+        self.size = size
+        self.lock = threading.Lock()
+        self.cache = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def parse(self, raw, parse=json.loads):
+        '''
+         Returns parse(raw), from the memo if raw was parsed with the same
+         function recently
+        '''
+        if isinstance(raw, unicode):
+            digest = hashlib.sha1(raw.encode('utf-8')).digest()
+        else:
+            digest = hashlib.sha1(raw).digest()
+        key = (digest, len(raw), parse)
+        with self.lock:
+            if key in self.cache:
+                self.hits += 1
+                value = self.cache.pop(key)
+                self.cache[key] = value
+                return value
+        value = parse(raw)
+        with self.lock:
+            self.misses += 1
+            self.cache[key] = value
+            while len(self.cache) > self.size:
+                self.cache.popitem(last=False)
+        return value
+
+def driverMemo(driver):
+    '''
+     Returns the JsonMemo of a driver, creating it on the first call
+    '''
+    # Not getattr, the drivers answer any missing attribute
+    memo = vars(driver).get('jsonMemo')
+    if memo is None:
+        memo = JsonMemo()
+        driver.jsonMemo = memo
+    return memo
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+'''
+Statistics of the latency measurements of the SCPF tests.
+
+The tests store each measurement in a ( node x iteration ) matrix, made by
+emptyMatrix, leaving the measurements they could not take as NaN. summarize
+drops the warm-up iterations, the invalid samples, the samples out of the
+thresholds and optionally the outliers of each node, then computes the
+statistics of each node and of all the nodes together in one pass over the
+matrix:
+
+    endToEnd = latencystats.emptyMatrix( clusterCount, numIter )
+    ...
+    endToEnd[ node ][ i ] = graphTimestamp - t0Tcp
+    ...
+    record = latencystats.summarize( "endToEnd", endToEnd, warmUp=2,
+                                     lower=0, upper=1000 )
+    for line in latencystats.summaryLines( record ):
+        main.log.report( line )
+
+The record is a dictionary with the 'name', the 'unit', the 'filter' used,
+the statistics of all the samples and the list of the statistics of each
+node under 'nodes'. The statistics are:
+    'count' - number of samples kept
+    'discarded' - number of samples dropped as { 'warmUp', 'invalid',
+                  'threshold', 'outlier' }
+    'mean', 'median', 'p95', 'p99', 'min', 'max'
+    'std' - population standard deviation, like numpy.std
+    'ciLow', 'ciHigh' - confidence interval of the mean, from the Student t
+                        distribution with the sample standard deviation
+Statistics of no samples are NaN.
+
+    TestON is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 2 of the License, or
+    (at your option) any later version.
+
+    TestON is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TestON.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import warnings
+
+import numpy
+
+try:
+    from scipy import stats as scipyStats
+except ImportError:
+    scipyStats = None
+
+# Two sided critical values of the Student t distribution for 1 to 30
+# degrees of freedom, used when scipy is not installed
+tTable = {
+    0.90: ( 6.314, 2.920, 2.353, 2.132, 2.015, 1.943, 1.895, 1.860, 1.833,
+            1.812, 1.796, 1.782, 1.771, 1.761, 1.753, 1.746, 1.740, 1.734,
+            1.729, 1.725, 1.721, 1.717, 1.714, 1.711, 1.708, 1.706, 1.703,
+            1.701, 1.699, 1.697 ),
+    0.95: ( 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+            2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101,
+            2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052,
+            2.048, 2.045, 2.042 ),
+    0.99: ( 63.657, 9.925, 5.841, 4.604, 4.032, 3.707, 3.499, 3.355, 3.250,
+            3.169, 3.106, 3.055, 3.012, 2.977, 2.947, 2.921, 2.898, 2.878,
+            2.861, 2.845, 2.831, 2.819, 2.807, 2.797, 2.787, 2.779, 2.771,
+            2.763, 2.756, 2.750 ) }
+# Normal distribution values for more than 30 degrees of freedom
+zTable = { 0.90: 1.645, 0.95: 1.960, 0.99: 2.576 }
+
+statKeys = ( 'count', 'mean', 'median', 'p95', 'p99', 'min', 'max', 'std',
+             'ciLow', 'ciHigh' )
+
+
+def emptyMatrix( nodes, iterations ):
+    '''
+    Returns a ( nodes x iterations ) matrix of NaN, the measurements which
+    are not set are ignored by summarize
+    '''
+    return numpy.full( ( int( nodes ), int( iterations ) ), numpy.nan )
+
+
+def tCritical( degrees, confidence ):
+    '''
+    Returns the two sided Student t critical values for an array of degrees
+    of freedom, NaN where there are no degrees of freedom
+    '''
+    degrees = numpy.asarray( degrees, dtype=float )
+    valid = degrees > 0
+    if scipyStats is not None:
+        values = scipyStats.t.ppf( 0.5 + confidence / 2.0,
+                                   numpy.where( valid, degrees, 1 ) )
+    elif confidence in tTable:
+        table = numpy.array( tTable[ confidence ] + ( zTable[ confidence ], ) )
+        index = numpy.clip( degrees, 1, len( table ) ).astype( int ) - 1
+        values = table[ index ]
+    else:
+        raise ValueError( "Confidence " + str( confidence ) + " needs scipy, " +
+                          "use one of " + str( sorted( tTable ) ) )
+    return numpy.where( valid, values, numpy.nan )
+
+
+def filterSamples( samples, warmUp=0, lower=None, upper=None, outliers=None,
+                   outlierFactor=None ):
+    '''
+    Returns the ( node x iteration ) matrix of the samples with the dropped
+    ones set to NaN, and the dictionary of the number of samples dropped by
+    each rule.
+
+    Optional:
+        warmUp - number of iterations to drop at the start of each node
+        lower, upper - samples are kept if lower <= sample < upper
+        outliers - outlier rule applied to each node, None, or:
+            'iqr' - drop samples more than outlierFactor ( 1.5 ) times the
+                    inter-quartile range out of the quartiles
+            'mad' - drop samples whose distance to the median is more than
+                    outlierFactor ( 3.5 ) times the scaled median absolute
+                    deviation
+            'sigma' - drop samples more than outlierFactor ( 3 ) standard
+                      deviations away from the mean
+    A one dimensional list of samples is treated as a single node.
+    '''
+    data = numpy.array( samples, dtype=float, ndmin=2 )
+    discarded = {}
+    discarded[ 'warmUp' ] = int( numpy.count_nonzero(
+        ~numpy.isnan( data[ :, :warmUp ] ) ) )
+    data[ :, :warmUp ] = numpy.nan
+    invalid = ~numpy.isfinite( data ) & ~numpy.isnan( data )
+    discarded[ 'invalid' ] = int( numpy.count_nonzero( invalid ) )
+    data[ invalid ] = numpy.nan
+    with numpy.errstate( invalid='ignore' ):
+        out = numpy.zeros( data.shape, dtype=bool )
+        if lower is not None:
+            out |= data < lower
+        if upper is not None:
+            out |= data >= upper
+    discarded[ 'threshold' ] = int( numpy.count_nonzero( out ) )
+    data[ out ] = numpy.nan
+
+    with warnings.catch_warnings():
+        warnings.simplefilter( "ignore", RuntimeWarning )
+        with numpy.errstate( invalid='ignore' ):
+            if outliers is None:
+                out = numpy.zeros( data.shape, dtype=bool )
+            elif outliers == 'iqr':
+                factor = 1.5 if outlierFactor is None else outlierFactor
+                q1, q3 = numpy.nanpercentile( data, [ 25, 75 ], axis=1,
+                                              keepdims=True )
+                out = ( data < q1 - factor * ( q3 - q1 ) ) |\
+                      ( data > q3 + factor * ( q3 - q1 ) )
+            elif outliers == 'mad':
+                factor = 3.5 if outlierFactor is None else outlierFactor
+                median = numpy.nanmedian( data, axis=1, keepdims=True )
+                mad = 1.4826 * numpy.nanmedian( numpy.abs( data - median ),
+                                                axis=1, keepdims=True )
+                out = ( numpy.abs( data - median ) > factor * mad ) &\
+                      ( mad > 0 )
+            elif outliers == 'sigma':
+                factor = 3.0 if outlierFactor is None else outlierFactor
+                mean = numpy.nanmean( data, axis=1, keepdims=True )
+                std = numpy.nanstd( data, axis=1, keepdims=True )
+                out = numpy.abs( data - mean ) > factor * std
+            else:
+                raise ValueError( "Unknown outlier rule " + str( outliers ) )
+    discarded[ 'outlier' ] = int( numpy.count_nonzero( out ) )
+    data[ out ] = numpy.nan
+    return data, discarded
+
+
+def rowStats( data, confidence ):
+    '''
+    Returns a dictionary of statKeys to the arrays of the statistics of
+    each row of a matrix with NaN for the missing samples
+    '''
+    with warnings.catch_warnings():
+        warnings.simplefilter( "ignore", RuntimeWarning )
+        with numpy.errstate( invalid='ignore', divide='ignore' ):
+            count = numpy.count_nonzero( ~numpy.isnan( data ), axis=1 )
+            mean = numpy.nanmean( data, axis=1 )
+            p50, p95, p99 = numpy.nanpercentile( data, [ 50, 95, 99 ], axis=1 )
+            sampleStd = numpy.nanstd( data, axis=1, ddof=1 )
+            margin = tCritical( count - 1, confidence ) * sampleStd /\
+                numpy.sqrt( count )
+            return { 'count': count,
+                     'mean': mean,
+                     'median': p50,
+                     'p95': p95,
+                     'p99': p99,
+                     'min': numpy.nanmin( data, axis=1 ),
+                     'max': numpy.nanmax( data, axis=1 ),
+                     'std': numpy.nanstd( data, axis=1 ),
+                     'ciLow': mean - margin,
+                     'ciHigh': mean + margin }
+
+
+def summarize( name, samples, warmUp=0, lower=None, upper=None, outliers=None,
+               outlierFactor=None, confidence=0.95, unit="ms" ):
+    '''
+    Returns the result record of a ( node x iteration ) matrix of latency
+    samples, see the module documentation. The samples are filtered by
+    filterSamples with the given warmUp, lower, upper, outliers and
+    outlierFactor. confidence is the level of the confidence interval of
+    the mean, 0.90, 0.95 or 0.99 unless scipy is installed.
+    '''
+    data, discarded = filterSamples( samples, warmUp=warmUp, lower=lower,
+                                     upper=upper, outliers=outliers,
+                                     outlierFactor=outlierFactor )
+    # Statistics of each node, then of all the samples as a single row
+    stats = rowStats( data, confidence ) if data.size else None
+    total = rowStats( data.reshape( 1, -1 ), confidence ) if data.size \
+        else None
+
+    def statRecord( values, index ):
+        result = {}
+        for key in statKeys:
+            if values is None:
+                result[ key ] = 0 if key == 'count' else float( 'nan' )
+            elif key == 'count':
+                result[ key ] = int( values[ key ][ index ] )
+            else:
+                result[ key ] = float( values[ key ][ index ] )
+        return result
+
+    record = statRecord( total, 0 )
+    record[ 'name' ] = name
+    record[ 'unit' ] = unit
+    record[ 'discarded' ] = discarded
+    record[ 'filter' ] = { 'warmUp': warmUp, 'lower': lower, 'upper': upper,
+                           'outliers': outliers,
+                           'outlierFactor': outlierFactor,
+                           'confidence': confidence }
+    record[ 'nodes' ] = [ statRecord( stats, node )
+                          for node in range( data.shape[ 0 ] ) ]
+    return record
+
+
+def summaryLines( record, nodes=True ):
+    '''
+    Returns the lines reporting a result record, with a line for each node
+    if there are several nodes and nodes is True
+    '''
+    def statLine( stats ):
+        return "mean " + str( round( stats[ 'mean' ], 2 ) ) +\
+               ", median " + str( round( stats[ 'median' ], 2 ) ) +\
+               ", p95 " + str( round( stats[ 'p95' ], 2 ) ) +\
+               ", p99 " + str( round( stats[ 'p99' ], 2 ) ) +\
+               ", std " + str( round( stats[ 'std' ], 2 ) ) +\
+               ", " + str( int( record[ 'filter' ][ 'confidence' ] * 100 ) ) +\
+               "% CI [" + str( round( stats[ 'ciLow' ], 2 ) ) + ", " +\
+               str( round( stats[ 'ciHigh' ], 2 ) ) + "] " + record[ 'unit' ] +\
+               " of " + str( stats[ 'count' ] ) + " samples"
+
+    discarded = record[ 'discarded' ]
+    lines = [ record[ 'name' ] + ": " + statLine( record ) + " ( dropped " +
+              str( discarded[ 'warmUp' ] ) + " warm-up, " +
+              str( discarded[ 'invalid' ] ) + " invalid, " +
+              str( discarded[ 'threshold' ] ) + " out of threshold, " +
+              str( discarded[ 'outlier' ] ) + " outliers )" ]
+    if nodes and len( record[ 'nodes' ] ) > 1:
+        for node, stats in enumerate( record[ 'nodes' ] ):
+            lines.append( "    node " + str( node + 1 ) + ": " +
+                          statLine( stats ) )
+    return lines
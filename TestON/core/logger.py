@@ -24,6 +24,162 @@ import logging
 import datetime
 import re
 import os
+import time
+import threading
+import Queue
+import atexit
+
+
+class LogWriter:
+    '''
+        Writes log messages to files from a single background thread.
+
+        Messages are queued by write() and appended to the target file by
+        the writer thread, which keeps one buffered handle per file open.
+        Handles are flushed at least every flushInterval seconds, when the
+        queue goes idle, on flush() and on close(). The queue is bounded,
+        write() blocks if the writer falls behind by more than maxQueue messages.
+    '''
+    def __init__( self, maxQueue=10000, flushInterval=1 ):
+        self.queue = Queue.Queue( maxQueue )
+        self.flushInterval = flushInterval
+        self.handles = {}
+        self.running = True
+        self.lock = threading.Lock()
+        self.messages = 0
+        self.bytes = 0
+        self.ioTime = 0.0
+        self.queueTime = 0.0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread( target=self._run, name="LogWriter" )
+        self.thread.daemon = True
+        self.thread.start()
+        atexit.register( self.close )
+
+    def write( self, fileName, msg ):
+        '''
+            Queue msg to be appended to fileName.
+        '''
+        start = time.time()
+        if self.running:
+            self.queue.put( ( fileName, msg ) )
+        else:
+            # The writer was closed, fall back to writing directly
+            with self.lock:
+                logfile = open( fileName, "a" )
+                logfile.write( msg )
+                logfile.close()
+        self.queueTime += time.time() - start
+
+    def _run( self ):
+        lastFlush = time.time()
+        while self.running:
+            # A busy queue is flushed every flushInterval seconds too
+            if time.time() - lastFlush >= self.flushInterval:
+                self._flushHandles()
+                lastFlush = time.time()
+            try:
+                item = self.queue.get( True, self.flushInterval )
+            except Queue.Empty:
+                self._flushHandles()
+                lastFlush = time.time()
+                continue
+            try:
+                if item is None:
+                    self._flushHandles()
+                    lastFlush = time.time()
+                    continue
+                fileName, msg = item
+                start = time.time()
+                with self.lock:
+                    handle = self.handles.get( fileName )
+                    if handle is None:
+                        handle = open( fileName, "a" )
+                        self.handles[ fileName ] = handle
+                    handle.write( msg )
+                self.ioTime += time.time() - start
+                self.messages += 1
+                self.bytes += len( msg )
+            except Exception as e:
+                print "LogWriter: could not write to " + str( item[ 0 ] ) + ": " + str( e )
+            finally:
+                self.queue.task_done()
+        self.stopped.set()
+
+    def _flushHandles( self ):
+        start = time.time()
+        with self.lock:
+            for handle in self.handles.values():
+                handle.flush()
+        self.ioTime += time.time() - start
+
+    def flush( self ):
+        '''
+            Block until all queued messages are written and flushed.
+        '''
+        if self.running and not self.stopped.isSet():
+            self.queue.put( None )
+            self.queue.join()
+
+    def close( self ):
+        '''
+            Write out all queued messages and close the file handles.
+            Messages written after this are written directly to the files.
+        '''
+        if not self.running:
+            return
+        self.flush()
+        self.running = False
+        # Wake up the writer thread so it sees it was stopped
+        self.queue.put( None )
+        self.stopped.wait( self.flushInterval * 2 )
+        with self.lock:
+            # Anything queued while stopping is written here
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except Queue.Empty:
+                    break
+                if item:
+                    handle = self.handles.get( item[ 0 ] )
+                    if handle is None:
+                        handle = open( item[ 0 ], "a" )
+                        self.handles[ item[ 0 ] ] = handle
+                    handle.write( item[ 1 ] )
+            for handle in self.handles.values():
+                handle.close()
+            self.handles = {}
+
+    def stats( self ):
+        '''
+            Returns the number of messages and bytes written, the seconds
+            spent in file I/O by the writer thread and the seconds callers
+            spent queueing messages.
+        '''
+        return { "messages": self.messages,
+                 "bytes": self.bytes,
+                 "ioTime": self.ioTime,
+                 "queueTime": self.queueTime }
+
+
+class LogWriterHandler( logging.Handler ):
+    '''
+        logging handler which appends the formatted records to a file
+        through a LogWriter, keeping them in order with the other messages
+        written to the same file.
+    '''
+    def __init__( self, writer, fileName ):
+        logging.Handler.__init__( self )
+        self.writer = writer
+        self.baseFilename = os.path.abspath( fileName )
+
+    def emit( self, record ):
+        try:
+            self.writer.write( self.baseFilename, self.format( record ) + "\n" )
+        except Exception:
+            self.handleError( record )
+
+
 class Logger:
     '''
         Add continuous logs and reports of the test.
@@ -120,6 +276,9 @@ class Logger:
         main.WikiFileName = main.logdir + "/" + main.TEST + "Wiki.txt"
         main.SummaryFileName = main.logdir + "/" + main.TEST + "Summary.txt"
         main.JenkinsCSV = main.logdir + "/" + main.TEST + ".csv"
+        main.TimingCSV = main.logdir + "/" + main.TEST + "Timing.csv"
+        main.DriverCallsFile = main.logdir + "/" + main.TEST + "DriverCalls.txt"
+        main.TraceFile = main.logdir + "/" + main.TEST + "Trace.json"
 
         #### Add log-level - Report
         logging.addLevelName(9, "REPORT")
@@ -136,9 +295,7 @@ class Logger:
             currentTime = currentTime.strftime("%d %b %Y %H:%M:%S")
             newmsg = "\n[REPORT] " +"["+ str(currentTime)+"] "+msg
             print newmsg
-            main.reportFile = open(main.ReportFileName,"a+")
-            main.reportFile.write(newmsg)
-            main.reportFile.close()
+            main.logWriter.write(main.ReportFileName, newmsg)
 
         main.log.report = report
 
@@ -146,10 +303,12 @@ class Logger:
             '''
                 Will append the message to the txt file for the summary.
             '''
+            if main.caseOutput is not None:
+                # Test case running in parallel, written when it ends
+                main.caseOutput.append( ( summary, msg ) )
+                return
             main.log._log(6,msg,"OpenFlowAutoMattion","OFAutoMation")
-            main.summaryFile = open(main.SummaryFileName,"a+")
-            main.summaryFile.write(msg+"\n")
-            main.summaryFile.close()
+            main.logWriter.write(main.SummaryFileName, msg+"\n")
 
         main.log.summary = summary
 
@@ -157,10 +316,12 @@ class Logger:
             '''
                 Will append the message to the txt file for the wiki.
             '''
+            if main.caseOutput is not None:
+                # Test case running in parallel, written when it ends
+                main.caseOutput.append( ( wiki, msg ) )
+                return
             main.log._log(6,msg,"OpenFlowAutoMattion","OFAutoMation")
-            main.wikiFile = open(main.WikiFileName,"a+")
-            main.wikiFile.write(msg+"\n")
-            main.wikiFile.close()
+            main.logWriter.write(main.WikiFileName, msg+"\n")
 
         main.log.wiki = wiki
 
@@ -169,12 +330,8 @@ class Logger:
                Will append the raw formatted message to the logs
             '''
             main.log._log(7,exmsg,"OpenFlowAutoMattion","OFAutoMation")
-            main.reportFile = open(main.ReportFileName,"a+")
-            main.reportFile.write(exmsg)
-            main.reportFile.close()
-            logfile = open(main.LogFileName,"a")
-            logfile.write("\n"+ str(exmsg) +"\n")
-            logfile.close()
+            main.logWriter.write(main.ReportFileName, exmsg)
+            main.logWriter.write(main.LogFileName, "\n"+ str(exmsg) +"\n")
             print exmsg
 
         main.log.exact = exact
@@ -186,9 +343,7 @@ class Logger:
             main.log._log(9,msg,"OpenFlowAutoMattion","OFAutoMation")
             currentTime = datetime.datetime.now()
             newmsg = "["+str(currentTime)+"] " + "["+main.TEST+"] " + "[CASE] " +msg
-            logfile = open(main.LogFileName,"a")
-            logfile.write("\n"+ str(newmsg) +"\n")
-            logfile.close()
+            main.logWriter.write(main.LogFileName, "\n"+ str(newmsg) +"\n")
             print newmsg
 
         main.log.case = case
@@ -200,15 +355,15 @@ class Logger:
             main.log._log(9,msg,"OpenFlowAutoMattion","OFAutoMation")
             currentTime = datetime.datetime.now()
             newmsg = "["+str(currentTime)+"] " + "["+main.TEST+"] " + "[STEP] " +msg
-            logfile = open(main.LogFileName,"a")
-            logfile.write("\n"+ str(newmsg) +"\n")
-            logfile.close()
+            main.logWriter.write(main.LogFileName, "\n"+ str(newmsg) +"\n")
             print newmsg
 
         main.log.step = step
 
-        main.LogFileHandler = logging.FileHandler(main.LogFileName)
         self._printHeader(main)
+        # All the log files are written by one background thread
+        main.logWriter = LogWriter()
+        main.LogFileHandler = LogWriterHandler(main.logWriter, main.LogFileName)
 
         ### initializing logging module and settig log level
         main.log.setLevel(logging.INFO)
@@ -255,6 +410,21 @@ class Logger:
         main.log.addHandler(main.ConsoleHandler)
         main.log.addHandler(main.LogFileHandler)
 
+    def connectSummary(self,main):
+        '''
+            Append the time taken to connect each component to the log header.
+        '''
+        logmsg = "\n"+" " * 29+"+-----------------+\n" +"-" * 27+" { Component Connect }  "+"-" * 27+"\n" +" " * 29+"+-----------------+\n"
+        ordered = sorted( main.componentConnectTime.keys(),
+                          key=lambda component: eval( str( main.componentDictionary[component]['connect_order'] ) ) )
+        for component in ordered:
+            logmsg = logmsg + "\n\t" + component + " (connect_order " +\
+                     str( main.componentDictionary[component]['connect_order'] ) + ") : " +\
+                     str( round( main.componentConnectTime[component], 3 ) ) + " seconds"
+        logmsg = logmsg + "\n"+"-" * 60+"\n"
+        main.logHeader = main.logHeader + logmsg
+        main.log.exact(logmsg)
+
     def testSummary(self,main):
         '''
             testSummary will take care about the Summary of test.
@@ -281,6 +451,20 @@ class Logger:
         testResult =  testResult + "\n Total No Result      : " + str(main.TOTAL_TC_NORESULT)
         testResult =  testResult + "\n Success Percentage   : " + str(main.TOTAL_TC_SUCCESS) + "%"
         testResult =  testResult + "\n Execution Result     : " + str(main.TOTAL_TC_EXECPERCENT) + "%"
+        slowest = main.timer.slowestSteps()
+        if slowest:
+            testResult =  testResult + "\n Slowest Steps        : "
+            for record in slowest:
+                testResult =  testResult + "\n\t" + record['case'] + "." + record['step'] + " " +\
+                              str(record['name']) + " - " + main.timer.format(record)
+        driverCalls = main.tracer.histogram()
+        if driverCalls:
+            testResult =  testResult + "\n Slowest Driver Calls : "
+            for key in sorted( driverCalls, key=lambda k: driverCalls[k]['total'], reverse=True )[:5]:
+                testResult =  testResult + "\n\t" + key + " - " + str(driverCalls[key]['count']) + " calls, " +\
+                              "%.3fs total, %.3fs mean, %.3fs max" % ( driverCalls[key]['total'],
+                                                                      driverCalls[key]['mean'],
+                                                                      driverCalls[key]['max'] )
 
         #main.log.report(testResult)
         main.testResult = testResult
@@ -293,6 +477,13 @@ class Logger:
         logfile.write(",".join( [str(int(main.TOTAL_TC_FAIL)), str(int(main.TOTAL_TC_PASS)), str(int(main.TOTAL_TC_PLANNED))] ))
         logfile.close()
 
+        # Per case and per step timing
+        main.timer.writeCSV(main.TimingCSV)
+        # Driver call latencies
+        main.tracer.writeReport(main.DriverCallsFile)
+        if main.traceDriverCalls:
+            main.tracer.writeTrace(main.TraceFile)
+
     def updateCaseResults(self,main):
         '''
             Update the case result based on the steps execution and asserting each step in the test-case
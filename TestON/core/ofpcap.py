@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+'''
+Streaming decoder of OpenFlow control traffic in pcap and pcapng captures.
+
+The latency tests capture the control channel once per iteration with
+OnosDriver.tsharkPcap and read the timestamps of the TCP handshake and
+teardown and of the OpenFlow messages from the file in one pass, instead
+of grepping the text output of several tshark processes:
+
+    times = ofpcap.eventTimes( "/tmp/switch_lat.pcap", ofPort=6633 )
+    t0 = times[ 'SYN' ][ 0 ]
+    roleReply = times[ 'ROLE_REPLY' ][ -1 ]
+
+    TestON is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 2 of the License, or
+    (at your option) any later version.
+
+    TestON is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TestON.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import socket
+import struct
+
+# OpenFlow message types common to all versions
+ofTypes = { 0: 'HELLO', 1: 'ERROR', 2: 'ECHO_REQUEST', 3: 'ECHO_REPLY',
+            4: 'EXPERIMENTER', 5: 'FEATURES_REQUEST', 6: 'FEATURES_REPLY',
+            7: 'GET_CONFIG_REQUEST', 8: 'GET_CONFIG_REPLY', 9: 'SET_CONFIG',
+            10: 'PACKET_IN', 11: 'FLOW_REMOVED', 12: 'PORT_STATUS',
+            13: 'PACKET_OUT', 14: 'FLOW_MOD' }
+# OpenFlow 1.0 only
+of10Types = { 15: 'PORT_MOD', 16: 'STATS_REQUEST', 17: 'STATS_REPLY',
+              18: 'BARRIER_REQUEST', 19: 'BARRIER_REPLY',
+              20: 'QUEUE_GET_CONFIG_REQUEST', 21: 'QUEUE_GET_CONFIG_REPLY' }
+# OpenFlow 1.3 and later
+of13Types = { 15: 'GROUP_MOD', 16: 'PORT_MOD', 17: 'TABLE_MOD',
+              18: 'MULTIPART_REQUEST', 19: 'MULTIPART_REPLY',
+              20: 'BARRIER_REQUEST', 21: 'BARRIER_REPLY',
+              22: 'QUEUE_GET_CONFIG_REQUEST', 23: 'QUEUE_GET_CONFIG_REPLY',
+              24: 'ROLE_REQUEST', 25: 'ROLE_REPLY', 26: 'GET_ASYNC_REQUEST',
+              27: 'GET_ASYNC_REPLY', 28: 'SET_ASYNC', 29: 'METER_MOD' }
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_ACK = 0x10
+
+
+def ofTypeName( version, msgType ):
+    if msgType in ofTypes:
+        return ofTypes[ msgType ]
+    names = of10Types if version == 1 else of13Types
+    return names.get( msgType, 'TYPE_' + str( msgType ) )
+
+
+def iterPcap( fileName ):
+    '''
+    Yields the ( timestamp in seconds, link type, frame ) of each packet of
+    a pcap or pcapng file. Stops quietly at a truncated last packet, i.e.
+    when the capture was killed.
+    '''
+    f = open( fileName, 'rb' )
+    try:
+        magic = f.read( 4 )
+        if magic == '\x0a\x0d\x0d\x0a':
+            for packet in iterPcapng( f, magic ):
+                yield packet
+            return
+        if magic in ( '\xa1\xb2\xc3\xd4', '\xa1\xb2\x3c\x4d' ):
+            endian = '>'
+        elif magic in ( '\xd4\xc3\xb2\xa1', '\x4d\x3c\xb2\xa1' ):
+            endian = '<'
+        else:
+            raise ValueError( fileName + " is not a pcap file" )
+        resolution = 1e-9 if magic in ( '\xa1\xb2\x3c\x4d',
+                                        '\x4d\x3c\xb2\xa1' ) else 1e-6
+        header = f.read( 20 )
+        if len( header ) < 20:
+            return
+        linkType = struct.unpack( endian + 'HHiIII', header )[ 5 ] & 0xffff
+        recordHeader = struct.Struct( endian + 'IIII' )
+        while True:
+            record = f.read( 16 )
+            if len( record ) < 16:
+                return
+            seconds, fraction, length, origLength = recordHeader.unpack( record )
+            frame = f.read( length )
+            if len( frame ) < length:
+                return
+            yield ( seconds + fraction * resolution, linkType, frame )
+    finally:
+        f.close()
+
+
+def iterPcapng( f, magic ):
+    '''
+    Yields the packets of the enhanced packet blocks of a pcapng file, the
+    section header block type having been read already. Simple packet
+    blocks have no timestamp and are skipped, tshark does not write them.
+    '''
+    endian = '<'
+    interfaces = []
+    blockType = magic
+    while True:
+        if blockType is None:
+            blockType = f.read( 4 )
+        if len( blockType ) < 4:
+            return
+        if blockType == '\x0a\x0d\x0d\x0a':
+            # Section header, the byte order magic gives the endianness
+            lengthBytes = f.read( 4 )
+            byteOrder = f.read( 4 )
+            if len( byteOrder ) < 4:
+                return
+            endian = '<' if byteOrder == '\x4d\x3c\x2b\x1a' else '>'
+            length = struct.unpack( endian + 'I', lengthBytes )[ 0 ]
+            body = f.read( length - 12 )
+            interfaces = []
+            blockType = None
+            continue
+        code = struct.unpack( endian + 'I', blockType )[ 0 ]
+        lengthBytes = f.read( 4 )
+        if len( lengthBytes ) < 4:
+            return
+        length = struct.unpack( endian + 'I', lengthBytes )[ 0 ]
+        body = f.read( length - 8 )
+        blockType = None
+        if len( body ) < length - 8:
+            return
+        if code == 1:
+            # Interface description, the if_tsresol option sets the
+            # timestamp resolution
+            linkType = struct.unpack( endian + 'H', body[ 0:2 ] )[ 0 ]
+            resolution = 1e-6
+            offset = 8
+            while offset + 4 <= len( body ) - 4:
+                optCode, optLength = struct.unpack( endian + 'HH',
+                                                    body[ offset:offset + 4 ] )
+                if optCode == 0:
+                    break
+                if optCode == 9 and optLength >= 1:
+                    value = ord( body[ offset + 4 ] )
+                    if value & 0x80:
+                        resolution = 2.0 ** -( value & 0x7f )
+                    else:
+                        resolution = 10.0 ** -value
+                offset += 4 + ( ( optLength + 3 ) & ~3 )
+            interfaces.append( ( linkType, resolution ) )
+        elif code == 6:
+            # Enhanced packet
+            interface, high, low, capLength = struct.unpack(
+                endian + 'IIII', body[ 0:16 ] )
+            linkType, resolution = interfaces[ interface ]
+            timestamp = ( ( high << 32 ) | low ) * resolution
+            yield ( timestamp, linkType, body[ 20:20 + capLength ] )
+
+
+def decodeTcp( linkType, frame ):
+    '''
+    Returns ( src ip, src port, dst ip, dst port, seq, ack, flags, payload )
+    of a TCP segment, or None if the frame is not TCP
+    '''
+    if linkType == 1:
+        # Ethernet, skipping VLAN tags
+        offset = 12
+        etherType = struct.unpack( '>H', frame[ offset:offset + 2 ] )[ 0 ]
+        while etherType in ( 0x8100, 0x88a8 ):
+            offset += 4
+            etherType = struct.unpack( '>H', frame[ offset:offset + 2 ] )[ 0 ]
+        offset += 2
+    elif linkType == 113:
+        # Linux cooked capture, i.e. tshark -i any
+        etherType = struct.unpack( '>H', frame[ 14:16 ] )[ 0 ]
+        offset = 16
+    elif linkType == 101:
+        # Raw IP
+        etherType = 0x0800 if ord( frame[ 0 ] ) >> 4 == 4 else 0x86dd
+        offset = 0
+    else:
+        return None
+    if etherType == 0x0800:
+        headerLength = ( ord( frame[ offset ] ) & 0x0f ) * 4
+        totalLength = struct.unpack( '>H', frame[ offset + 2:offset + 4 ] )[ 0 ]
+        if ord( frame[ offset + 9 ] ) != 6:
+            return None
+        src = socket.inet_ntoa( frame[ offset + 12:offset + 16 ] )
+        dst = socket.inet_ntoa( frame[ offset + 16:offset + 20 ] )
+        end = offset + totalLength
+        offset += headerLength
+    elif etherType == 0x86dd:
+        payloadLength = struct.unpack( '>H', frame[ offset + 4:offset + 6 ] )[ 0 ]
+        if ord( frame[ offset + 6 ] ) != 6:
+            return None
+        src = frame[ offset + 8:offset + 24 ].encode( 'hex' )
+        dst = frame[ offset + 24:offset + 40 ].encode( 'hex' )
+        offset += 40
+        end = offset + payloadLength
+    else:
+        return None
+    sport, dport, seq, ack, dataOffset, flags = struct.unpack(
+        '>HHIIBB', frame[ offset:offset + 14 ] )
+    payload = frame[ offset + ( dataOffset >> 4 ) * 4:end ]
+    return ( src, sport, dst, dport, seq, ack, flags, payload )
+
+
+def iterEvents( fileName, ofPort=6633 ):
+    '''
+    Yields a dictionary for each event of the OpenFlow connections on
+    ofPort in the capture, in capture order, with:
+        'time' - timestamp of the packet in seconds
+        'name' - 'SYN', 'SYN_ACK', 'FIN', 'FIN_ACKED' ( a packet
+                 acknowledging the FIN of the other side ), 'RST', or the
+                 name of an OpenFlow message, i.e. 'FEATURES_REPLY'
+        'src', 'dst' - "ip:port" of the sender and the receiver
+    OpenFlow events also have the 'version', 'type' and 'xid' of the
+    message. A message split across segments is reported at the time of
+    its last segment.
+    '''
+    # ( src, dst ) to the next expected sequence number and the buffered
+    # bytes of the OpenFlow stream
+    streams = {}
+    # ( src, dst ) to the sequence number acknowledging the FIN it sent
+    fins = {}
+    for timestamp, linkType, frame in iterPcap( fileName ):
+        try:
+            segment = decodeTcp( linkType, frame )
+        except ( struct.error, IndexError, socket.error ):
+            continue
+        if segment is None:
+            continue
+        src, sport, dst, dport, seq, ack, flags, payload = segment
+        if ofPort not in ( sport, dport ):
+            continue
+        srcName = src + ":" + str( sport )
+        dstName = dst + ":" + str( dport )
+        key = ( srcName, dstName )
+        event = { 'time': timestamp, 'src': srcName, 'dst': dstName }
+        if flags & TCP_SYN:
+            streams[ key ] = [ ( seq + 1 ) & 0xffffffff, '' ]
+            fins.pop( key, None )
+            name = 'SYN_ACK' if flags & TCP_ACK else 'SYN'
+            yield dict( event, name=name )
+        if flags & TCP_RST:
+            yield dict( event, name='RST' )
+        reverse = ( dstName, srcName )
+        # Sequence number of the first byte of payload not seen before
+        start = seq
+        if flags & TCP_ACK and fins.get( reverse ) == ack:
+            fins[ reverse ] = None
+            yield dict( event, name='FIN_ACKED' )
+        if payload:
+            stream = streams.setdefault( key, [ seq, '' ] )
+            expected = stream[ 0 ]
+            delta = ( seq - expected ) & 0xffffffff
+            if delta >= 0x80000000:
+                # Retransmission, only keep the new bytes
+                payload = payload[ ( expected - seq ) & 0xffffffff: ]
+                start = expected
+            elif delta:
+                # Missed part of the stream, start over at this segment
+                stream[ 1 ] = ''
+            stream[ 0 ] = ( start + len( payload ) ) & 0xffffffff
+            stream[ 1 ] += payload
+            data = stream[ 1 ]
+            while len( data ) >= 8:
+                version, msgType, length, xid = struct.unpack( '>BBHI',
+                                                               data[ :8 ] )
+                if length < 8 or not 1 <= version <= 6:
+                    # Not aligned on a message, drop the buffer
+                    data = ''
+                    break
+                if len( data ) < length:
+                    break
+                data = data[ length: ]
+                yield dict( event, name=ofTypeName( version, msgType ),
+                            version=version, type=msgType, xid=xid )
+            stream[ 1 ] = data
+        if flags & TCP_FIN:
+            fins[ key ] = ( start + len( payload ) + 1 ) & 0xffffffff
+            yield dict( event, name='FIN' )
+
+
+def eventTimes( fileName, ofPort=6633, names=None ):
+    '''
+    Returns a dictionary of event name, see iterEvents, to the list of the
+    timestamps in milliseconds of the events with that name, in capture
+    order. If names is given only those events are kept.
+    '''
+    times = {}
+    for event in iterEvents( fileName, ofPort ):
+        if names is None or event[ 'name' ] in names:
+            times.setdefault( event[ 'name' ], [] ).append(
+                event[ 'time' ] * 1000.0 )
+    return times
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+'''
+Typed, buffered result records of the performance tests.
+
+A test describes its results with a schema, a list of ( column, type )
+where the type is str, int or float, and adds one record per result. The
+records are kept in memory and written to the backend in one go by flush,
+which TestON calls at the end of each test case:
+
+    sink = main.resultSink( "/tmp/IntentEventTPDB",
+                            [ ( "commit", str ), ( "scale", int ),
+                              ( "rate", float ) ] )
+    sink.add( commit=commit, scale=clusterCount, rate=rate )
+    previous = sink.baseline( "rate", last=5, scale=clusterCount )
+
+The backend is chosen from the file extension or given explicitly:
+    'csv' - comma separated values, with a header line unless header is
+            False. The 'sqlvalues' dialect writes the rows as SQL values,
+            strings in single quotes and None as NULL, like the files
+            posted to the results database by the SCPF jobs.
+    'jsonl' - one json object per line
+    'sqlite' - a table of a local SQLite database, named after the file
+               unless a table is given
+Files are rewritten through a temporary file renamed over the original, so
+a reader never sees a partly written file. Records not flushed yet are not
+returned by query.
+
+    TestON is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 2 of the License, or
+    (at your option) any later version.
+
+    TestON is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TestON.  If not, see <http://www.gnu.org/licenses/>.
+'''
+import csv
+import json
+import math
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+
+def sqlValue( value ):
+    '''
+    Returns the SQL literal of a value: a quoted string, a number, or NULL
+    for None, NaN and infinity
+    '''
+    if value is None:
+        return "NULL"
+    if isinstance( value, basestring ):
+        return "'" + value.replace( "'", "''" ) + "'"
+    if isinstance( value, float ):
+        if math.isnan( value ) or math.isinf( value ):
+            return "NULL"
+        return repr( value )
+    return str( value )
+
+
+def parseSqlValues( text ):
+    '''
+    Returns the rows of SQL values written by sqlValue, one row per line,
+    as lists of strings with None for NULL. A quoted string may span lines.
+    '''
+    rows = []
+    row = []
+    index = 0
+    while index < len( text ):
+        if text[ index ] == "'":
+            # Quoted string, '' is an escaped quote
+            value = []
+            index += 1
+            while True:
+                end = text.find( "'", index )
+                if end < 0:
+                    raise ValueError( "Unterminated string in SQL values" )
+                value.append( text[ index:end ] )
+                if text[ end + 1:end + 2 ] != "'":
+                    break
+                value.append( "'" )
+                index = end + 2
+            row.append( "".join( value ) )
+            index = end + 1
+        else:
+            end = index
+            while end < len( text ) and text[ end ] not in ",\n":
+                end += 1
+            token = text[ index:end ].strip()
+            row.append( None if token.upper() == "NULL" else token )
+            index = end
+        if index >= len( text ) or text[ index ] == "\n":
+            if row != [ '' ]:
+                rows.append( row )
+            row = []
+        elif text[ index ] != ",":
+            raise ValueError( "Expected , in SQL values at " + str( index ) )
+        index += 1
+    return rows
+
+sqlTypes = { str: 'TEXT', int: 'INTEGER', float: 'REAL' }
+extensions = { '.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl',
+               '.db': 'sqlite', '.sqlite': 'sqlite', '.sqlite3': 'sqlite' }
+
+
+class ResultSink( object ):
+
+    def __init__( self, path, schema, backend=None, table=None, header=True,
+                  dialect='excel' ):
+        '''
+        Required:
+            path - file the records are written to
+            schema - list of ( column name, type ), type is str, int or float
+        Optional:
+            backend - 'csv', 'jsonl' or 'sqlite', from the extension of the
+                      path by default, 'csv' if it is unknown
+            table - SQLite table name, defaults to the file name
+            header - write a header line in new csv files
+            dialect - csv dialect, or 'sqlvalues' to write SQL values
+        '''
+        self.path = path
+        self.schema = [ ( str( name ), kind ) for name, kind in schema ]
+        self.columns = [ name for name, kind in self.schema ]
+        self.types = dict( self.schema )
+        for name, kind in self.schema:
+            if kind not in sqlTypes:
+                raise TypeError( "Column " + name + " has unsupported type " +
+                                 str( kind ) )
+        if backend is None:
+            extension = os.path.splitext( path )[ 1 ].lower()
+            backend = extensions.get( extension, 'csv' )
+        if backend not in ( 'csv', 'jsonl', 'sqlite' ):
+            raise ValueError( "Unknown result backend " + str( backend ) )
+        self.backend = backend
+        if table is None:
+            table = os.path.splitext( os.path.basename( path ) )[ 0 ]
+        self.table = re.sub( r"\W", "_", table )
+        self.header = header
+        self.dialect = dialect
+        self.records = []
+        self.lock = threading.Lock()
+
+    def coerce( self, name, value ):
+        '''
+        Returns the value converted to the type of the column, None is kept
+        '''
+        if name not in self.types:
+            raise ValueError( "Unknown column " + str( name ) + " for " +
+                              self.path )
+        kind = self.types[ name ]
+        if value is None or value == '':
+            return None
+        if kind is str:
+            if not isinstance( value, basestring ):
+                raise TypeError( "Column " + name + " expects a string, " +
+                                 "got " + repr( value ) )
+            return str( value )
+        if kind is int:
+            if float( value ) != int( float( value ) ):
+                raise ValueError( "Column " + name + " expects an integer, " +
+                                  "got " + repr( value ) )
+            return int( float( value ) )
+        return float( value )
+
+    def add( self, record=None, **values ):
+        '''
+        Buffer a record, given as a dictionary and / or keyword arguments.
+        Missing columns are None.
+        '''
+        values = dict( record or {}, **values )
+        row = dict.fromkeys( self.columns )
+        for name, value in values.items():
+            row[ name ] = self.coerce( name, value )
+        with self.lock:
+            self.records.append( row )
+        return row
+
+    def pending( self ):
+        '''
+        Returns the records not written yet
+        '''
+        with self.lock:
+            return list( self.records )
+
+    def flush( self ):
+        '''
+        Write the buffered records to the backend at once. Returns the
+        number of records written.
+        '''
+        with self.lock:
+            records = self.records
+            self.records = []
+            if not records:
+                return 0
+            try:
+                if self.backend == 'sqlite':
+                    self.writeSqlite( records )
+                else:
+                    self.replaceFile( records, keep=True )
+            except Exception:
+                # Keep the records for the next flush
+                self.records = records + self.records
+                raise
+            return len( records )
+
+    def clear( self ):
+        '''
+        Remove all the records, written or not
+        '''
+        with self.lock:
+            self.records = []
+            if self.backend == 'sqlite':
+                connection = self.connect()
+                try:
+                    with connection:
+                        connection.execute( 'DELETE FROM "' + self.table + '"' )
+                finally:
+                    connection.close()
+            else:
+                self.replaceFile( [], keep=False )
+
+    def replaceFile( self, records, keep ):
+        '''
+        Rewrite the file with its current content if keep is True, then the
+        records, through a temporary file renamed over it
+        '''
+        path = os.path.abspath( self.path )
+        exists = os.path.exists( path )
+        fd, tempPath = tempfile.mkstemp( dir=os.path.dirname( path ),
+                                         prefix="." + os.path.basename( path ) )
+        try:
+            with os.fdopen( fd, 'wb' ) as f:
+                empty = True
+                if exists and keep:
+                    with open( path, 'rb' ) as current:
+                        shutil.copyfileobj( current, f )
+                    empty = f.tell() == 0
+                if self.backend == 'csv' and self.dialect == 'sqlvalues':
+                    if empty and self.header:
+                        f.write( ",".join( sqlValue( name )
+                                           for name in self.columns ) + "\n" )
+                    for record in records:
+                        f.write( ",".join( sqlValue( record[ name ] )
+                                           for name in self.columns ) + "\n" )
+                elif self.backend == 'csv':
+                    writer = csv.writer( f, dialect=self.dialect )
+                    if empty and self.header:
+                        writer.writerow( self.columns )
+                    for record in records:
+                        writer.writerow( [ record[ name ]
+                                           for name in self.columns ] )
+                else:
+                    for record in records:
+                        f.write( json.dumps( record, sort_keys=True ) + "\n" )
+                f.flush()
+                os.fsync( f.fileno() )
+            if exists:
+                shutil.copymode( path, tempPath )
+            else:
+                umask = os.umask( 0 )
+                os.umask( umask )
+                os.chmod( tempPath, 0666 & ~umask )
+            os.rename( tempPath, path )
+        except Exception:
+            if os.path.exists( tempPath ):
+                os.remove( tempPath )
+            raise
+
+    def connect( self ):
+        connection = sqlite3.connect( self.path )
+        columns = ", ".join( '"' + name + '" ' + sqlTypes[ kind ]
+                             for name, kind in self.schema )
+        connection.execute( 'CREATE TABLE IF NOT EXISTS "' + self.table +
+                            '" ( ' + columns + ' )' )
+        return connection
+
+    def writeSqlite( self, records ):
+        connection = self.connect()
+        try:
+            # One transaction for all the records
+            with connection:
+                connection.executemany(
+                    'INSERT INTO "' + self.table + '" ( ' +
+                    ", ".join( '"' + name + '"' for name in self.columns ) +
+                    ' ) VALUES ( ' + ", ".join( "?" * len( self.columns ) ) +
+                    ' )',
+                    [ [ record[ name ] for name in self.columns ]
+                      for record in records ] )
+        finally:
+            connection.close()
+
+    def readAll( self ):
+        '''
+        Returns all the records written to the backend, oldest first
+        '''
+        if not os.path.exists( self.path ):
+            return []
+        if self.backend == 'sqlite':
+            connection = self.connect()
+            try:
+                cursor = connection.execute(
+                    'SELECT ' + ", ".join( '"' + name + '"'
+                                           for name in self.columns ) +
+                    ' FROM "' + self.table + '" ORDER BY rowid' )
+                return [ dict( ( name, self.coerce( name, value ) )
+                               for name, value in zip( self.columns, row ) )
+                         for row in cursor ]
+            finally:
+                connection.close()
+        records = []
+        with open( self.path, 'rb' ) as f:
+            if self.backend == 'csv':
+                if self.dialect == 'sqlvalues':
+                    reader = parseSqlValues( f.read() )
+                else:
+                    dialect = csv.get_dialect( self.dialect )
+                    # Read the numbers as text and convert them with the
+                    # schema
+                    reader = csv.reader( f, delimiter=dialect.delimiter,
+                                         quotechar=dialect.quotechar )
+                for index, row in enumerate( reader ):
+                    if not row or ( index == 0 and self.header and
+                                    row == self.columns ):
+                        continue
+                    values = dict.fromkeys( self.columns )
+                    for name, value in zip( self.columns, row ):
+                        values[ name ] = self.coerce( name, value )
+                    records.append( values )
+            else:
+                for line in f:
+                    if line.strip():
+                        values = json.loads( line )
+                        records.append( dict(
+                            ( name, self.coerce( name, values.get( name ) ) )
+                            for name in self.columns ) )
+        return records
+
+    def query( self, last=None, **equals ):
+        '''
+        Returns the written records, oldest first, whose columns are equal to
+        the given keyword arguments, only the last ones if last is given
+        '''
+        equals = dict( ( name, self.coerce( name, value ) )
+                       for name, value in equals.items() )
+        records = [ record for record in self.readAll()
+                    if all( record[ name ] == value
+                            for name, value in equals.items() ) ]
+        if last is not None:
+            records = records[ -last: ] if last > 0 else []
+        return records
+
+    def baseline( self, column, last=5, **equals ):
+        '''
+        Returns the average of the column over the last written records
+        matching equals, i.e. the previous runs of the same scale, or None
+        if there are none. Missing, NaN and infinite values are skipped.
+        '''
+        values = [ record[ column ] for record in self.query( **equals )
+                   if record[ column ] is not None and
+                   not math.isnan( record[ column ] ) and
+                   not math.isinf( record[ column ] ) ][ -last: ]
+        if not values:
+            return None
+        return sum( values ) / float( len( values ) )
+
+    def compare( self, record, columns, keys, last=5 ):
+        '''
+        Compares the columns of a record with their baseline in the written
+        records with the same values of the keys columns. Returns a
+        dictionary of column to { 'value', 'baseline', 'change' } where
+        change is the relative difference to the baseline, None if there is
+        no baseline.
+        '''
+        equals = dict( ( key, record[ key ] ) for key in keys )
+        result = {}
+        for column in columns:
+            value = record[ column ]
+            baseline = self.baseline( column, last=last, **equals )
+            change = None
+            if baseline and value is not None:
+                change = ( value - baseline ) / float( baseline )
+            result[ column ] = { 'value': value, 'baseline': baseline,
+                                 'change': change }
+        return result
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+StepTimer keeps the wall time of each test case and step, split into the
+time spent inside driver calls, the time spent sleeping in the test script
+and the rest ( mostly parsing and checking results in the test itself ).
+"""
+import time
+import threading
+
+
+class StepTimer( object ):
+
+    def __init__( self ):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.records = []
+        self.realSleep = time.sleep
+
+    def install( self ):
+        """
+        Replace time.sleep so the sleeps of the test script are timed
+        """
+        time.sleep = self.sleep
+
+    def uninstall( self ):
+        time.sleep = self.realSleep
+
+    def sleep( self, seconds ):
+        start = time.time()
+        try:
+            self.realSleep( seconds )
+        finally:
+            # Sleeps inside driver calls are part of the driver time
+            current = getattr( self.local, "step", None )
+            if current is not None and not getattr( self.local, "depth", 0 ):
+                current[ "sleep" ] += time.time() - start
+
+    def enterDriver( self ):
+        """
+        Called by the DriverTracer when a driver method is called, returns
+        the driver call depth to give back to exitDriver
+        """
+        depth = getattr( self.local, "depth", 0 )
+        self.local.depth = depth + 1
+        return depth
+
+    def exitDriver( self, depth, duration ):
+        """
+        Add the time of a driver call to the current step. Driver methods
+        called by other driver methods are only counted once.
+        """
+        self.local.depth = depth
+        current = getattr( self.local, "step", None )
+        if current is not None and depth == 0:
+            current[ "driver" ] += duration
+
+    def currentStep( self ):
+        """
+        Returns the case and step being run by this thread
+        """
+        current = getattr( self.local, "step", None )
+        if current is None:
+            return ( "", "" )
+        return ( current[ "case" ], current[ "step" ] )
+
+    def newRecord( self, kind, case, step, name ):
+        return { "kind": kind, "case": str( case ), "step": str( step ),
+                 "name": name, "result": "", "start": time.time(),
+                 "wall": 0.0, "driver": 0.0, "sleep": 0.0 }
+
+    def startCase( self, case ):
+        self.local.case = self.newRecord( "case", case, "", "" )
+        self.local.step = None
+
+    def endCase( self, name, result ):
+        """
+        Returns the timing record of the case which just ended
+        """
+        record = self.local.case
+        record[ "name" ] = name
+        record[ "result" ] = result
+        record[ "wall" ] = time.time() - record[ "start" ]
+        with self.lock:
+            self.records.append( record )
+        self.local.case = None
+        return record
+
+    def startStep( self, case, step ):
+        self.local.step = self.newRecord( "step", case, step, "" )
+
+    def endStep( self, name, result ):
+        record = self.local.step
+        self.local.step = None
+        if record is None:
+            return None
+        record[ "name" ] = name
+        record[ "result" ] = result
+        record[ "wall" ] = time.time() - record[ "start" ]
+        caseRecord = getattr( self.local, "case", None )
+        if caseRecord is not None:
+            caseRecord[ "driver" ] += record[ "driver" ]
+            caseRecord[ "sleep" ] += record[ "sleep" ]
+        with self.lock:
+            self.records.append( record )
+        return record
+
+    def slowestSteps( self, count=5 ):
+        steps = [ record for record in self.records
+                  if record[ "kind" ] == "step" ]
+        return sorted( steps, key=lambda record: record[ "wall" ],
+                       reverse=True )[ :count ]
+
+    def format( self, record ):
+        """
+        One line summary of a timing record
+        """
+        other = record[ "wall" ] - record[ "driver" ] - record[ "sleep" ]
+        return "%.3fs ( driver %.3fs, sleep %.3fs, other %.3fs )" % \
+               ( record[ "wall" ], record[ "driver" ], record[ "sleep" ],
+                 max( other, 0.0 ) )
+
+    def writeCSV( self, fileName ):
+        """
+        Write all the timing records to a csv file, one line per case and
+        per step in the order they ended
+        """
+        columns = [ "kind", "case", "step", "name", "result", "start",
+                    "wall", "driver", "sleep", "other" ]
+        timingFile = open( fileName, "w" )
+        timingFile.write( ",".join( columns ) + "\n" )
+        with self.lock:
+            records = list( self.records )
+        for record in records:
+            other = max( record[ "wall" ] - record[ "driver" ] -
+                         record[ "sleep" ], 0.0 )
+            name = '"' + str( record[ "name" ] ).replace( '"', '""' ) + '"'
+            timingFile.write( ",".join( [ record[ "kind" ], record[ "case" ],
+                                          record[ "step" ], name,
+                                          str( record[ "result" ] ),
+                                          "%.3f" % record[ "start" ],
+                                          "%.3f" % record[ "wall" ],
+                                          "%.3f" % record[ "driver" ],
+                                          "%.3f" % record[ "sleep" ],
+                                          "%.3f" % other ] ) + "\n" )
+        timingFile.close()
@@ -32,7 +32,11 @@ import __builtin__
 import new
 import xmldict
 import importlib
+import inspect
+import types
+import functools
 import threading
+import time
 module = new.module("test")
 import openspeak
 import subprocess
@@ -51,9 +55,42 @@ sys.path.append( tests_path )
 
 from core.utilities import Utilities
 from core.Thread import Thread
+from core.steptimer import StepTimer
+from core.drivertracer import DriverTracer
+from core.resultsink import ResultSink
+
+# Attributes of main holding the state of the running test case. Cases run
+# in parallel each get their own copy of these.
+caseStateAttributes = [ 'CASERESULT', 'STEPRESULT', 'stepResults', 'stepName',
+                        'stepCache', 'stepCount', 'stepList', 'onFailMsg',
+                        'caseExplanation', 'CurrentTestCase',
+                        'CurrentTestCaseNumber', 'testCaseNumber',
+                        'EXPERIMENTAL_MODE', 'last_result', 'caseOutput' ]
+
+def caseStateProperty(name):
+    '''
+    Property which reads and writes the attribute in the thread local case
+    state when the current thread is running an isolated test case, else in
+    the state shared by the test.
+    '''
+    def getter(self):
+        local = self.caseLocal
+        if getattr( local, 'isolated', False ) and name in vars( local ):
+            return vars( local )[name]
+        try:
+            return self.caseShared[name]
+        except KeyError:
+            raise AttributeError( name )
+    def setter(self, value):
+        local = self.caseLocal
+        if getattr( local, 'isolated', False ):
+            vars( local )[name] = value
+        else:
+            self.caseShared[name] = value
+    return property( getter, setter )
 
 
-class TestON:
+class TestON( object ):
     '''
     TestON will initiate the specified test.
     The main tasks are :
@@ -65,6 +102,15 @@ class TestON:
            Initialise the component handles specified in the topology file of the specified test.
         '''
         # Initialization of the variables.
+        self.caseLocal = threading.local()
+        self.caseShared = {}
+        self.caseOutput = None
+        self.resultLock = threading.Lock()
+        self.componentLocks = {}
+        self.timer = StepTimer()
+        self.tracer = DriverTracer(self.timer)
+        self.profileCount = {}
+        self.resultSinks = {}
         __builtin__.main = self
         __builtin__.path = path
         __builtin__.utilities = Utilities()
@@ -124,6 +170,7 @@ class TestON:
         self.log.exact(initString)
         self.driverObject = {}
         self.random_order = 111 # Random order id to connect the components
+        self.componentConnectTime = {}
         components_connect_order = {}
         #component_list.append()
         if type(self.componentDictionary) == dict:
@@ -133,8 +180,15 @@ class TestON:
             #Ordering components based on the connect order.
             ordered_component_list =sorted(components_connect_order, key=lambda key: components_connect_order[key])
             print ordered_component_list
+            # Components sharing a connect_order form one tier and are
+            # connected concurrently, tiers are still connected in order.
+            tiers = {}
             for component in ordered_component_list:
-                self.componentInit(component)
+                tiers.setdefault( components_connect_order[component], [] ).append( component )
+            for order in sorted( tiers.keys() ):
+                self.componentTierInit( sorted( tiers[order] ) )
+            self.initiated = True
+            self.logger.connectSummary(self)
 
     def configparser(self):
         '''
@@ -149,12 +203,42 @@ class TestON:
             except Exception:
                 print "There is no such file to parse " + self.configFile
 
+    def componentTierInit(self,componentList):
+        '''
+        This method will initialize all the components of one connect_order
+        tier in parallel, using at most 'connect_threads' ( from the params
+        file, default 8 ) threads at a time.
+        It will exit the test if any of the components failed to connect.
+        '''
+        poolSize = int(self.params['connect_threads']) if ('connect_threads' in self.params) else 8
+        poolSize = max( poolSize, 1 )
+        results = {}
+        if len(componentList) == 1:
+            results[componentList[0]] = self.componentInit(componentList[0])
+        else:
+            self.log.info("Connecting components in parallel: " + ", ".join(componentList))
+            for index in range(0, len(componentList), poolSize):
+                threads = []
+                for component in componentList[index:index + poolSize]:
+                    t = Thread( target=self.componentInit,
+                                name="componentInit-" + component,
+                                args=[ component ] )
+                    threads.append( t )
+                    t.start()
+                for t in threads:
+                    t.join()
+                    results[t.args[0]] = t.result
+        failed = [ component for component in componentList if not results.get( component ) ]
+        for component in failed:
+            self.log.error("Exiting form the test execution because the connecting to the "+component+" component failed.")
+        if failed:
+            self.exit()
+
     def componentInit(self,component):
         '''
         This method will initialize specified component
+        It returns TRUE if the component connected successfully, else FALSE
         '''
-        global driver_options
-        self.initiated = False
         self.log.info("Creating component Handle: "+component)
         driver_options = {}
         if 'COMPONENTS' in self.componentDictionary[component].keys():
@@ -172,18 +256,66 @@ class TestON:
         if ( "OCN" in self.componentDictionary[component]['host'] and main.onoscell ):
             self.componentDictionary[component]['host'] = main.mnIP
 
+        startTime = time.time()
         connect_result = driverObject.connect(user_name = self.componentDictionary[component]['user'] if ('user' in self.componentDictionary[component].keys()) else getpass.getuser(),
                                               ip_address= self.componentDictionary[component]['host'] if ('host' in self.componentDictionary[component].keys()) else 'localhost',
                                               pwd = self.componentDictionary[component]['password'] if ('password' in self.componentDictionary[component].keys()) else 'changeme',
                                               port = self.componentDictionary[component]['port'] if ('port' in self.componentDictionary[component].keys()) else None,
                                               options = driver_options)
+        self.componentConnectTime[component] = time.time() - startTime
+        self.log.info("Connecting to " + component + " took " +
+                      str(round(self.componentConnectTime[component], 3)) + " seconds")
 
         if not connect_result:
-            self.log.error("Exiting form the test execution because the connecting to the "+component+" component failed.")
-            self.exit()
+            return self.FALSE
 
+        self.tracer.wrapDriver(component, driverObject)
         vars(self)[component] = driverObject
-        self.initiated = True
+        return self.TRUE
+
+    def lockComponents(self):
+        '''
+           Wrap the public methods of the component drivers so that the
+           calls made by the cases of a parallel group hold the lock of the
+           component, and the cases sharing a component do not interleave
+           on its session. Only the threads running a case take the lock,
+           the threads a driver method starts itself, i.e. the workers of
+           OnosRestDriver.fetchAll, run under the lock of their case.
+           Returns the replaced methods, to be given to unlockComponents.
+        '''
+        replaced = []
+        for component in self.componentDictionary.keys():
+            driverObject = vars(self).get(component)
+            if driverObject is None:
+                continue
+            lock = self.componentLocks.setdefault(component, threading.RLock())
+            for name, func in inspect.getmembers(driverObject.__class__, inspect.ismethod):
+                if name.startswith("_") or func.im_self is not None:
+                    continue
+                replaced.append( ( driverObject, name, vars(driverObject).get(name) ) )
+                locked = self.lockedMethod(lock, getattr(driverObject, name))
+                setattr(driverObject, name,
+                        types.MethodType(locked, driverObject, driverObject.__class__))
+        return replaced
+
+    def unlockComponents(self,replaced):
+        '''
+           Put back the driver methods replaced by lockComponents
+        '''
+        for driverObject, name, method in reversed(replaced):
+            if method is None:
+                delattr(driverObject, name)
+            else:
+                setattr(driverObject, name, method)
+
+    def lockedMethod(self,lock,method):
+        @functools.wraps(method)
+        def locked(driverSelf, *args, **kwargs):
+            if not getattr(self.caseLocal, 'isolated', False):
+                return method(*args, **kwargs)
+            with lock:
+                return method(*args, **kwargs)
+        return locked
 
     def run(self):
         '''
@@ -207,17 +339,141 @@ class TestON:
         testFile = self.tests_path + "/"+self.TEST + "/"+self.TEST + ".py"
         test = testparser.TestParser(testFile)
         self.testscript = test.testscript
-        self.code = test.getStepCode()
+        self.code = test.getCompiledStepCode()
         repeat= int(self.params['repeat']) if ('repeat' in self.params) else 1
         self.TOTAL_TC_PLANNED = len(self.testcases_list)*repeat
 
+        parallelGroups = self.getParallelGroups()
+        self.timer.install()
         result = self.TRUE
         while(repeat):
-            for self.CurrentTestCaseNumber in self.testcases_list:
-                result = self.runCase(self.CurrentTestCaseNumber)
+            index = 0
+            while index < len(self.testcases_list):
+                # Run consecutive cases of the same parallel group together
+                batch = [ self.testcases_list[index] ]
+                for group in parallelGroups:
+                    if batch[0] in group:
+                        for case in self.testcases_list[index + 1:]:
+                            if case not in group or case in batch:
+                                break
+                            batch.append( case )
+                        break
+                if len( batch ) > 1:
+                    result = self.runParallelCases(batch)
+                else:
+                    self.CurrentTestCaseNumber = batch[0]
+                    result = self.runCase(self.CurrentTestCaseNumber)
+                index += len( batch )
             repeat-=1
         return result
 
+    def getParallelGroups(self):
+        '''
+           Returns the groups of independent test cases declared in the
+           params file, as a list of lists. e.g.
+           <parallelcases>[3,4,5],[8,9]</parallelcases>
+           Consecutive cases of the same group in the testcases list are run
+           concurrently.
+        '''
+        if 'parallelcases' not in self.params or not self.params['parallelcases']:
+            return []
+        groups = eval(str(self.params['parallelcases'])+",")
+        if groups and type(groups[0]) == int:
+            groups = [ list(groups) ]
+        return [ list(group) for group in groups ]
+
+    def runParallelCases(self,cases):
+        '''
+           Runs the given test cases concurrently, at most 'parallel_threads'
+           ( from the params file ) at a time. Each case keeps its own step
+           results and state, and its summary and wiki output is written in
+           the order of the cases once they have all finished. The calls to
+           a component are serialized by its lock while the cases run, see
+           lockComponents. Each case runs its steps in its own copy of the
+           test script globals, the names the cases set are copied back in
+           the order of the cases once they have all finished.
+           Returns TRUE only if all the cases completed and passed. If a
+           case cleaned up or exited the test, it is done here once all the
+           cases have finished.
+        '''
+        poolSize = int(self.params['parallel_threads']) if ('parallel_threads' in self.params) else len(cases)
+        poolSize = max( poolSize, 1 )
+        self.log.info("Running test cases in parallel: " + ", ".join( [ str(case) for case in cases ] ))
+        threads = []
+        replaced = self.lockComponents()
+        try:
+            for index in range(0, len(cases), poolSize):
+                running = []
+                for case in cases[index:index + poolSize]:
+                    t = Thread( target=self.runIsolatedCase,
+                                name="CASE" + str(case),
+                                args=[ case ] )
+                    running.append( t )
+                    t.start()
+                for t in running:
+                    t.join()
+                threads.extend( running )
+        finally:
+            self.unlockComponents(replaced)
+        result = self.TRUE
+        exited = False
+        cleanup = False
+        for t in threads:
+            caseRun = t.result
+            if caseRun is None:
+                self.log.error("Test case " + str( t.args[0] ) + " did not complete")
+                result = self.FALSE
+                continue
+            for func, msg in caseRun['output']:
+                func( msg )
+            module.__dict__.update( caseRun['globals'] )
+            if caseRun['result'] != self.TRUE:
+                result = self.FALSE
+            exited = exited or caseRun['exited']
+            cleanup = cleanup or caseRun['cleanup']
+        self.CurrentTestCaseNumber = cases[-1]
+        if cleanup:
+            self.cleanup()
+        if exited:
+            self.exit()
+        return result
+
+    def runIsolatedCase(self,testCaseNumber):
+        '''
+           Runs a test case with its own copy of the case state. The summary
+           and wiki messages of the case are collected and returned instead
+           of being written. The steps run in a copy of the test script
+           globals, the names they set are returned under 'globals'.
+           cleanup and exit called by the case only stop the case,
+           runParallelCases runs them once all the cases finished.
+        '''
+        shared = dict( module.__dict__ )
+        self.caseLocal.globals = dict( shared )
+        self.caseLocal.isolated = True
+        self.CurrentTestCaseNumber = testCaseNumber
+        self.stepCache = ""
+        self.caseOutput = []
+        self.caseLocal.cleanupRequested = False
+        exited = False
+        result = self.FALSE
+        try:
+            result = self.runCase(testCaseNumber)
+        except SystemExit:
+            exited = True
+        changed = dict( ( name, value )
+                        for name, value in self.caseLocal.globals.items()
+                        if name not in shared or shared[name] is not value )
+        return { 'result': result, 'output': self.caseOutput, 'exited': exited,
+                 'cleanup': self.caseLocal.cleanupRequested,
+                 'globals': changed }
+
+    def updateCaseResults(self):
+        '''
+           Update the test results with the result of the current case.
+        '''
+        with self.resultLock:
+            self.logger.updateCaseResults(self)
+
     def runCase(self,testCaseNumber):
         self.CurrentTestCaseNumber = testCaseNumber
         self.CurrentTestCase = ""
@@ -227,6 +483,7 @@ class TestON:
         result = self.TRUE
         self.stepCount = 0
         self.EXPERIMENTAL_MODE = self.FALSE
+        logStats = self.logWriter.stats() if hasattr( self, 'logWriter' ) else None
         self.addCaseHeader()
         self.testCaseNumber = str(testCaseNumber)
         stopped = False
@@ -237,12 +494,17 @@ class TestON:
             return self.FALSE
 
         self.stepCount = 0
+        self.timer.startCase(self.testCaseNumber)
+        profiler = self.startProfile(self.testCaseNumber)
         while self.stepCount < len(self.code[self.testCaseNumber].keys()):
             result = self.runStep(self.stepList,self.code,self.testCaseNumber)
             if result == self.FALSE:
                 break
             elif result == self.TRUE:
                 continue
+        self.stopProfile(profiler, self.testCaseNumber)
+        caseTiming = self.timer.endCase(self.CurrentTestCase, self.NORESULT)
+        self.flushResultSinks()
         if not stopped :
             if all( self.TRUE == i for i in self.stepResults ):
                 # ALL PASSED
@@ -255,8 +517,9 @@ class TestON:
                 self.CASERESULT = self.TRUE
             else:
                 self.CASERESULT = self.NORESULT
+            caseTiming['result'] = self.CASERESULT
             self.testCaseResult[str(self.CurrentTestCaseNumber)] = self.CASERESULT
-            self.logger.updateCaseResults(self)
+            self.updateCaseResults()
             self.log.wiki( "<p>" + self.caseExplanation + "</p>" )
             self.log.summary( self.caseExplanation )
             self.log.wiki( "<ul>" )
@@ -271,16 +534,95 @@ class TestON:
                     self.log.wiki( "<ul><li>" + line + "</li></ul>\n" )
             self.log.wiki( "</ul>" )
             self.log.summary( self.stepCache )
+            self.log.summary( "\tCase time: " + self.timer.format( caseTiming ) + "\n" )
             self.stepCache = ""
+        if logStats:
+            self.logCaseOverhead( logStats )
         return result
 
+    def resultSink(self, path, schema, **options):
+        '''
+           Returns the core.resultsink.ResultSink writing the records of the
+           given schema to path, creating it on the first call. The records
+           added to the sinks are written at the end of each test case.
+        '''
+        with self.resultLock:
+            if path not in self.resultSinks:
+                self.resultSinks[path] = ResultSink(path, schema, **options)
+            return self.resultSinks[path]
+
+    def flushResultSinks(self):
+        '''
+           Write the records buffered by the result sinks
+        '''
+        for path, sink in self.resultSinks.items():
+            try:
+                sink.flush()
+            except Exception:
+                self.log.exception("Error writing the results to " + path)
+
+    def startProfile(self,testCaseNumber):
+        '''
+           Start profiling the test case if it was selected with the profile
+           command line option. Returns the profiler or None.
+        '''
+        if not self.profileCases:
+            return None
+        if self.profileCases != 'all' and int(testCaseNumber) not in self.profileCases:
+            return None
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def stopProfile(self,profiler,testCaseNumber):
+        '''
+           Stop the profiler of the test case and save its stats in the log
+           directory, as <TEST>_CASE<n>.prof and as a text report of the
+           functions with the highest cumulative time.
+        '''
+        if profiler is None:
+            return
+        profiler.disable()
+        import pstats
+        with self.resultLock:
+            count = self.profileCount.get( testCaseNumber, 0 ) + 1
+            self.profileCount[testCaseNumber] = count
+        profileName = self.logdir + "/" + self.TEST + "_CASE" + str(testCaseNumber)
+        if count > 1:
+            profileName += "_" + str(count)
+        profiler.dump_stats( profileName + ".prof" )
+        reportFile = open( profileName + "_profile.txt", "w" )
+        stats = pstats.Stats( profiler, stream=reportFile )
+        stats.sort_stats( "cumulative" ).print_stats( 40 )
+        reportFile.close()
+        self.log.info( "Profile of case " + str(testCaseNumber) + " saved in " + profileName + ".prof" )
+
+    def logCaseOverhead(self,startStats):
+        '''
+           Log how much logging the last case did and how long it took,
+           based on the log writer stats taken at the start of the case.
+        '''
+        stats = self.logWriter.stats()
+        self.log.debug( "Logging overhead of case " + str( self.CurrentTestCaseNumber ) + ": " +
+                        str( stats['messages'] - startStats['messages'] ) + " messages, " +
+                        str( stats['bytes'] - startStats['bytes'] ) + " bytes, " +
+                        str( round( stats['queueTime'] - startStats['queueTime'], 3 ) ) + "s queueing, " +
+                        str( round( stats['ioTime'] - startStats['ioTime'], 3 ) ) + "s of file I/O" )
+
     def runStep(self,stepList,code,testCaseNumber):
         if not cli.pause:
             try :
                 step = stepList[self.stepCount]
                 self.STEPRESULT = self.NORESULT
                 self.onFailMsg = "\t\tNo on fail message given"
-                exec code[testCaseNumber][step] in module.__dict__
+                self.timer.startStep(testCaseNumber, step)
+                # Cases running in parallel each have their own globals
+                namespace = getattr( self.caseLocal, 'globals', None )
+                if namespace is None:
+                    namespace = module.__dict__
+                exec code[testCaseNumber][step] in namespace
+                self.timer.endStep(self.stepName, self.STEPRESULT)
                 self.stepCount = self.stepCount + 1
                 if step > 0:
                     self.stepCache += "\t"+str(testCaseNumber)+"."+str(step)+" "+self.stepName+" - "
@@ -297,9 +639,10 @@ class TestON:
                 self.log.exception( "\nException in the following section of" +
                                     " code: " + str(testCaseNumber) + "." +
                                     str(step) + ": " + self.stepName )
+                self.timer.endStep(self.stepName, self.ERROR)
                 #print code[testCaseNumber][step]
                 self.stepCount = self.stepCount + 1
-                self.logger.updateCaseResults(self)
+                self.updateCaseResults()
                 #WIKI results
                 self.log.wiki( "<ul>" )
                 for line in self.stepCache.splitlines():
@@ -323,7 +666,7 @@ class TestON:
             stopped = True
             self.TOTAL_TC_NORESULT = self.TOTAL_TC_NORESULT + 1
             self.testCaseResult[str(self.CurrentTestCaseNumber)] = "Stopped"
-            self.logger.updateCaseResults(self)
+            self.updateCaseResults()
             result = self.cleanup()
             return main.FALSE
 
@@ -356,11 +699,17 @@ class TestON:
         closed properly, else return FALSE.
         '''
         result = self.TRUE
+        if getattr( self.caseLocal, 'isolated', False ):
+            # Test case running in parallel, cleaned up when all finish
+            self.caseLocal.cleanupRequested = True
+            return result
         lock = self.cleanupLock
         if lock.acquire( False ):
             try:
                 if self.cleanupFlag is False:  # First thread to run this
                     self.cleanupFlag = True
+                    self.timer.uninstall()
+                    self.flushResultSinks()
                     if self.initiated:
                         self.logger.testSummary(self)
                     for component in self.componentDictionary.keys():
@@ -381,6 +730,11 @@ class TestON:
                             self.log.exception( "Exception while closing log files for " +
                                                  str( driver ) )
                             result = self.FALSE
+                    # Write out everything still queued for the log files
+                    try:
+                        self.logWriter.close()
+                    except AttributeError:
+                        pass
                 else:
                     pass  # Someone else already ran through this function
             finally:
@@ -598,7 +952,15 @@ class TestON:
         return self.random_order
 
     def exit(self):
+        if getattr( self.caseLocal, 'isolated', False ):
+            # Only stop this test case, runParallelCases exits the test
+            # once the other cases finish
+            raise SystemExit
         __builtin__.testthread = None
+        try:
+            self.logWriter.flush()
+        except AttributeError:
+            pass
         for thread in threading.enumerate():
             if thread.isAlive():
                 try:
@@ -607,6 +969,9 @@ class TestON:
                     print(str(thread.getName()) + ' could not be terminated' )
         sys.exit()
 
+for attribute in caseStateAttributes:
+    setattr( TestON, attribute, caseStateProperty( attribute ) )
+
 def verifyOptions(options):
     '''
     This will verify the command line options and set to default values, if any option not given in command line.
@@ -623,6 +988,8 @@ def verifyOptions(options):
     verifyMail(options)
     verifyTestCases(options)
     verifyOnosCell(options)
+    verifyProfile(options)
+    verifyTrace(options)
 
 def verifyTest(options):
     try:
@@ -708,6 +1075,24 @@ def verifyOnosCell(options):
     else :
         main.onoscell = main.FALSE
 
+def verifyProfile(options):
+    # Cases to run under cProfile, "all" or a list of case numbers
+    profile = getattr( options, 'profile', None )
+    if not profile:
+        main.profileCases = main.FALSE
+    elif str(profile).lower() == 'all':
+        main.profileCases = 'all'
+    else:
+        main.profileCases = list( eval( re.sub( "(\[|\])", "", str(profile) ) + "," ) )
+
+def verifyTrace(options):
+    # Save a timeline of all the driver calls
+    trace = getattr( options, 'trace', None )
+    if trace and str(trace).lower() not in [ 'false', 'no', '0' ]:
+        main.traceDriverCalls = main.TRUE
+    else:
+        main.traceDriverCalls = main.FALSE
+
 def verifyTestScript(options):
     '''
     Verifyies test script.
@@ -22,6 +22,9 @@ Created on 26-Dec-2012
 '''
 import re
 import sys
+import os
+import hashlib
+import marshal
 class TestParser:
     def __init__(self,testFile):
         try :
@@ -31,10 +34,20 @@ class TestParser:
             sys.exit(0)
 
         testFileList = testFileHandler.readlines()
+        testFileHandler.close()
+        self.testFile = testFile
+        self.testHash = hashlib.sha1( "".join( testFileList ) + sys.version ).hexdigest()
         self.testscript = testFileList
         self.caseCode = {}
         self.caseBlock = ''
-        self.statementsList = []
+        self.statementsList = None
+
+    def parseStatements(self):
+        '''
+        Strips the comments and empty lines of the test script and removes
+        the indentation of the case bodies.
+        '''
+        testFileList = self.testscript
         index = 0
         self.statementsList = []
         #initialSpaces = len(line) -len(line.lstrip())
@@ -53,9 +66,12 @@ class TestParser:
             elif not re.match('#|^\s*$',testFileList[index],0):
                 self.statementsList.append(testFileList[index])
             index = index + 1
+        return self.statementsList
 
     def case_code(self):
         index = 0
+        if self.statementsList is None:
+            self.parseStatements()
         statementsList = self.statementsList
         while index < len(statementsList):
             #print statementsList[index]
@@ -128,3 +144,48 @@ class TestParser:
             for step in step_block :
                 case_step_code[case][step] = step_block[step]
         return case_step_code
+
+    def getCompiledStepCode(self):
+        '''
+        Returns the same dictionary as getStepCode, with each step compiled
+        to a code object.
+        The compiled steps are cached in a .stepcache file next to the test
+        script, keyed by the hash of the script, so later runs of an
+        unchanged test don't have to parse and compile it again.
+        A step which does not compile is kept as source, so the error is
+        still raised and logged when the step runs.
+        '''
+        testDir, testName = os.path.split( self.testFile )
+        cacheFile = os.path.join( testDir, "." + testName + ".stepcache" )
+        try:
+            cacheHandler = open( cacheFile, 'rb' )
+            try:
+                cacheHash, case_step_code = marshal.load( cacheHandler )
+            finally:
+                cacheHandler.close()
+            if cacheHash == self.testHash:
+                return case_step_code
+        except ( IOError, EOFError, ValueError, TypeError ):
+            pass
+
+        case_step_code = self.getStepCode()
+        for case in case_step_code:
+            for step in case_step_code[case]:
+                source = case_step_code[case][step]
+                try:
+                    case_step_code[case][step] = compile( source,
+                                                          self.testFile + ":CASE" + str( case ) + "." + str( step ),
+                                                          "exec" )
+                except SyntaxError:
+                    pass
+        try:
+            # Write to a temporary file first so a parallel run never reads
+            # a partial cache
+            tmpFile = cacheFile + "." + str( os.getpid() )
+            cacheHandler = open( tmpFile, 'wb' )
+            marshal.dump( ( self.testHash, case_step_code ), cacheHandler )
+            cacheHandler.close()
+            os.rename( tmpFile, cacheFile )
+        except ( IOError, OSError ):
+            pass
+        return case_step_code
@@ -0,0 +1,6 @@
+'''
+Unit tests of the core modules and drivers which do not need a test bed.
+Run them from the TestON directory with:
+
+    python -m unittest discover -s core/tests -t .
+'''
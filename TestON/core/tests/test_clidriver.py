@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+'''
+Tests of drivers.common.clidriver with a fake ssh channel
+'''
+import __builtin__
+import unittest
+
+import pexpect
+
+from core.utilities import Utilities
+from drivers.common.cli.emulator.remotemininetdriver import RemoteMininetDriver
+
+
+class FakeLog:
+
+    def __getattr__( self, name ):
+        return lambda *args, **kwargs: None
+
+
+class RecordingLog( FakeLog ):
+
+    def __init__( self ):
+        self.errors = []
+
+    def error( self, message ):
+        self.errors.append( message )
+
+
+class FakeMain:
+    TRUE = 1
+    FALSE = 0
+    log = FakeLog()
+    last_response = ""
+
+
+class FakeHandle( object ):
+
+    '''
+        Channel answering each command with its output and the prompt,
+        or raising EOF once closed
+    '''
+    def __init__( self, output="" ):
+        self.output = output
+        self.sent = []
+        self.closed = False
+        self.before = ""
+        self.after = ""
+        self.buffer = ""
+
+    def sendline( self, line="" ):
+        self.sent.append( line )
+
+    def expect( self, patterns, timeout=None ):
+        if self.closed:
+            raise pexpect.EOF( "closed" )
+        self.before = self.sent[ -1 ] + "\r\n" + self.output
+        self.after = "$ "
+        return 0
+
+    def close( self ):
+        self.closed = True
+
+    def isalive( self ):
+        return not self.closed
+
+
+class RestoreChannelTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.saved = ( getattr( __builtin__, 'main', None ),
+                       getattr( __builtin__, 'utilities', None ) )
+        __builtin__.main = FakeMain()
+        __builtin__.utilities = Utilities()
+        self.driver = RemoteMininetDriver()
+        self.driver.name = "Mininet1"
+        self.driver.ip_address = "10.0.0.1"
+        self.driver.transportKey = None
+        self.driver.handle = FakeHandle()
+        self.channels = []
+
+        def openChannel():
+            self.driver.handle = FakeHandle( "hosts\r\n" )
+            self.channels.append( self.driver.handle )
+            return self.driver.handle
+        self.driver.openChannel = openChannel
+
+    def tearDown( self ):
+        __builtin__.main, __builtin__.utilities = self.saved
+
+    def testResend( self ):
+        closed = self.driver.handle
+        closed.close()
+        response = self.driver.execute( cmd="cat hosts", prompt="\$" )
+        self.assertEqual( closed.sent, [ "cat hosts" ] )
+        # A single new channel, the command is sent once after the prompt
+        self.assertEqual( len( self.channels ), 1 )
+        self.assertEqual( self.channels[ 0 ].sent, [ "", "cat hosts" ] )
+        self.assertTrue( "hosts" in response )
+
+    def testChannelLost( self ):
+        self.driver.handle.close()
+
+        def openChannel():
+            self.channels.append( None )
+            return FakeMain.FALSE
+        self.driver.openChannel = openChannel
+        self.assertRaises( pexpect.EOF, self.driver.execute,
+                           cmd="cat hosts", prompt="\$" )
+        self.assertEqual( len( self.channels ), 1 )
+
+
+class StreamHandle( object ):
+
+    '''
+        Channel giving back the output of a command in the given reads
+    '''
+    def __init__( self, reads ):
+        self.reads = list( reads )
+        self.sent = []
+        self.before = ""
+        self.after = ""
+        self.buffer = ""
+
+    def sendline( self, line="" ):
+        self.sent.append( line )
+
+    def send( self, data ):
+        self.sent.append( data )
+
+    def sendcontrol( self, char ):
+        self.sent.append( "^" + char )
+
+    def read_nonblocking( self, size=1, timeout=None ):
+        if not self.reads:
+            raise pexpect.TIMEOUT( "timeout" )
+        return self.reads.pop( 0 )
+
+
+class ExecuteStreamTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.saved = ( getattr( __builtin__, 'main', None ),
+                       getattr( __builtin__, 'utilities', None ) )
+        __builtin__.main = FakeMain()
+        main.log = RecordingLog()
+        __builtin__.utilities = Utilities()
+        self.driver = RemoteMininetDriver()
+        self.driver.name = "Mininet1"
+
+    def tearDown( self ):
+        __builtin__.main, __builtin__.utilities = self.saved
+
+    def stream( self, reads, **execparams ):
+        self.driver.handle = StreamHandle( reads )
+        return "".join( self.driver.executeStream( **execparams ) )
+
+    def testOutput( self ):
+        lines = [ "flow %d\r\n" % i for i in range( 200 ) ]
+        output = self.stream( [ "".join( lines[ :120 ] ),
+                                "".join( lines[ 120: ] ) + "mininet> " ],
+                              cmd="dump", prompt="mininet>" )
+        self.assertEqual( output, "".join( lines ).replace( "\r\n", "" ) )
+        self.assertEqual( self.driver.handle.after, "mininet>" )
+        self.assertEqual( main.log.errors, [] )
+
+    def testPager( self ):
+        output = self.stream( [ "page 1\n--More--", "page 2\n$ " ],
+                              cmd="cat log", prompt="\$" )
+        self.assertEqual( output, "page 1page 2" )
+        self.assertEqual( self.driver.handle.sent, [ "cat log", " " ] )
+
+    def testCommandNotFound( self ):
+        output = self.stream( [ "dmp\r\nCommand not",
+                                " found.\r\nmininet> " ],
+                              cmd="dmp", prompt="mininet>" )
+        self.assertEqual( output, "dmpCommand not found." )
+        self.assertEqual( main.log.errors, [ "Command not found" ] )
+
+
+if __name__ == '__main__':
+    unittest.main()
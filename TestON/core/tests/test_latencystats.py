@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+'''
+Tests of core.latencystats
+'''
+import math
+import unittest
+
+import numpy
+
+from core import latencystats
+
+
+class FilterSamplesTest( unittest.TestCase ):
+
+    def testDiscardedCounts( self ):
+        samples = [ [ 50, 60, 10, 11, float( 'inf' ), 12, -1, 2000 ],
+                    [ 40, 10, 11, numpy.nan, 12, 10, 11, 10 ] ]
+        data, discarded = latencystats.filterSamples( samples, warmUp=2,
+                                                      lower=0, upper=1000 )
+        # The NaN left by a missing measurement is not counted
+        self.assertEqual( discarded, { 'warmUp': 4, 'invalid': 1,
+                                       'threshold': 2, 'outlier': 0 } )
+        self.assertEqual( int( numpy.count_nonzero( ~numpy.isnan( data ) ) ),
+                          8 )
+
+    def testOutliers( self ):
+        samples = [ 10, 11, 12, 10, 11, 300 ]
+        for rule in ( 'iqr', 'mad', 'sigma' ):
+            factor = 2 if rule == 'sigma' else None
+            data, discarded = latencystats.filterSamples(
+                samples, outliers=rule, outlierFactor=factor )
+            self.assertEqual( discarded[ 'outlier' ], 1, rule )
+            self.assertTrue( numpy.isnan( data[ 0 ][ 5 ] ), rule )
+
+    def testUnknownOutlierRule( self ):
+        self.assertRaises( ValueError, latencystats.filterSamples, [ 1, 2 ],
+                           outliers='bogus' )
+
+
+class SummarizeTest( unittest.TestCase ):
+
+    def testNodesAndTotal( self ):
+        samples = latencystats.emptyMatrix( 2, 4 )
+        samples[ 0 ] = [ 100, 10, 20, 30 ]
+        samples[ 1 ][ 1: ] = [ 40, 50, 60 ]
+        record = latencystats.summarize( "latency", samples, warmUp=1 )
+        self.assertEqual( record[ 'count' ], 6 )
+        self.assertAlmostEqual( record[ 'mean' ], 35.0 )
+        self.assertEqual( record[ 'discarded' ][ 'warmUp' ], 1 )
+        self.assertEqual( [ node[ 'count' ] for node in record[ 'nodes' ] ],
+                          [ 3, 3 ] )
+        self.assertAlmostEqual( record[ 'nodes' ][ 0 ][ 'mean' ], 20.0 )
+        self.assertAlmostEqual( record[ 'nodes' ][ 1 ][ 'mean' ], 50.0 )
+        self.assertEqual( record[ 'unit' ], 'ms' )
+        self.assertTrue( record[ 'ciLow' ] < 35.0 < record[ 'ciHigh' ] )
+
+    def testEmptyMatrix( self ):
+        for samples in ( latencystats.emptyMatrix( 3, 5 ),
+                         latencystats.emptyMatrix( 0, 5 ), [] ):
+            record = latencystats.summarize( "empty", samples )
+            self.assertEqual( record[ 'count' ], 0 )
+            for key in latencystats.statKeys:
+                if key != 'count':
+                    self.assertTrue( math.isnan( record[ key ] ), key )
+            for node in record[ 'nodes' ]:
+                self.assertEqual( node[ 'count' ], 0 )
+            # Reporting an empty record must not fail
+            self.assertTrue( latencystats.summaryLines( record ) )
+
+    def testAllFiltered( self ):
+        record = latencystats.summarize( "filtered", [ [ 5, 6, 7 ] ],
+                                         upper=1 )
+        self.assertEqual( record[ 'count' ], 0 )
+        self.assertEqual( record[ 'discarded' ][ 'threshold' ], 3 )
+        self.assertTrue( math.isnan( record[ 'mean' ] ) )
+
+
+class TCriticalTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.scipyStats = latencystats.scipyStats
+        latencystats.scipyStats = None
+
+    def tearDown( self ):
+        latencystats.scipyStats = self.scipyStats
+
+    def testTable( self ):
+        values = latencystats.tCritical( [ 0, 1, 9, 29, 30, 100 ], 0.95 )
+        self.assertTrue( math.isnan( values[ 0 ] ) )
+        for value, expected in zip( values[ 1: ],
+                                    [ 12.706, 2.262, 2.045, 2.042, 1.960 ] ):
+            self.assertAlmostEqual( value, expected )
+
+    def testOtherLevels( self ):
+        self.assertAlmostEqual( latencystats.tCritical( [ 4 ], 0.99 )[ 0 ],
+                                4.604 )
+        self.assertAlmostEqual( latencystats.tCritical( [ 40 ], 0.90 )[ 0 ],
+                                1.645 )
+
+    def testUnknownLevel( self ):
+        self.assertRaises( ValueError, latencystats.tCritical, [ 4 ], 0.8 )
+
+    def testConfidenceInterval( self ):
+        record = latencystats.summarize( "ci", [ 10, 12, 14 ] )
+        # mean 12, sample std 2, t( 2 ) = 4.303
+        margin = 4.303 * 2 / math.sqrt( 3 )
+        self.assertAlmostEqual( record[ 'ciLow' ], 12 - margin )
+        self.assertAlmostEqual( record[ 'ciHigh' ], 12 + margin )
+
+
+if __name__ == '__main__':
+    unittest.main()
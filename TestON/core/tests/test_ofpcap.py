@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+'''
+Tests of core.ofpcap on a small capture of an OpenFlow 1.3 connection to
+port 6633, saved both as a pcap file ( Ethernet, microseconds, ending with
+a truncated packet ) and as a pcapng file ( Linux cooked capture,
+nanoseconds ). The switch connects at 1500000000 seconds, and the capture
+has:
+    - the FEATURES_REPLY split across two segments, the first one
+      retransmitted
+    - a FIN retransmitting the end of the last ROLE_REPLY along with a new
+      ECHO_REQUEST, acknowledged by the FIN of the controller
+'''
+import os
+import unittest
+
+from core import ofpcap
+
+dataPath = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ),
+                         'data' )
+start = 1500000000000.0
+
+
+class EventTimesTest( unittest.TestCase ):
+
+    expected = { 'SYN': [ 0.0 ],
+                 'SYN_ACK': [ 1.0 ],
+                 'HELLO': [ 3.0, 4.0 ],
+                 'FEATURES_REQUEST': [ 4.0 ],
+                 'FEATURES_REPLY': [ 12.0 ],
+                 'ROLE_REQUEST': [ 20.0 ],
+                 'ROLE_REPLY': [ 30.0, 40.0 ],
+                 'PORT_STATUS': [ 31.0 ],
+                 'ECHO_REQUEST': [ 1000.0 ],
+                 'FIN': [ 1000.0, 1001.0 ],
+                 'FIN_ACKED': [ 1001.0, 1002.0 ] }
+
+    def assertTimes( self, fileName ):
+        times = ofpcap.eventTimes( os.path.join( dataPath, fileName ) )
+        self.assertEqual( sorted( times ), sorted( self.expected ) )
+        for name, values in self.expected.items():
+            self.assertEqual( len( times[ name ] ), len( values ), name )
+            for value, expected in zip( times[ name ], values ):
+                self.assertAlmostEqual( value - start, expected, places=3,
+                                        msg=name )
+
+    def testPcap( self ):
+        self.assertTimes( 'ofcapture.pcap' )
+
+    def testPcapng( self ):
+        self.assertTimes( 'ofcapture.pcapng' )
+
+    def testNames( self ):
+        times = ofpcap.eventTimes( os.path.join( dataPath, 'ofcapture.pcap' ),
+                                   names=[ 'SYN', 'PORT_STATUS' ] )
+        self.assertEqual( sorted( times ), [ 'PORT_STATUS', 'SYN' ] )
+
+    def testOtherPort( self ):
+        times = ofpcap.eventTimes( os.path.join( dataPath, 'ofcapture.pcap' ),
+                                   ofPort=6653 )
+        self.assertEqual( times, {} )
+
+    def testEventFields( self ):
+        events = list( ofpcap.iterEvents(
+            os.path.join( dataPath, 'ofcapture.pcap' ) ) )
+        reply = [ event for event in events
+                  if event[ 'name' ] == 'FEATURES_REPLY' ][ 0 ]
+        self.assertEqual( reply[ 'src' ], '10.0.0.5:40000' )
+        self.assertEqual( reply[ 'dst' ], '10.0.0.1:6633' )
+        self.assertEqual( reply[ 'version' ], 4 )
+        self.assertEqual( reply[ 'type' ], 6 )
+
+
+if __name__ == '__main__':
+    unittest.main()
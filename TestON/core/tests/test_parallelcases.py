@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+'''
+Tests of the test cases run in parallel by core.teston.TestON
+'''
+import __builtin__
+import threading
+import time
+import unittest
+
+from core import teston
+from core.steptimer import StepTimer
+
+
+class FakeLog:
+
+    def __getattr__( self, name ):
+        return lambda *args, **kwargs: None
+
+
+class FakeLogger:
+
+    def updateCaseResults( self, main ):
+        pass
+
+
+class FakeCli:
+    pause = False
+    stop = False
+
+
+class FakeDriver( object ):
+
+    def __init__( self ):
+        self.busy = 0
+        self.overlaps = 0
+
+    def command( self, seconds=0.05 ):
+        self.busy += 1
+        if self.busy > 1:
+            self.overlaps += 1
+        time.sleep( seconds )
+        self.busy -= 1
+        return True
+
+    def send( self ):
+        return True
+
+    def fanOut( self ):
+        # Like OnosRestDriver.fetchAll, calls itself from worker threads
+        results = []
+        workers = [ threading.Thread( target=lambda: results.append( self.send() ) )
+                    for i in range( 3 ) ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join( 5 )
+        return len( results ) == 3
+
+
+def compileSteps( cases ):
+    code = {}
+    for case, steps in cases.items():
+        code[ case ] = dict( ( index, compile( source, "CASE" + case, "exec" ) )
+                             for index, source in enumerate( steps ) )
+    return code
+
+
+class ParallelCasesTest( unittest.TestCase ):
+
+    def setUp( self ):
+        main = teston.TestON.__new__( teston.TestON )
+        main.caseLocal = threading.local()
+        main.caseShared = {}
+        main.caseOutput = None
+        main.resultLock = threading.Lock()
+        main.componentLocks = {}
+        main.componentDictionary = { 'Fake1': {} }
+        main.Fake1 = FakeDriver()
+        main.Fake1log = FakeLog()
+        main.log = FakeLog()
+        main.logger = FakeLogger()
+        main.timer = StepTimer()
+        main.profileCases = None
+        main.resultSinks = {}
+        main.params = {}
+        main.testCaseResult = {}
+        main.TRUE = 1
+        main.FALSE = 0
+        main.NORESULT = 2
+        main.stepCache = ""
+        self.main = main
+        self.saved = ( getattr( __builtin__, 'main', None ),
+                       getattr( teston, 'cli', None ),
+                       dict( teston.module.__dict__ ) )
+        __builtin__.main = main
+        teston.cli = FakeCli()
+        teston.module.__dict__[ 'results' ] = {}
+
+    def tearDown( self ):
+        __builtin__.main, teston.cli, moduleGlobals = self.saved
+        teston.module.__dict__.clear()
+        teston.module.__dict__.update( moduleGlobals )
+
+    def testCaseGlobals( self ):
+        # Both cases write 'value', case 1 reads it back after case 2 wrote
+        self.main.code = compileSteps( {
+            '1': [ "value = 1\nimport time\ntime.sleep( 0.2 )\n" +
+                   "results[ 1 ] = value\n" ],
+            '2': [ "import time\ntime.sleep( 0.1 )\nvalue = 2\n" +
+                   "results[ 2 ] = value\n" ] } )
+        result = self.main.runParallelCases( [ '1', '2' ] )
+        self.assertEqual( result, self.main.TRUE )
+        self.assertEqual( teston.module.results, { 1: 1, 2: 2 } )
+        # The names set by the cases are kept, in the order of the cases
+        self.assertEqual( teston.module.value, 2 )
+
+    def testComponentLock( self ):
+        step = "main.Fake1.command()\nmain.Fake1.command()\n"
+        self.main.code = compileSteps( { '1': [ step ], '2': [ step ] } )
+        self.main.runParallelCases( [ '1', '2' ] )
+        self.assertEqual( self.main.Fake1.overlaps, 0 )
+
+    def testFanOut( self ):
+        self.main.code = compileSteps( {
+            '1': [ "results[ 1 ] = main.Fake1.fanOut()\n" ],
+            '2': [ "results[ 2 ] = main.Fake1.fanOut()\n" ] } )
+        thread = threading.Thread( target=self.main.runParallelCases,
+                                   args=[ [ '1', '2' ] ] )
+        thread.daemon = True
+        thread.start()
+        thread.join( 10 )
+        self.assertFalse( thread.isAlive(), "Deadlock in the fan-out" )
+        self.assertEqual( teston.module.results, { 1: True, 2: True } )
+
+    def testMethodsRestored( self ):
+        driver = self.main.Fake1
+        self.main.code = compileSteps( {
+            '1': [ "results[ 1 ] = main.Fake1.command.im_class\n" ],
+            '2': [ "results[ 2 ] = main.Fake1.send.im_self\n" ] } )
+        self.main.runParallelCases( [ '1', '2' ] )
+        # Bound like the driver methods, for main.Thread error reports
+        self.assertEqual( teston.module.results,
+                          { 1: FakeDriver, 2: driver } )
+        self.assertFalse( 'command' in vars( driver ) )
+        self.assertEqual( driver.command.im_func, FakeDriver.command.im_func )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+'''
+Tests of core.resultsink
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from core import resultsink
+from core.resultsink import ResultSink
+
+schema = [ ( "commit", str ), ( "scale", int ), ( "rate", float ) ]
+
+
+class SqlValuesTest( unittest.TestCase ):
+
+    def testValues( self ):
+        self.assertEqual( resultsink.sqlValue( None ), "NULL" )
+        self.assertEqual( resultsink.sqlValue( float( 'nan' ) ), "NULL" )
+        self.assertEqual( resultsink.sqlValue( float( '-inf' ) ), "NULL" )
+        self.assertEqual( resultsink.sqlValue( "it's" ), "'it''s'" )
+        self.assertEqual( resultsink.sqlValue( 3 ), "3" )
+        self.assertEqual( resultsink.sqlValue( 2 ** 40 ), "1099511627776" )
+        self.assertEqual( resultsink.sqlValue( 1234.5 ), "1234.5" )
+
+    def testParse( self ):
+        rows = resultsink.parseSqlValues( "'a,b',1,NULL\n'it''s','x\ny',2.5\n" )
+        self.assertEqual( rows, [ [ 'a,b', '1', None ],
+                                  [ "it's", 'x\ny', '2.5' ] ] )
+        self.assertRaises( ValueError, resultsink.parseSqlValues, "'open" )
+
+
+class ResultSinkTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown( self ):
+        shutil.rmtree( self.dir )
+
+    def sink( self, name, **options ):
+        return ResultSink( os.path.join( self.dir, name ), schema, **options )
+
+    def testSqlValuesRoundTrip( self ):
+        sink = self.sink( "DB", backend="csv", header=False,
+                          dialect="sqlvalues" )
+        records = [ { 'commit': "a'b,c", 'scale': 3, 'rate': 1234.5 },
+                    { 'commit': "NULL", 'scale': None, 'rate': None },
+                    { 'commit': None, 'scale': 5, 'rate': float( 'nan' ) } ]
+        for record in records:
+            sink.add( record )
+        self.assertEqual( sink.readAll(), [] )
+        self.assertEqual( sink.flush(), 3 )
+        with open( sink.path ) as f:
+            self.assertEqual( f.read(), "'a''b,c',3,1234.5\n" +
+                                        "'NULL',NULL,NULL\n" +
+                                        "NULL,5,NULL\n" )
+        records[ 2 ][ 'rate' ] = None
+        self.assertEqual( sink.readAll(), records )
+        # A new sink appends to the same file
+        other = self.sink( "DB", backend="csv", header=False,
+                           dialect="sqlvalues" )
+        other.add( commit="d", scale=1, rate=2 )
+        other.flush()
+        self.assertEqual( len( other.readAll() ), 4 )
+
+    def testBackends( self ):
+        for name in ( "results.csv", "results.jsonl", "results.db" ):
+            sink = self.sink( name )
+            sink.add( commit="a", scale="3", rate=10 )
+            sink.add( commit="b", scale=3.0, rate=None )
+            sink.flush()
+            self.assertEqual( sink.readAll(),
+                              [ { 'commit': 'a', 'scale': 3, 'rate': 10.0 },
+                                { 'commit': 'b', 'scale': 3, 'rate': None } ],
+                              name )
+            sink.clear()
+            self.assertEqual( sink.readAll(), [], name )
+
+    def testCoerce( self ):
+        sink = self.sink( "results.csv" )
+        self.assertRaises( ValueError, sink.add, scale=2.5 )
+        self.assertRaises( TypeError, sink.add, commit=1 )
+        self.assertRaises( ValueError, sink.add, unknown=1 )
+        self.assertEqual( sink.pending(), [] )
+
+    def testBaseline( self ):
+        sink = self.sink( "results.jsonl" )
+        for rate in ( 100, 200, float( 'nan' ), float( 'inf' ), None, 300 ):
+            sink.add( commit="a", scale=1, rate=rate )
+        sink.add( commit="a", scale=3, rate=1000 )
+        sink.flush()
+        self.assertEqual( sink.baseline( "rate", scale=1 ), 200.0 )
+        self.assertEqual( sink.baseline( "rate", last=1, scale=1 ), 300.0 )
+        self.assertEqual( sink.baseline( "rate", scale=5 ), None )
+        result = sink.compare( { 'commit': "b", 'scale': 1, 'rate': 220.0 },
+                               [ "rate" ], [ "scale" ] )
+        self.assertEqual( result[ 'rate' ][ 'baseline' ], 200.0 )
+        self.assertAlmostEqual( result[ 'rate' ][ 'change' ], 0.1 )
+
+
+if __name__ == '__main__':
+    unittest.main()
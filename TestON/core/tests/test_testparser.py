@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+'''
+Tests of the compiled step cache of core.testparser
+'''
+import os
+import shutil
+import tempfile
+import unittest
+
+from core import testparser
+
+script = '''
+class CacheTest:
+
+    def __init__( self ):
+        self.default = ''
+
+    def CASE1( self, main ):
+        result = []
+        main.step( "First step" )
+        result.append( %s )
+'''
+
+
+class FakeMain:
+
+    def step( self, description ):
+        pass
+
+
+class StepCacheTest( unittest.TestCase ):
+
+    def setUp( self ):
+        self.dir = tempfile.mkdtemp()
+        self.testFile = os.path.join( self.dir, "CacheTest.py" )
+        self.cacheFile = os.path.join( self.dir, ".CacheTest.py.stepcache" )
+
+    def tearDown( self ):
+        shutil.rmtree( self.dir )
+
+    def writeScript( self, value ):
+        with open( self.testFile, 'w' ) as f:
+            f.write( script % value )
+
+    def stepResult( self ):
+        code = testparser.TestParser( self.testFile ).getCompiledStepCode()
+        namespace = { 'main': FakeMain() }
+        exec code[ '1' ][ 0 ] in namespace
+        exec code[ '1' ][ 1 ] in namespace
+        return namespace[ 'result' ]
+
+    def testCacheIsUsed( self ):
+        self.writeScript( "1" )
+        self.assertEqual( self.stepResult(), [ 1 ] )
+        self.assertTrue( os.path.exists( self.cacheFile ) )
+        parser = testparser.TestParser( self.testFile )
+
+        def noParse():
+            self.fail( "An unchanged script was parsed again" )
+        parser.getStepCode = noParse
+        self.assertEqual( sorted( parser.getCompiledStepCode()[ '1' ] ),
+                          [ 0, 1 ] )
+
+    def testScriptChange( self ):
+        self.writeScript( "1" )
+        self.assertEqual( self.stepResult(), [ 1 ] )
+        self.writeScript( "2" )
+        self.assertEqual( self.stepResult(), [ 2 ] )
+        # The cache now holds the new script
+        parser = testparser.TestParser( self.testFile )
+        parser.getStepCode = None
+        self.assertTrue( parser.getCompiledStepCode() )
+
+    def testCorruptCache( self ):
+        self.writeScript( "3" )
+        with open( self.cacheFile, 'wb' ) as f:
+            f.write( "not a marshal file" )
+        self.assertEqual( self.stepResult(), [ 3 ] )
+
+    def testSyntaxErrorKeptAsSource( self ):
+        self.writeScript( "1 +" )
+        code = testparser.TestParser( self.testFile ).getCompiledStepCode()
+        self.assertTrue( isinstance( code[ '1' ][ 1 ], basestring ) )
+        self.assertRaises( SyntaxError, self.stepResult )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,10 +18,14 @@ Created on 07-08-2015
 """
 import json
 import os
+import Queue
 import requests
+import threading
+import time
 import types
 
 from drivers.common.api.controllerdriver import Controller
+from core import jsonparser
 
 
 class OnosRestDriver( Controller ):
@@ -32,12 +36,21 @@ class OnosRestDriver( Controller ):
         self.port = "8080"
         self.user_name = "user"
         self.password = "CHANGEME"
+        self.sessions = {}
+        self.sessionLock = threading.Lock()
+        self.poolSize = 10
+        self.timeout = None
 
     def connect( self, **connectargs ):
         try:
             for key in connectargs:
                 vars( self )[ key ] = connectargs[ key ]
             self.name = self.options[ 'name' ]
+            # HTTP session options from the .topo file
+            if self.options.get( 'pool_size' ):
+                self.poolSize = int( self.options[ 'pool_size' ] )
+            if self.options.get( 'timeout' ):
+                self.timeout = float( self.options[ 'timeout' ] )
         except Exception as e:
             main.log.exception( e )
         try:
@@ -55,8 +68,61 @@ class OnosRestDriver( Controller ):
         self.handle = super( OnosRestDriver, self ).connect()
         return self.handle
 
+    def disconnect( self ):
+        """
+        Close the HTTP sessions opened by this driver
+        """
+        with self.sessionLock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+        return main.TRUE
+
+    def getSession( self, ip, port ):
+        """
+        Returns the keep-alive HTTP session used to send requests to the
+        given ONOS node, creating it on first use. Each session keeps up to
+        'pool_size' ( from the .topo file, default 10 ) connections open.
+        """
+        key = ( str( ip ), str( port ) )
+        with self.sessionLock:
+            session = self.sessions.get( key )
+            if session is None:
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter( pool_connections=1,
+                                                         pool_maxsize=self.poolSize )
+                session.mount( "http://", adapter )
+                self.sessions[ key ] = session
+            return session
+
+    def sessionStats( self ):
+        """
+        Returns a dictionary of "ip:port" to the number of requests sent
+        over the HTTP session of that node, the number of TCP connections
+        opened for them and the number of requests which reused an
+        already open connection.
+        """
+        stats = {}
+        with self.sessionLock:
+            sessions = self.sessions.items()
+        for key, session in sessions:
+            adapter = session.get_adapter( "http://" )
+            pools = adapter.poolmanager.pools
+            requestCount = 0
+            connections = 0
+            for poolKey in pools.keys():
+                pool = pools.get( poolKey )
+                if pool is None:
+                    continue
+                requestCount += getattr( pool, "num_requests", 0 )
+                connections += getattr( pool, "num_connections", 0 )
+            stats[ key[ 0 ] + ":" + key[ 1 ] ] = { "requests": requestCount,
+                                                   "connections": connections,
+                                                   "reused": max( requestCount - connections, 0 ) }
+        return stats
+
     def send( self, ip, port, url, base="/onos/v1", method="GET",
-              query=None, data=None ):
+              query=None, data=None, returnHeaders=False ):
         """
         Arguments:
             str ip: ONOS IP Address
@@ -69,6 +135,7 @@ class OnosRestDriver( Controller ):
             dict query: Dictionary to be sent in the query string for
                          the request
             dict data: Dictionary to be sent in the body of the request
+            bool returnHeaders: Also return the headers of the response
         """
         # TODO: Authentication - simple http (user,pass) tuple
         # TODO: should we maybe just pass kwargs straight to response?
@@ -78,12 +145,16 @@ class OnosRestDriver( Controller ):
             path = "http://" + str( ip ) + ":" + str( port ) + base + url
             main.log.info( "Sending request " + path + " using " +
                            method.upper() + " method." )
-            response = requests.request( method.upper(),
-                                         path,
-                                         params=query,
-                                         data=data )
+            response = self.getSession( ip, port ).request( method.upper(),
+                                                            path,
+                                                            params=query,
+                                                            data=data,
+                                                            timeout=self.timeout )
+            if returnHeaders:
+                return ( response.status_code, response.text.encode( 'utf8' ),
+                         response.headers )
             return ( response.status_code, response.text.encode( 'utf8' ) )
-        except requests.exceptions:
+        except requests.exceptions.RequestException:
             main.log.exception( "Error sending request." )
             return None
         except Exception as e:
@@ -91,6 +162,75 @@ class OnosRestDriver( Controller ):
             return None
         # FIXME: add other exceptions
 
+    def fetchAll( self, ips, url, port="DEFAULT", base="/onos/v1",
+                  query=None ):
+        """
+        Description:
+            Sends the same GET request to several ONOS nodes at once, one
+            thread per node, so a cluster wide snapshot takes about one
+            request time instead of one per node.
+        Required:
+            list ips - IP addresses of the ONOS nodes
+            str url - ONOS REST url path, relative to base. IE "/intents"
+        Optional:
+            str port - ONOS REST port of the nodes, defaults to the port
+                       from the topo file
+            str base - The base url of the REST api
+            dict query - Dictionary to be sent in the query string
+        Returns:
+            A dictionary keyed by node ip. Each value is a dictionary with
+            'status' ( HTTP status code or None if the request failed ),
+            'json' ( the parsed response body, or None if it could not be
+            parsed ) and 'latency' ( seconds taken by the request );
+            Returns None for exception
+        """
+        try:
+            if port == "DEFAULT":
+                port = self.port
+            results = {}
+
+            def fetch( ip ):
+                start = time.time()
+                response = self.send( ip, port, url=url, base=base,
+                                      query=query )
+                latency = time.time() - start
+                status = None
+                output = None
+                if response:
+                    status = response[ 0 ]
+                    if 200 <= status <= 299:
+                        try:
+                            output = json.loads( response[ 1 ] )
+                        except ValueError:
+                            main.log.error( self.name + ": Could not parse " +
+                                            "the response of " + str( ip ) +
+                                            ": " + repr( response[ 1 ] ) )
+                    else:
+                        main.log.error( "Error with REST request to " +
+                                        str( ip ) + ", response was: " +
+                                        str( response ) )
+                results[ ip ] = { "status": status,
+                                  "json": output,
+                                  "latency": latency }
+
+            threads = []
+            for ip in ips:
+                t = main.Thread( target=fetch,
+                                 name="fetchAll-" + str( ip ),
+                                 args=[ ip ] )
+                threads.append( t )
+                t.start()
+            for t in threads:
+                t.join()
+            for ip in ips:
+                # The thread died without storing a result
+                results.setdefault( ip, { "status": None, "json": None,
+                                          "latency": None } )
+            return results
+        except Exception as e:
+            main.log.exception( e )
+            return None
+
     def intents( self, ip="DEFAULT", port="DEFAULT" ):
         """
         Description:
@@ -124,6 +264,36 @@ class OnosRestDriver( Controller ):
             main.log.exception( e )
             return None
 
+    def iterResponse( self, url, key, ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Yields the elements of the array under key in the response of
+            the url, parsing them one at a time instead of the whole
+            response at once. Raises ValueError if the request failed.
+        """
+        if ip == "DEFAULT":
+            main.log.warn( "No ip given, reverting to ip from topo file" )
+            ip = self.ip_address
+        if port == "DEFAULT":
+            main.log.warn( "No port given, reverting to port " +
+                           "from topo file" )
+            port = self.port
+        response = self.send( ip, port, url=url )
+        if not response or not 200 <= response[ 0 ] <= 299:
+            main.log.error( "Error with REST request, response was: " +
+                            str( response ) )
+            raise ValueError( "Error with REST request to " + url )
+        for element in jsonparser.iterArray( response[ 1 ], key=key ):
+            yield element
+
+    def iterIntents( self, ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Yields the intents one at a time instead of parsing the whole
+            intents response at once
+        """
+        return self.iterResponse( "/intents", 'intents', ip=ip, port=port )
+
     def intent( self, intentId, appId="org.onosproject.cli",
                 ip="DEFAULT", port="DEFAULT" ):
         """
@@ -364,6 +534,20 @@ class OnosRestDriver( Controller ):
             main.log.exception( e )
             return None
 
+    def hostIntentJson( self, hostIdOne, hostIdTwo,
+                        appId='org.onosproject.cli' ):
+        """
+        Returns the REST body of a host-to-host intent between the two hosts
+        """
+        return { "two": str( hostIdTwo ),
+                 "selector": { "criteria": [] }, "priority": 7,
+                 "treatment": { "deferred": [], "instructions": [] },
+                 "appId": appId, "one": str( hostIdOne ),
+                 "type": "HostToHostIntent",
+                 "constraints": [ { "type": "LinkTypeConstraint",
+                                    "types": [ "OPTICAL" ],
+                                    "inclusive": 'false' } ] }
+
     def addHostIntent( self, hostIdOne, hostIdTwo, appId='org.onosproject.cli',
                        ip="DEFAULT", port="DEFAULT" ):
         """
@@ -380,14 +564,7 @@ class OnosRestDriver( Controller ):
             error on requests; Returns None for exceptions
         """
         try:
-            intentJson = {"two": str( hostIdTwo ),
-                          "selector": {"criteria": []}, "priority": 7,
-                          "treatment": {"deferred": [], "instructions": []},
-                          "appId": appId, "one": str( hostIdOne ),
-                          "type": "HostToHostIntent",
-                          "constraints": [{"type": "LinkTypeConstraint",
-                                           "types": ["OPTICAL"],
-                                           "inclusive": 'false' }]}
+            intentJson = self.hostIntentJson( hostIdOne, hostIdTwo, appId )
             output = None
             if ip == "DEFAULT":
                 main.log.warn( "No ip given, reverting to ip from topo file" )
@@ -597,6 +774,176 @@ class OnosRestDriver( Controller ):
             main.log.exception( e )
             return None
 
+    def sendConcurrent( self, requestList, ip, port ):
+        """
+        Description:
+            Sends many requests to one ONOS node at once, using up to
+            'pool_size' threads sharing the HTTP session of the node
+        Required:
+            list requestList - List of ( method, url, data ) tuples
+            str ip - ONOS IP Address
+            str port - ONOS REST Port
+        Returns:
+            A list, in the order of requestList, of ( response, latency )
+            tuples where response is ( status, body, headers ) or None if
+            the request failed and latency is the seconds the request took
+        """
+        results = [ ( None, None ) ] * len( requestList )
+        pending = Queue.Queue()
+        for index in range( len( requestList ) ):
+            pending.put( index )
+
+        def worker():
+            while True:
+                try:
+                    index = pending.get_nowait()
+                except Queue.Empty:
+                    return
+                method, url, data = requestList[ index ]
+                start = time.time()
+                response = self.send( ip, port, url=url, method=method,
+                                      data=data, returnHeaders=True )
+                results[ index ] = ( response, time.time() - start )
+
+        threads = []
+        for i in range( min( self.poolSize, len( requestList ) ) ):
+            t = main.Thread( target=worker,
+                             name="sendConcurrent-" + str( i ) )
+            threads.append( t )
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def addIntents( self, intentJsons, ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Adds many intents at once with concurrent POST requests
+        Required:
+            list intentJsons - List of intent REST bodies, as dictionaries
+        Returns:
+            A dictionary with 'ids', the list of the created intent IDs in
+            the order of intentJsons ( None for the intents which failed ),
+            and 'latency', the seconds each POST request took;
+            Returns None for exception
+        """
+        try:
+            if ip == "DEFAULT":
+                main.log.warn( "No ip given, reverting to ip from topo file" )
+                ip = self.ip_address
+            if port == "DEFAULT":
+                main.log.warn( "No port given, reverting to port " +
+                               "from topo file" )
+                port = self.port
+            requestList = [ ( "POST", "/intents", json.dumps( intentJson ) )
+                            for intentJson in intentJsons ]
+            ids = []
+            latency = []
+            for response, seconds in self.sendConcurrent( requestList,
+                                                          ip, port ):
+                latency.append( seconds )
+                if not response or not 200 <= response[ 0 ] <= 299:
+                    main.log.error( "Error with REST request, response was: " +
+                                    str( response ) )
+                    ids.append( None )
+                    continue
+                # The location of the new intent ends with its decimal id
+                location = response[ 2 ].get( 'location', "" )
+                intentId = location.rstrip( "/" ).split( "/" )[ -1 ]
+                try:
+                    intentId = hex( int( intentId ) ).rstrip( "L" )
+                except ValueError:
+                    pass
+                ids.append( intentId or None )
+            main.log.info( self.name + ": Added " +
+                           str( len( ids ) - ids.count( None ) ) + " of " +
+                           str( len( ids ) ) + " intents" )
+            return { 'ids': ids, 'latency': latency }
+        except Exception as e:
+            main.log.exception( e )
+            return None
+
+    def addHostIntents( self, hostPairs, appId='org.onosproject.cli',
+                        ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Adds many host-to-host intents at once with concurrent POST
+            requests
+        Required:
+            hostPairs - List of ( hostIdOne, hostIdTwo ) tuples
+        Optional:
+            str appId - Application name of intent identifier
+        Returns:
+            A dictionary with 'ids', the list of the created intent IDs in
+            the order of hostPairs ( None for the intents which failed ),
+            and 'latency', the seconds each POST request took;
+            Returns None for exception
+        """
+        try:
+            intentJsons = [ self.hostIntentJson( hostIdOne, hostIdTwo, appId )
+                            for hostIdOne, hostIdTwo in hostPairs ]
+            return self.addIntents( intentJsons, ip=ip, port=port )
+        except Exception as e:
+            main.log.exception( e )
+            return None
+
+    def removeIntents( self, intentIds, appId='org.onosproject.cli',
+                       ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Removes many intents at once with concurrent DELETE requests
+        Required:
+            intentIds - List of intent IDs in hexadecimal form
+        Optional:
+            str appId - Application name of intent identifier
+        Returns:
+            A dictionary with 'result', the list of main.TRUE or main.FALSE
+            of each removal in the order of intentIds, and 'latency', the
+            seconds each DELETE request took ( None for the invalid IDs,
+            which are not sent ); Returns None for exception
+        """
+        try:
+            if ip == "DEFAULT":
+                main.log.warn( "No ip given, reverting to ip from topo file" )
+                ip = self.ip_address
+            if port == "DEFAULT":
+                main.log.warn( "No port given, reverting to port " +
+                               "from topo file" )
+                port = self.port
+            # NOTE: REST url requires the intent id to be in decimal form
+            requestList = []
+            valid = []
+            for intentId in intentIds:
+                try:
+                    requestList.append( ( "DELETE", "/intents/" + str( appId ) +
+                                          "/" + str( int( intentId, 16 ) ),
+                                          None ) )
+                    valid.append( True )
+                except ( TypeError, ValueError ):
+                    main.log.error( self.name + ": Invalid intent id " +
+                                    repr( intentId ) )
+                    valid.append( False )
+            responses = iter( self.sendConcurrent( requestList, ip, port ) )
+            results = []
+            latency = []
+            for isValid in valid:
+                if not isValid:
+                    results.append( main.FALSE )
+                    latency.append( None )
+                    continue
+                response, seconds = next( responses )
+                latency.append( seconds )
+                if response and 200 <= response[ 0 ] <= 299:
+                    results.append( main.TRUE )
+                else:
+                    main.log.error( "Error with REST request, response was: " +
+                                    str( response ) )
+                    results.append( main.FALSE )
+            return { 'result': results, 'latency': latency }
+        except Exception as e:
+            main.log.exception( e )
+            return None
+
     def getIntentsId( self, ip="DEFAULT", port="DEFAULT" ):
         """
         Returns a list of intents id; Returns None for exception
@@ -921,6 +1268,19 @@ class OnosRestDriver( Controller ):
             main.log.exception( e )
             return None
 
+    def iterFlows( self, device="", ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Yields the flows one at a time instead of parsing the whole
+            flows response at once
+        Optional:
+            str device - only get the flows of this device
+        """
+        url = "/flows"
+        if device:
+            url += "/" + device
+        return self.iterResponse( url, 'flows', ip=ip, port=port )
+
     def getFlows( self, device, flowId=0, ip="DEFAULT", port="DEFAULT" ):
         """
         Description:
@@ -1138,9 +1498,8 @@ class OnosRestDriver( Controller ):
                           Returns None for exception
         """
         try:
-            tempFlows = json.loads( self.flows( ip=ip, port=port ) )
             returnValue = main.TRUE
-            for flow in tempFlows:
+            for flow in self.iterFlows( ip=ip, port=port ):
                 if flow.get( 'state' ) != 'ADDED':
                     main.log.info( self.name + ": flow Id: " +
                                    str( flow.get( 'groupId' ) ) +
@@ -1148,7 +1507,7 @@ class OnosRestDriver( Controller ):
                                    str( flow.get( 'state' ) ) )
                     returnValue = main.FALSE
             return returnValue
-        except TypeError:
+        except ( TypeError, ValueError ):
             main.log.exception( self.name + ": Object not as expected" )
             return main.FALSE
         except Exception as e:
@@ -1158,3 +1517,141 @@ class OnosRestDriver( Controller ):
             main.log.exception( self.name + ": Uncaught exception!" )
             main.cleanup()
             main.exit()
+
+    def waitForConvergence( self, intentsId="ALL", expectedState='INSTALLED',
+                            checkFlows=True, timeout=60, sleep=1, maxSleep=8,
+                            fetchThreshold=10, ip="DEFAULT", port="DEFAULT" ):
+        """
+        Description:
+            Wait for the intents to be in the expected state(s) and, if
+            checkFlows is True, for the flows to be ADDED. Objects which
+            already converged are not checked again, and the wait between
+            polls doubles up to maxSleep while nothing converges. Once
+            fetchThreshold or less intents are pending they are fetched one
+            by one, and pending flows are fetched by device.
+        Optional:
+            intentsId - List of intents ID to wait for, or "ALL" for all the
+                        intents in ONOS when the wait starts
+            expectedState - Expected state or list of expected states
+            checkFlows - Also wait for the flows to be ADDED
+            timeout - Seconds to wait before giving up
+            sleep - Seconds between the first polls
+            maxSleep - Maximum seconds between polls
+            fetchThreshold - Number of pending objects under which only the
+                             pending objects are fetched
+        Returns:
+            A dictionary with:
+            'result' - main.TRUE if everything converged before the timeout,
+                       otherwise main.FALSE
+            'intents' - dictionary of intent ID to the seconds it took to be
+                        in the expected state
+            'flows' - dictionary of "deviceId/flowId" to the seconds it took
+                      to be ADDED
+            'pending' - list of the intent IDs and flows which did not
+                        converge
+            Returns None for exception
+        """
+        try:
+            if ip == "DEFAULT":
+                main.log.warn( "No ip given, reverting to ip from topo file" )
+                ip = self.ip_address
+            if port == "DEFAULT":
+                main.log.warn( "No port given, reverting to port " +
+                               "from topo file" )
+                port = self.port
+            if isinstance( expectedState, types.StringType ):
+                expectedState = [ expectedState ]
+            expectedState = set( expectedState )
+            start = time.time()
+            intentTimes = {}
+            flowTimes = {}
+            # intent ID to application ID and flow key to device ID of the
+            # objects which did not converge yet
+            pendingIntents = None
+            pendingFlows = {} if checkFlows else None
+            delay = sleep
+            polls = 0
+            while True:
+                polls += 1
+                converged = 0
+                # Intents
+                if pendingIntents is None or \
+                        len( pendingIntents ) > fetchThreshold:
+                    intentsById = dict( ( intent.get( 'id' ), intent )
+                                        for intent in self.iterIntents( ip=ip,
+                                                                        port=port ) )
+                    if pendingIntents is None:
+                        if intentsId == "ALL":
+                            intentsId = intentsById.keys()
+                        pendingIntents = dict(
+                            ( intentId, intentsById.get( intentId, {} ).get(
+                                'appId', 'org.onosproject.cli' ) )
+                            for intentId in intentsId )
+                    states = dict( ( intentId, intentsById[ intentId ].get( 'state' ) )
+                                   for intentId in pendingIntents
+                                   if intentId in intentsById )
+                else:
+                    states = {}
+                    for intentId, appId in pendingIntents.items():
+                        intent = self.intent( intentId, appId=appId,
+                                              ip=ip, port=port )
+                        if intent:
+                            states[ intentId ] = intent.get( 'state' )
+                elapsed = time.time() - start
+                for intentId, state in states.items():
+                    if state in expectedState:
+                        intentTimes[ intentId ] = elapsed
+                        del pendingIntents[ intentId ]
+                        converged += 1
+                # Flows
+                if checkFlows:
+                    if polls == 1 or len( pendingFlows ) > fetchThreshold:
+                        flowsList = list( self.iterFlows( ip=ip, port=port ) )
+                    else:
+                        flowsList = []
+                        for device in set( pendingFlows.values() ):
+                            flowsList += list( self.iterFlows( device=device,
+                                                               ip=ip,
+                                                               port=port ) )
+                    elapsed = time.time() - start
+                    for flow in flowsList:
+                        key = str( flow.get( 'deviceId' ) ) + "/" + \
+                              str( flow.get( 'id' ) )
+                        if key in flowTimes:
+                            continue
+                        if flow.get( 'state' ) == 'ADDED':
+                            flowTimes[ key ] = elapsed
+                            if pendingFlows.pop( key, None ):
+                                converged += 1
+                        else:
+                            pendingFlows[ key ] = flow.get( 'deviceId' )
+                pending = pendingIntents.keys()
+                if checkFlows:
+                    pending += pendingFlows.keys()
+                remaining = timeout - ( time.time() - start )
+                if not pending or remaining <= 0:
+                    break
+                # Back off while nothing converges
+                delay = sleep if converged else min( delay * 2, maxSleep )
+                main.log.debug( self.name + ": " + str( len( pending ) ) +
+                                " objects did not converge yet, checking " +
+                                "again in " + str( delay ) + " seconds" )
+                time.sleep( min( delay, remaining ) )
+            if pending:
+                main.log.warn( self.name + ": " + str( len( pending ) ) +
+                               " objects did not converge after " +
+                               str( timeout ) + " seconds: " + str( pending ) )
+                result = main.FALSE
+            else:
+                main.log.info( self.name + ": Converged in " +
+                               str( round( time.time() - start, 3 ) ) +
+                               " seconds" )
+                result = main.TRUE
+            return { 'result': result, 'intents': intentTimes,
+                     'flows': flowTimes, 'pending': pending }
+        except ( TypeError, ValueError ):
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except Exception as e:
+            main.log.exception( e )
+            return None
@@ -33,6 +33,7 @@ from within your Mininet folder:
 changed when switching branches."""
 import pexpect
 import re
+import json
 import sys
 import types
 import os
@@ -51,6 +52,9 @@ class MininetCliDriver( Emulator ):
         self.name = None
         self.wrapped = sys.modules[ __name__ ]
         self.flag = 0
+        # Cached output of getTopology, see topologyChanged
+        self.topology = None
+        self.topologyNodes = {}
 
     def connect( self, **connectargs ):
         """
@@ -123,6 +127,7 @@ class MininetCliDriver( Emulator ):
                 main.TRUE if the mininet starts successfully, main.FALSE
                 otherwise
         """
+        self.topologyChanged()
         if self.handle:
             # make sure old networks are cleaned up
             main.log.info( self.name +
@@ -373,6 +378,172 @@ class MininetCliDriver( Emulator ):
             main.cleanup()
             main.exit()
 
+    def pingallParallel( self, hosts=None, sample=None, seed=None, count=1,
+                         wait=1, parallel=50, fping=False, acceptableFailed=0,
+                         timeout=300 ):
+        """
+        Verifies the reachability of the hosts by pinging from all of them
+        at once inside the Mininet process, instead of one pair at a time
+        like the pingall command.
+
+        Optional:
+            hosts - list of the names of the hosts to ping between, defaults
+                    to all the hosts
+            sample - only ping this many randomly chosen ( src, dst ) pairs,
+                     for large topologies
+            seed - seed of the random choice of the sampled pairs
+            count - number of pings per pair
+            wait - seconds to wait for each reply
+            parallel - number of source hosts pinging at the same time, each
+                       of them pings all its destinations at once
+            fping - use fping instead of ping, fping has to be installed on
+                    the machine running mininet
+            acceptableFailed - number of pairs which can fail for the result
+                               to still be main.TRUE
+            timeout - seconds to wait for all the pings to finish
+        Returns a dictionary with:
+            'result' - main.TRUE if at most acceptableFailed pairs lost a ping
+            'time' - seconds taken
+            'pairs' - number of pairs pinged
+            'failed' - sorted list of the ( src, dst ) pairs which lost a ping
+            'loss' - dictionary of src to dictionary of dst to the fraction
+                     of the pings lost
+            'rtt' - dictionary of src to dictionary of dst to the average
+                    round trip time in ms, None if no reply was received
+        Returns None on an error.
+        """
+        import time
+        if fping:
+            script = "fping -C " + str( count ) + " -t " +\
+                     str( int( wait * 1000 ) ) + " -q %s 2>&1"
+        else:
+            script = "for ip in %s; do ping -c " + str( count ) + " -W " +\
+                     str( wait ) + " -q $ip 2>&1 | sed \"s/^/$ip /\" & " +\
+                     "done; wait"
+        # Run by Mininet. Each chunk of sources pings all its destinations
+        # concurrently and the output of each source is kept by name
+        code = """
+import json, random
+pingNames = %(hosts)r
+pingHosts = [ h for h in net.hosts if pingNames is None or h.name in pingNames ]
+pingPairs = [ ( src, dst ) for src in pingHosts for dst in pingHosts if src is not dst ]
+if %(sample)r is not None and %(sample)r < len( pingPairs ):
+    pingPairs = random.Random( %(seed)r ).sample( pingPairs, %(sample)r )
+pingTargets = {}
+for src, dst in pingPairs:
+    pingTargets.setdefault( src, [] ).append( dst )
+pingSources = sorted( pingTargets, key=lambda h: h.name )
+pingOutputs = {}
+for i in range( 0, len( pingSources ), %(parallel)d ):
+    procs = [ ( src, src.popen( [ 'sh', '-c', %(script)r %% ' '.join( dst.IP() for dst in pingTargets[ src ] ) ] ) ) for src in pingSources[ i:i + %(parallel)d ] ]
+    for src, proc in procs:
+        pingOutputs[ src.name ] = proc.communicate()[ 0 ]
+pingResult = json.dumps( { 'pairs': [ [ src.name, dst.name, dst.IP() ] for src, dst in pingPairs ], 'outputs': pingOutputs } )
+""" % { 'hosts': hosts, 'sample': sample, 'seed': seed,
+        'parallel': parallel, 'script': script }
+        response = ""
+        try:
+            main.log.info( self.name + ": Checking reachability to the " +
+                           "hosts using parallel pings" )
+            startTime = time.time()
+            self.handle.sendline( "px exec " + repr( code ) )
+            self.handle.expect( "mininet>", timeout=timeout )
+            self.handle.sendline( "py pingResult" )
+            self.handle.expect( "mininet>", timeout=timeout )
+            response = self.handle.before
+            elapsed = time.time() - startTime
+            # The json output is the only part of the response with braces
+            start = response.find( '{"' )
+            if start == -1:
+                main.log.error( self.name + ": Could not read the ping " +
+                                "results" )
+                main.log.debug( response )
+                return None
+            output, end = json.JSONDecoder().raw_decode( response[ start: ] )
+        except pexpect.TIMEOUT:
+            main.log.error( self.name + ": Parallel pings did not finish " +
+                            "in " + str( timeout ) + " seconds" )
+            # NOTE: Send ctrl-c to make sure the pings are done
+            self.handle.sendline( "\x03" )
+            self.handle.expect( "mininet>" )
+            return None
+        except ValueError:
+            main.log.exception( self.name + ": Error parsing ping results" )
+            main.log.debug( response )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":     " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+        # ( src name, dst ip ) to ( fraction lost, average rtt )
+        stats = {}
+        for src, text in output[ 'outputs' ].items():
+            for line in text.splitlines():
+                if fping:
+                    # 10.0.0.2 : 0.05 - 0.04
+                    match = re.match( r"(?P<ip>\S+)\s+:\s+(?P<times>.*)$",
+                                      line )
+                    if not match:
+                        continue
+                    times = match.group( 'times' ).split()
+                    rtts = [ float( t ) for t in times if t != '-' ]
+                    lost = 1.0 - float( len( rtts ) ) / max( len( times ), 1 )
+                    rtt = sum( rtts ) / len( rtts ) if rtts else None
+                    stats[ ( src, match.group( 'ip' ) ) ] = ( lost, rtt )
+                    continue
+                # 10.0.0.2 1 packets transmitted, 1 received, 0% packet loss
+                # 10.0.0.2 rtt min/avg/max/mdev = 0.049/0.049/0.049/0.000 ms
+                match = re.match( r"(?P<ip>\S+) (?P<sent>\d+) packets " +
+                                  r"transmitted, (?P<received>\d+) received",
+                                  line )
+                if match:
+                    key = ( src, match.group( 'ip' ) )
+                    sent = int( match.group( 'sent' ) )
+                    lost = 1.0 - float( match.group( 'received' ) ) /\
+                        max( sent, 1 )
+                    stats[ key ] = ( lost, stats.get( key, ( 1.0, None ) )[ 1 ] )
+                    continue
+                match = re.match( r"(?P<ip>\S+) rtt [^=]+= [\d.]+/" +
+                                  r"(?P<avg>[\d.]+)/", line )
+                if match:
+                    key = ( src, match.group( 'ip' ) )
+                    stats[ key ] = ( stats.get( key, ( 0.0, None ) )[ 0 ],
+                                     float( match.group( 'avg' ) ) )
+
+        loss = {}
+        rtt = {}
+        failed = []
+        for src, dst, ip in output[ 'pairs' ]:
+            lost, average = stats.get( ( src, ip ), ( 1.0, None ) )
+            loss.setdefault( src, {} )[ dst ] = lost
+            rtt.setdefault( src, {} )[ dst ] = average
+            if lost > 0:
+                failed.append( ( src, dst ) )
+        failed.sort()
+        result = main.TRUE if len( failed ) <= acceptableFailed else main.FALSE
+        main.log.info( self.name + ": Pinged " + str( len( output[ 'pairs' ] ) ) +
+                       " pairs in " + str( round( elapsed, 3 ) ) +
+                       " seconds, " + str( len( failed ) ) + " failed" )
+        for src, dst in failed[ :20 ]:
+            main.log.warn( self.name + ": " + src + " -> X (" + dst + ")" +
+                           " lost " + str( int( loss[ src ][ dst ] * 100 ) ) +
+                           "% of pings" )
+        if len( failed ) > 20:
+            main.log.warn( self.name + ": ... and " + str( len( failed ) - 20 ) +
+                           " more failed pairs" )
+        return { 'result': result,
+                 'time': elapsed,
+                 'pairs': len( output[ 'pairs' ] ),
+                 'failed': failed,
+                 'loss': loss,
+                 'rtt': rtt }
+
     def fpingHost( self, **pingParams ):
         """
            Uses the fping package for faster pinging...
@@ -598,6 +769,7 @@ class MininetCliDriver( Emulator ):
                 ( which is correct behavior since the interfaces
                 haven't moved ).
         """
+        self.topologyChanged()
         if self.handle:
             try:
                 # Bring link between oldSw-host down
@@ -686,6 +858,7 @@ class MininetCliDriver( Emulator ):
         """
            Changes the ip address of a host on the fly
            Ex: h2 ifconfig h2-eth0 10.0.1.2 netmask 255.255.255.0"""
+        self.topologyChanged()
         if self.handle:
             try:
                 cmd = host + " ifconfig " + intf + " " + \
@@ -1145,6 +1318,7 @@ class MininetCliDriver( Emulator ):
     def link( self, **linkargs ):
         """
            Bring link( s ) between two nodes up or down"""
+        self.topologyChanged()
         args = utilities.parse_args( [ "END1", "END2", "OPTION" ], **linkargs )
         end1 = args[ "END1" ] if args[ "END1" ] is not None else ""
         end2 = args[ "END2" ] if args[ "END2" ] is not None else ""
@@ -1172,6 +1346,7 @@ class MininetCliDriver( Emulator ):
     def yank( self, **yankargs ):
         """
            yank a mininet switch interface to a host"""
+        self.topologyChanged()
         main.log.info( 'Yank the switch interface attached to a host' )
         args = utilities.parse_args( [ "SW", "INTF" ], **yankargs )
         sw = args[ "SW" ] if args[ "SW" ] is not None else ""
@@ -1192,6 +1367,7 @@ class MininetCliDriver( Emulator ):
     def plug( self, **plugargs ):
         """
            plug the yanked mininet switch interface to a switch"""
+        self.topologyChanged()
         main.log.info( 'Plug the switch interface attached to a switch' )
         args = utilities.parse_args( [ "SW", "INTF" ], **plugargs )
         sw = args[ "SW" ] if args[ "SW" ] is not None else ""
@@ -1425,6 +1601,7 @@ class MininetCliDriver( Emulator ):
             dpid = "dpid"
         returns: main.FALSE on an error, else main.TRUE
         """
+        self.topologyChanged()
         dpid = kwargs.get( 'dpid', '' )
         command = "addswitch " + str( sw ) + " " + str( dpid )
         try:
@@ -1457,6 +1634,7 @@ class MininetCliDriver( Emulator ):
         required params:
             sw = name of the switch as a string
         returns: main.FALSE on an error, else main.TRUE"""
+        self.topologyChanged()
         command = "delswitch " + str( sw )
         try:
             response = self.execute(
@@ -1490,6 +1668,7 @@ class MininetCliDriver( Emulator ):
            node1 = the string node name of the first endpoint of the link
            node2 = the string node name of the second endpoint of the link
            returns: main.FALSE on an error, else main.TRUE"""
+        self.topologyChanged()
         command = "addlink " + str( node1 ) + " " + str( node2 )
         try:
             response = self.execute(
@@ -1522,6 +1701,7 @@ class MininetCliDriver( Emulator ):
            node1 = the string node name of the first endpoint of the link
            node2 = the string node name of the second endpoint of the link
            returns: main.FALSE on an error, else main.TRUE"""
+        self.topologyChanged()
         command = "dellink " + str( node1 ) + " " + str( node2 )
         try:
             response = self.execute(
@@ -1557,6 +1737,7 @@ class MininetCliDriver( Emulator ):
             switch = "switch name"
             returns: main.FALSE on an error, else main.TRUE
         """
+        self.topologyChanged()
         switch = kwargs.get( 'switch', '' )
         command = "addhost " + str( hostname ) + " " + str( switch )
         try:
@@ -1593,6 +1774,7 @@ class MininetCliDriver( Emulator ):
            required params:
            hostname = the string hostname
            returns: main.FALSE on an error, else main.TRUE"""
+        self.topologyChanged()
         command = "delhost " + str( hostname )
         try:
             response = self.execute(
@@ -1646,6 +1828,7 @@ class MininetCliDriver( Emulator ):
 
         Will cleanup and exit the test if mininet fails to stop
         """
+        self.topologyChanged()
         main.log.info( self.name + ": Stopping mininet..." )
         response = ''
         if self.handle:
@@ -1893,6 +2076,75 @@ class MininetCliDriver( Emulator ):
             main.cleanup()
             main.exit()
 
+    def topologyChanged( self ):
+        """
+        Drop the topology cached by getTopology. Called by the driver
+        functions which change the topology.
+        """
+        self.topology = None
+        self.topologyNodes = {}
+
+    def getTopology( self, refresh=False, timeout=60 ):
+        """
+        Read the whole topology from Mininet in one round-trip.
+
+        Mininet is asked to print its switches, hosts, links and their
+        interfaces as a single json document, which is kept until a driver
+        call changing the topology ( startNet, addSwitch, delLink, link,
+        yank, plug, ... ) invalidates it. Use refresh=True after changing
+        the topology by other means.
+
+        Returns a dictionary with:
+            'switches': list of { 'name', 'dpid', 'class', 'pid', 'intfs' }
+            'hosts': list of { 'name', 'class', 'pid', 'intfs' }
+            'links': list of [ intf1 name, intf2 name ]
+        where 'intfs' is a list of { 'name', 'mac', 'ip', 'enabled' }.
+        Returns None on an error.
+        """
+        if self.topology is not None and not refresh:
+            return self.topology
+        intfs = "[{'name':i.name,'mac':i.MAC(),'ip':i.IP()," +\
+                "'enabled':i.isUp()} for i in n.intfList()]"
+        cmd = "py __import__('json').dumps({" +\
+              "'switches':[{'name':n.name,'dpid':n.dpid," +\
+              "'class':n.__class__.__name__,'pid':n.pid,'intfs':" + intfs +\
+              "} for n in net.switches]," +\
+              "'hosts':[{'name':n.name,'class':n.__class__.__name__," +\
+              "'pid':n.pid,'intfs':" + intfs + "} for n in net.hosts]," +\
+              "'links':[[l.intf1.name,l.intf2.name] for l in net.links]})"
+        try:
+            # Update mn port info
+            self.update()
+            response = self.execute( cmd=cmd,
+                                     prompt="mininet>",
+                                     timeout=timeout )
+            # The echoed command only has single quotes, the json output
+            # starts with '{"'
+            start = response.find( '{"' )
+            if start == -1:
+                main.log.error( self.name + ": Could not read the topology" )
+                main.log.debug( response )
+                return None
+            topology, end = json.JSONDecoder().raw_decode( response[ start: ] )
+            self.topology = topology
+            self.topologyNodes = dict( ( node[ 'name' ], node ) for node in
+                                       topology[ 'switches' ] +
+                                       topology[ 'hosts' ] )
+            return topology
+        except ValueError:
+            main.log.exception( self.name + ": Error parsing the topology" )
+            main.log.debug( response )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":     " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
     def getPorts( self, nodeName, verbose=False ):
         """
         Read ports from a Mininet switch.
@@ -1900,42 +2152,25 @@ class MininetCliDriver( Emulator ):
         Returns a json structure containing information about the
         ports of the given switch.
         """
-        response = self.getInterfaces( nodeName )
+        self.getTopology()
+        intfs = self.topologyNodes.get( nodeName, {} ).get( 'intfs', [] )
         # TODO: Sanity check on response. log if no such switch exists
         ports = []
-        for line in response.split( "\n" ):
-            if not line.startswith( "name=" ):
-                continue
-            portVars = {}
-            for var in line.split( "," ):
-                key, value = var.split( "=" )
-                portVars[ key ] = value
-            isUp = portVars.pop( 'enabled', "True" )
-            isUp = "True" in isUp
+        portRe = r'[^\-]\d\-eth(?P<port>\d+)'
+        for intf in intfs:
             if verbose:
                 main.log.info( "Reading switch port %s(%s)" %
-                               ( portVars[ 'name' ], portVars[ 'mac' ] ) )
-            mac = portVars[ 'mac' ]
-            if mac == 'None':
-                mac = None
-            ips = []
-            ip = portVars[ 'ip' ]
-            if ip == 'None':
-                ip = None
-            ips.append( ip )
-            name = portVars[ 'name' ]
-            if name == 'None':
-                name = None
-            portRe = r'[^\-]\d\-eth(?P<port>\d+)'
+                               ( intf[ 'name' ], intf[ 'mac' ] ) )
+            name = intf[ 'name' ]
             if name == 'lo':
                 portNo = 0xfffe  # TODO: 1.0 value - Should we just return lo?
             else:
                 portNo = re.search( portRe, name ).group( 'port' )
             ports.append( { 'of_port': portNo,
-                            'mac': str( mac ).replace( '\'', '' ),
+                            'mac': str( intf[ 'mac' ] ).replace( '\'', '' ),
                             'name': name,
-                            'ips': ips,
-                            'enabled': isUp } )
+                            'ips': [ intf[ 'ip' ] ],
+                            'enabled': intf[ 'enabled' ] } )
         return ports
 
     def getSwitches( self, verbose=False ):
@@ -1945,42 +2180,22 @@ class MininetCliDriver( Emulator ):
         Returns a dictionary whose keys are the switch names and the value is
         a dictionary containing information about the switch.
         """
-        # NOTE: To support new Mininet switch classes, just append the new
-        # class to the switchClasses variable
-
-        # Regex patterns to parse 'dump' output
-        # Example Switches:
-        # <OVSSwitch s1: lo:127.0.0.1,s1-eth1:None,s1-eth2:None,s1-eth3:None pid=5238>
-        # <OVSSwitch{ 'protocols': 'OpenFlow10' } s1: lo:127.0.0.1,s1-eth1:None,s1-eth2:None pid=25974>
-        # <OVSSwitchNS s1: lo:127.0.0.1,s1-eth1:None,s1-eth2:None,s1-eth3:None pid=22550>
-        # <OVSBridge s1: lo:127.0.0.1,s1-eth1:None,s1-eth2:None pid=26830>
-        # <UserSwitch s1: lo:127.0.0.1,s1-eth1:None,s1-eth2:None pid=14737>
-        switchClasses = r"(OVSSwitch)|(OVSBridge)|(OVSSwitchNS)|(IVSSwitch)|(LinuxBridge)|(UserSwitch)"
-        swRE = r"<(?P<class>" + switchClasses + r")" +\
-               r"(?P<options>\{.*\})?\s" +\
-               r"(?P<name>[^:]+)\:\s" +\
-               r"(?P<ports>([^,]+,)*[^,\s]+)" +\
-               r"\spid=(?P<pid>(\d)+)"
-        # Update mn port info
-        self.update()
+        # Mininet class names of switches created with options look like
+        # OVSSwitch{ 'protocols': 'OpenFlow10' }
+        classRE = r"(?P<class>[^{]+)(?P<options>\{.*\})?"
+        topology = self.getTopology() or {}
         output = {}
-        dump = self.dump().split( "\n" )
-        for line in dump:
-            result = re.search( swRE, line, re.I )
-            if result:
-                name = result.group( 'name' )
-                dpid = str( self.getSwitchDPID( name ) ).zfill( 16 )
-                pid = result.group( 'pid' )
-                swClass = result.group( 'class' )
-                options = result.group( 'options' )
-                if verbose:
-                    main.log.info( "Reading switch %s(%s)" % ( name, dpid ) )
-                ports = self.getPorts( name )
-                output[ name ] = { "dpid": dpid,
-                                   "ports": ports,
-                                   "swClass": swClass,
-                                   "pid": pid,
-                                   "options": options }
+        for switch in topology.get( 'switches', [] ):
+            name = switch[ 'name' ]
+            dpid = str( switch[ 'dpid' ] ).lower().zfill( 16 )
+            result = re.match( classRE, switch[ 'class' ] )
+            if verbose:
+                main.log.info( "Reading switch %s(%s)" % ( name, dpid ) )
+            output[ name ] = { "dpid": dpid,
+                               "ports": self.getPorts( name ),
+                               "swClass": result.group( 'class' ),
+                               "pid": str( switch[ 'pid' ] ),
+                               "options": result.group( 'options' ) }
         return output
 
     def getHosts( self, verbose=False ):
@@ -1990,58 +2205,20 @@ class MininetCliDriver( Emulator ):
         Returns a dictionary whose keys are the host names and the value is
         a dictionary containing information about the host.
         """
-        # Regex patterns to parse dump output
-        # Example host: <Host h1: h1-eth0:10.0.0.1 pid=5227>
-        #               <Host h1:  pid=12725>
-        #               <VLANHost h12: h12-eth0.100.100.100:100.1.0.3 pid=30186>
-        #               <dualStackHost h19: h19-eth0:10.1.0.9 pid=30200>
-        #               <IPv6Host h18: h18-eth0:10.0.0.18 pid=30198>
-        # NOTE: Does not correctly match hosts with multi-links
-        #       <Host h2: h2-eth0:10.0.0.2,h2-eth1:10.0.1.2 pid=14386>
-        # FIXME: Fix that
-        hostRE = r"Host\s(?P<name>[^:]+)\:((\s(?P<ifname>[^:]+)\:" +\
-            "(?P<ip>[^\s]+))|(\s)\spid=(?P<pid>[^>]+))"
-        # update mn port info
-        self.update()
-        # Get mininet dump
-        dump = self.dump().split( "\n" )
+        topology = self.getTopology() or {}
         hosts = {}
-        for line in dump:
-            if "Host" in line :
-                result = re.search( hostRE, line )
-                name = result.group( 'name' )
-                interfaces = []
-                response = self.getInterfaces( name )
-                # Populate interface info
-                for line in response.split( "\n" ):
-                    if line.startswith( "name=" ):
-                        portVars = {}
-                        for var in line.split( "," ):
-                            key, value = var.split( "=" )
-                            portVars[ key ] = value
-                        isUp = portVars.pop( 'enabled', "True" )
-                        isUp = "True" in isUp
-                        if verbose:
-                            main.log.info( "Reading host port %s(%s)" %
-                                           ( portVars[ 'name' ],
-                                             portVars[ 'mac' ] ) )
-                        mac = portVars[ 'mac' ]
-                        if mac == 'None':
-                            mac = None
-                        ips = []
-                        ip = portVars[ 'ip' ]
-                        if ip == 'None':
-                            ip = None
-                        ips.append( ip )
-                        intfName = portVars[ 'name' ]
-                        if name == 'None':
-                            name = None
-                        interfaces.append( {
-                            "name": intfName,
-                            "ips": ips,
-                            "mac": str( mac ),
-                            "isUp": isUp } )
-                hosts[ name ] = { "interfaces": interfaces }
+        for host in topology.get( 'hosts', [] ):
+            interfaces = []
+            for intf in host[ 'intfs' ]:
+                if verbose:
+                    main.log.info( "Reading host port %s(%s)" %
+                                   ( intf[ 'name' ], intf[ 'mac' ] ) )
+                interfaces.append( {
+                    "name": intf[ 'name' ],
+                    "ips": [ intf[ 'ip' ] ],
+                    "mac": str( intf[ 'mac' ] ),
+                    "isUp": intf[ 'enabled' ] } )
+            hosts[ host[ 'name' ] ] = { "interfaces": interfaces }
         return hosts
 
     def getLinks( self ):
@@ -2060,139 +2237,174 @@ class MininetCliDriver( Emulator ):
               number. In Mininet, for OVS switch, these should be the same. For
               hosts, this is just the eth#.
         """
-        self.update()
-        response = self.links().split( '\n' )
+        topology = self.getTopology() or {}
 
         # Examples:
-        # s1-eth3<->s2-eth1 (OK OK)
-        # s13-eth3<->h27-eth0 (OK OK)
-        linkRE = "(?P<node1>[\w]+)\-eth(?P<port1>[\d]+)\<\-\>" +\
-                 "(?P<node2>[\w]+)\-eth(?P<port2>[\d]+)"
+        # s1-eth3, s2-eth1
+        # s13-eth3, h27-eth0
+        # h1-eth0.100 ( VLAN subinterface of h1-eth0 )
+        intfRE = "(?P<node>[\w]+)\-eth(?P<port>[\d]+)(\.[\d]+)?$"
         links = []
-        for line in response:
-            match = re.search( linkRE, line )
-            if match:
-                node1 = match.group( 'node1' )
-                node2 = match.group( 'node2' )
-                port1 = match.group( 'port1' )
-                port2 = match.group( 'port2' )
-                links.append( { 'node1': node1,
-                                'node2': node2,
-                                'port1': port1,
-                                'port2': port2 } )
+        for intf1, intf2 in topology.get( 'links', [] ):
+            match1 = re.match( intfRE, intf1 )
+            match2 = re.match( intfRE, intf2 )
+            if match1 and match2:
+                links.append( { 'node1': match1.group( 'node' ),
+                                'node2': match2.group( 'node' ),
+                                'port1': match1.group( 'port' ),
+                                'port2': match2.group( 'port' ) } )
         return links
 
+    def onosDPID( self, deviceId ):
+        """
+        Returns the dpid of an ONOS device id in the format used by
+        getSwitches, i.e. "of:000000000000000a" -> "000000000000000a"
+        """
+        return str( deviceId ).replace( ":", '' ).replace( "of", '' ).lower()
+
+    def diffPorts( self, mnPorts, onosPorts ):
+        """
+        Compare the ports of several switches at once.
+
+        mnPorts and onosPorts are dictionaries of switch name to the set of
+        its port numbers. Returns a dictionary of the name of each switch
+        whose ports differ to a tuple of the sorted lists of the ports only
+        in Mininet and of the ports only in ONOS.
+
+        If numpy is installed and there are many ports, all the switches are
+        compared with one vectorized set difference over arrays of
+        ( switch, port ) pairs.
+        """
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        names = sorted( set( mnPorts ) | set( onosPorts ) )
+        total = sum( len( ports ) for ports in mnPorts.values() ) +\
+            sum( len( ports ) for ports in onosPorts.values() )
+        # Ports are 32 bits in OpenFlow 1.3, so ( switch, port ) pairs fit
+        # in one 64 bit integer
+        maxPort = max( [ 0 ] + [ max( ports ) for ports in
+                                 mnPorts.values() + onosPorts.values()
+                                 if ports ] )
+        diffs = {}
+        if numpy is None or total < 1000 or maxPort >= 2 ** 32:
+            for name in names:
+                mn = mnPorts.get( name, set() )
+                onos = onosPorts.get( name, set() )
+                if mn != onos:
+                    diffs[ name ] = ( sorted( mn - onos ), sorted( onos - mn ) )
+            return diffs
+
+        def pairs( portsDict ):
+            keys = [ index * 2 ** 32 + port
+                     for index, name in enumerate( names )
+                     for port in portsDict.get( name, () ) ]
+            return numpy.array( keys, dtype=numpy.int64 )
+        mnPairs = pairs( mnPorts )
+        onosPairs = pairs( onosPorts )
+        mnOnly = numpy.setdiff1d( mnPairs, onosPairs, assume_unique=True )
+        onosOnly = numpy.setdiff1d( onosPairs, mnPairs, assume_unique=True )
+        for column, keys in ( ( 0, mnOnly ), ( 1, onosOnly ) ):
+            # setdiff1d returns sorted keys, so ports are sorted per switch
+            for key in keys.tolist():
+                name = names[ key // 2 ** 32 ]
+                diff = diffs.setdefault( name, ( [], [] ) )
+                diff[ column ].append( int( key % 2 ** 32 ) )
+        return diffs
+
     def compareSwitches( self, switches, switchesJson, portsJson ):
         """
            Compare mn and onos switches
            switchesJson: parsed json object from the onos devices api
 
-        Dependencies:
-            1. numpy - "sudo pip install numpy"
+        The ONOS devices and ports are indexed by dpid first, so each
+        Mininet switch is looked up instead of searched for.
         """
-        from numpy import uint64
         # created sorted list of dpid's in MN and ONOS for comparison
-        mnDPIDs = []
-        for swName, switch in switches.iteritems():
-            mnDPIDs.append( switch[ 'dpid' ].lower() )
-        mnDPIDs.sort()
+        mnDPIDs = sorted( switch[ 'dpid' ].lower()
+                          for switch in switches.itervalues() )
         if switchesJson == "":  # if rest call fails
             main.log.error(
                 self.name +
                 ".compareSwitches(): Empty JSON object given from ONOS" )
             return main.FALSE
-        onos = switchesJson
-        onosDPIDs = []
-        for switch in onos:
-            if switch[ 'available' ]:
-                onosDPIDs.append(
-                    switch[ 'id' ].replace(
-                        ":",
-                        '' ).replace(
-                        "of",
-                        '' ).lower() )
-        onosDPIDs.sort()
+        onosDPIDs = sorted( self.onosDPID( switch[ 'id' ] )
+                            for switch in switchesJson
+                            if switch[ 'available' ] )
 
         if mnDPIDs != onosDPIDs:
             switchResults = main.FALSE
+            mnSet = set( mnDPIDs )
+            onosSet = set( onosDPIDs )
             main.log.error( "Switches in MN but not in ONOS:" )
-            list1 = [ switch for switch in mnDPIDs if switch not in onosDPIDs ]
+            list1 = [ switch for switch in mnDPIDs if switch not in onosSet ]
             main.log.error( str( list1 ) )
             main.log.error( "Switches in ONOS but not in MN:" )
-            list2 = [ switch for switch in onosDPIDs if switch not in mnDPIDs ]
+            list2 = [ switch for switch in onosDPIDs if switch not in mnSet ]
             main.log.error( str( list2 ) )
         else:  # list of dpid's match in onos and mn
             switchResults = main.TRUE
         finalResults = switchResults
 
+        # PORTS
+        # TODO: handle other reserved port numbers besides LOCAL
+        # NOTE: Reserved ports
+        # Local port: -2 in Openflow, ONOS shows 'local', we store as
+        # the unsigned 64 bit value of -2
+        localPort = 2 ** 64 - 2
+        # dpid to the enabled ports of the first available ONOS device
+        onosPortsIndex = {}
+        for onosSwitch in portsJson:
+            if not onosSwitch[ 'device' ][ 'available' ]:
+                continue
+            dpid = self.onosDPID( onosSwitch[ 'device' ][ 'id' ] )
+            if dpid in onosPortsIndex:
+                continue
+            ports = []
+            for port in onosSwitch[ 'ports' ]:
+                if port[ 'isEnabled' ]:
+                    if port[ 'port' ] == 'local':
+                        ports.append( localPort )
+                    else:
+                        ports.append( int( port[ 'port' ] ) )
+            onosPortsIndex[ dpid ] = ports
+
+        mnPortsLog = {}
+        onosPortsLog = {}
+        mnPorts = {}
+        onosPorts = {}
+        for name, mnSwitch in switches.iteritems():
+            mnPortsLog[ name ] = sorted( int( port[ 'of_port' ] )
+                                         for port in mnSwitch[ 'ports' ]
+                                         if port[ 'enabled' ] )
+            onosPortsLog[ name ] = sorted(
+                onosPortsIndex.get( mnSwitch[ 'dpid' ].lower(), [] ) )
+            # NOTE: OVS reports this as down since there is no link
+            #      So ignoring these for now
+            # TODO: Come up with a better way of handling these
+            mnPorts[ name ] = set( mnPortsLog[ name ] ) - set( [ 65534 ] )
+            onosPorts[ name ] = set( onosPortsLog[ name ] ) - \
+                set( [ localPort ] )
+
         # FIXME: this does not look for extra ports in ONOS, only checks that
         # ONOS has what is in MN
         portsResults = main.TRUE
-
-        # PORTS
-        for name, mnSwitch in switches.iteritems():
-            mnPorts = []
-            onosPorts = []
-            switchResult = main.TRUE
-            for port in mnSwitch[ 'ports' ]:
-                if port[ 'enabled' ]:
-                    mnPorts.append( int( port[ 'of_port' ] ) )
-            for onosSwitch in portsJson:
-                if onosSwitch[ 'device' ][ 'available' ]:
-                    if onosSwitch[ 'device' ][ 'id' ].replace(
-                            ':',
-                            '' ).replace(
-                            "of",
-                            '' ) == mnSwitch[ 'dpid' ]:
-                        for port in onosSwitch[ 'ports' ]:
-                            if port[ 'isEnabled' ]:
-                                if port[ 'port' ] == 'local':
-                                    # onosPorts.append( 'local' )
-                                    onosPorts.append( long( uint64( -2 ) ) )
-                                else:
-                                    onosPorts.append( int( port[ 'port' ] ) )
-                        break
-            mnPorts.sort( key=float )
-            onosPorts.sort( key=float )
-
-            mnPortsLog = mnPorts
-            onosPortsLog = onosPorts
-            mnPorts = [ x for x in mnPorts ]
-            onosPorts = [ x for x in onosPorts ]
-
-            # TODO: handle other reserved port numbers besides LOCAL
-            # NOTE: Reserved ports
-            # Local port: -2 in Openflow, ONOS shows 'local', we store as
-            # long( uint64( -2 ) )
-            for mnPort in mnPortsLog:
-                if mnPort in onosPorts:
-                    # don't set results to true here as this is just one of
-                    # many checks and it might override a failure
-                    mnPorts.remove( mnPort )
-                    onosPorts.remove( mnPort )
-
-                # NOTE: OVS reports this as down since there is no link
-                #      So ignoring these for now
-                # TODO: Come up with a better way of handling these
-                if 65534 in mnPorts:
-                    mnPorts.remove( 65534 )
-                if long( uint64( -2 ) ) in onosPorts:
-                    onosPorts.remove( long( uint64( -2 ) ) )
-            if len( mnPorts ):  # the ports of this switch don't match
-                switchResult = main.FALSE
-                main.log.warn( "Ports in MN but not ONOS: " + str( mnPorts ) )
-            if len( onosPorts ):  # the ports of this switch don't match
-                switchResult = main.FALSE
+        diffs = self.diffPorts( mnPorts, onosPorts )
+        for name in sorted( diffs ):
+            mnOnly, onosOnly = diffs[ name ]
+            if mnOnly:  # the ports of this switch don't match
+                main.log.warn( "Ports in MN but not ONOS: " + str( mnOnly ) )
+            if onosOnly:  # the ports of this switch don't match
                 main.log.warn(
                     "Ports in ONOS but not MN: " +
-                    str( onosPorts ) )
-            if switchResult == main.FALSE:
-                main.log.error(
-                    "The list of ports for switch %s(%s) does not match:" %
-                    ( name, mnSwitch[ 'dpid' ] ) )
-                main.log.warn( "mn_ports[]  =  " + str( mnPortsLog ) )
-                main.log.warn( "onos_ports[] = " + str( onosPortsLog ) )
-            portsResults = portsResults and switchResult
+                    str( onosOnly ) )
+            main.log.error(
+                "The list of ports for switch %s(%s) does not match:" %
+                ( name, switches[ name ][ 'dpid' ] ) )
+            main.log.warn( "mn_ports[]  =  " + str( mnPortsLog[ name ] ) )
+            main.log.warn( "onos_ports[] = " + str( onosPortsLog[ name ] ) )
+            portsResults = main.FALSE
         finalResults = finalResults and portsResults
         return finalResults
 
@@ -2201,27 +2413,33 @@ class MininetCliDriver( Emulator ):
            Compare mn and onos links
            linksJson: parsed json object from the onos links api
 
+        The ONOS links are indexed by ( source dpid, destination dpid ), so
+        each Mininet link is looked up in both directions instead of
+        searched for.
         """
         # FIXME: this does not look for extra links in ONOS, only checks that
         #        ONOS has what is in MN
         onos = linksJson
 
+        # switch name to its ports keyed by of_port
+        portIndex = {}
+        for swName, switch in switches.iteritems():
+            portIndex[ swName ] = dict( ( str( port[ 'of_port' ] ), port )
+                                        for port in switch[ 'ports' ] )
+
         mnLinks = []
         for l in links:
-            try:
-                node1 = switches[ l[ 'node1' ] ]
-                node2 = switches[ l[ 'node2' ] ]
-                enabled = True
-                for port in node1[ 'ports' ]:
-                    if port[ 'of_port' ] == l[ 'port1' ]:
-                        enabled = enabled and port[ 'enabled' ]
-                for port in node2[ 'ports' ]:
-                    if port[ 'of_port' ] == l[ 'port2' ]:
-                        enabled = enabled and port[ 'enabled' ]
-                if enabled:
-                    mnLinks.append( l )
-            except KeyError:
-                pass
+            if l[ 'node1' ] not in switches or l[ 'node2' ] not in switches:
+                continue
+            port1 = portIndex[ l[ 'node1' ] ].get( str( l[ 'port1' ] ) )
+            port2 = portIndex[ l[ 'node2' ] ].get( str( l[ 'port2' ] ) )
+            enabled = True
+            if port1 is not None:
+                enabled = enabled and port1[ 'enabled' ]
+            if port2 is not None:
+                enabled = enabled and port2[ 'enabled' ]
+            if enabled:
+                mnLinks.append( l )
         if 2 * len( mnLinks ) == len( onos ):
             linkResults = main.TRUE
         else:
@@ -2231,73 +2449,51 @@ class MininetCliDriver( Emulator ):
                 " bidirectional links and ONOS has " +
                 str( len( onos ) ) + " unidirectional links" )
 
-        # iterate through MN links and check if an ONOS link exists in
-        # both directions
+        # ( src dpid, dst dpid ) to the list of ( src port, dst port ) of
+        # the ONOS links between them
+        onosIndex = {}
+        for onosLink in onos:
+            onosNode1 = self.onosDPID( onosLink[ 'src' ][ 'device' ] )
+            onosNode2 = self.onosDPID( onosLink[ 'dst' ][ 'device' ] )
+            onosIndex.setdefault( ( onosNode1, onosNode2 ), [] ).append(
+                ( onosLink[ 'src' ][ 'port' ], onosLink[ 'dst' ][ 'port' ] ) )
+
+        def checkDirection( link, node1, port1, node2, port2, reverse ):
+            # Returns main.TRUE if ONOS has the link from node1 to node2, or
+            # from node2 to node1 if reverse is True
+            found = main.FALSE
+            key = ( node2, node1 ) if reverse else ( node1, node2 )
+            for srcPort, dstPort in onosIndex.get( key, [] ):
+                if reverse:
+                    onosPort1, onosPort2 = dstPort, srcPort
+                else:
+                    onosPort1, onosPort2 = srcPort, dstPort
+                if int( onosPort1 ) == int( port1 ) and\
+                        int( onosPort2 ) == int( port2 ):
+                    found = main.TRUE
+                else:
+                    main.log.warn(
+                        'The port numbers do not match for ' +
+                        str( link ) +
+                        ' between ONOS and MN. When checking ONOS for ' +
+                        'link %s/%s -> %s/%s' %
+                        ( node1, port1, node2, port2 ) +
+                        ' ONOS has the values %s/%s -> %s/%s' %
+                        ( node1, onosPort1, node2, onosPort2 ) )
+            return found
+
+        # check if an ONOS link exists in both directions for each MN link
         for link in mnLinks:
-            # TODO: Find a more efficient search method
-            node1 = None
-            port1 = None
-            node2 = None
-            port2 = None
-            firstDir = main.FALSE
-            secondDir = main.FALSE
-            for swName, switch in switches.iteritems():
-                if swName == link[ 'node1' ]:
-                    node1 = switch[ 'dpid' ]
-                    for port in switch[ 'ports' ]:
-                        if str( port[ 'of_port' ] ) == str( link[ 'port1' ] ):
-                            port1 = port[ 'of_port' ]
-                    if node1 is not None and node2 is not None:
-                        break
-                if swName == link[ 'node2' ]:
-                    node2 = switch[ 'dpid' ]
-                    for port in switch[ 'ports' ]:
-                        if str( port[ 'of_port' ] ) == str( link[ 'port2' ] ):
-                            port2 = port[ 'of_port' ]
-                    if node1 is not None and node2 is not None:
-                        break
-
-            for onosLink in onos:
-                onosNode1 = onosLink[ 'src' ][ 'device' ].replace(
-                    ":", '' ).replace( "of", '' )
-                onosNode2 = onosLink[ 'dst' ][ 'device' ].replace(
-                    ":", '' ).replace( "of", '' )
-                onosPort1 = onosLink[ 'src' ][ 'port' ]
-                onosPort2 = onosLink[ 'dst' ][ 'port' ]
-
-                # check onos link from node1 to node2
-                if str( onosNode1 ) == str( node1 ) and str(
-                        onosNode2 ) == str( node2 ):
-                    if int( onosPort1 ) == int( port1 ) and int(
-                            onosPort2 ) == int( port2 ):
-                        firstDir = main.TRUE
-                    else:
-                        main.log.warn(
-                            'The port numbers do not match for ' +
-                            str( link ) +
-                            ' between ONOS and MN. When checking ONOS for ' +
-                            'link %s/%s -> %s/%s' %
-                            ( node1, port1, node2, port2 ) +
-                            ' ONOS has the values %s/%s -> %s/%s' %
-                            ( onosNode1, onosPort1, onosNode2, onosPort2 ) )
-
-                # check onos link from node2 to node1
-                elif ( str( onosNode1 ) == str( node2 ) and
-                        str( onosNode2 ) == str( node1 ) ):
-                    if ( int( onosPort1 ) == int( port2 )
-                            and int( onosPort2 ) == int( port1 ) ):
-                        secondDir = main.TRUE
-                    else:
-                        main.log.warn(
-                            'The port numbers do not match for ' +
-                            str( link ) +
-                            ' between ONOS and MN. When checking ONOS for ' +
-                            'link %s/%s -> %s/%s' %
-                            ( node1, port1, node2, port2 ) +
-                            ' ONOS has the values %s/%s -> %s/%s' %
-                            ( onosNode2, onosPort2, onosNode1, onosPort1 ) )
-                else:  # this is not the link you're looking for
-                    pass
+            node1 = switches[ link[ 'node1' ] ][ 'dpid' ].lower()
+            node2 = switches[ link[ 'node2' ] ][ 'dpid' ].lower()
+            port1 = portIndex[ link[ 'node1' ] ].get( str( link[ 'port1' ] ) )
+            port2 = portIndex[ link[ 'node2' ] ].get( str( link[ 'port2' ] ) )
+            port1 = port1[ 'of_port' ] if port1 is not None else None
+            port2 = port2[ 'of_port' ] if port2 is not None else None
+            firstDir = checkDirection( link, node1, port1, node2, port2,
+                                       False )
+            secondDir = checkDirection( link, node1, port1, node2, port2,
+                                        True )
             if not firstDir:
                 main.log.error(
                     'ONOS does not have the link %s/%s -> %s/%s' %
@@ -2322,33 +2518,34 @@ class MininetCliDriver( Emulator ):
         """
         import json
         hostResults = main.TRUE
+        # mac address to the Mininet interfaces with that address
+        macIndex = {}
+        for mnHost, info in hosts.iteritems():
+            for mnIntf in info[ 'interfaces' ]:
+                macIndex.setdefault( mnIntf[ 'mac' ].lower(), [] ).append(
+                    mnIntf )
         for onosHost in hostsJson:
-            onosMAC = onosHost[ 'mac' ].lower()
-            match = False
-            for mnHost, info in hosts.iteritems():
-                for mnIntf in info[ 'interfaces' ]:
-                    if onosMAC == mnIntf[ 'mac' ].lower():
-                        match = True
-                        for ip in mnIntf[ 'ips' ]:
-                            if ip in onosHost[ 'ipAddresses' ]:
-                                pass  # all is well
-                            else:
-                                # misssing ip
-                                main.log.error( "ONOS host " +
-                                                onosHost[ 'id' ] +
-                                                " has a different IP(" +
-                                                str( onosHost[ 'ipAddresses' ] ) +
-                                                ") than the Mininet host(" +
-                                                str( ip ) +
-                                                ")." )
-                                output = json.dumps(
-                                    onosHost,
-                                    sort_keys=True,
-                                    indent=4,
-                                    separators=( ',', ': ' ) )
-                                main.log.info( output )
-                                hostResults = main.FALSE
-            if not match:
+            mnIntfs = macIndex.get( onosHost[ 'mac' ].lower(), [] )
+            onosIPs = set( onosHost[ 'ipAddresses' ] )
+            for mnIntf in mnIntfs:
+                for ip in mnIntf[ 'ips' ]:
+                    if ip not in onosIPs:
+                        # misssing ip
+                        main.log.error( "ONOS host " +
+                                        onosHost[ 'id' ] +
+                                        " has a different IP(" +
+                                        str( onosHost[ 'ipAddresses' ] ) +
+                                        ") than the Mininet host(" +
+                                        str( ip ) +
+                                        ")." )
+                        output = json.dumps(
+                            onosHost,
+                            sort_keys=True,
+                            indent=4,
+                            separators=( ',', ': ' ) )
+                        main.log.info( output )
+                        hostResults = main.FALSE
+            if not mnIntfs:
                 hostResults = main.FALSE
                 main.log.error( "ONOS host " + onosHost[ 'id' ] + " has no " +
                                 "corresponding Mininet host." )
@@ -2462,6 +2659,7 @@ class MininetCliDriver( Emulator ):
                To make this setup permanent:
                $ sudo su -c 'echo "8021q" >> /etc/modules'
            """
+        self.topologyChanged()
         if self.handle:
             try:
                 # get the ip address of the host
@@ -2666,6 +2864,7 @@ class MininetCliDriver( Emulator ):
 
     def createHost( self, hostname ):
         command = "sudo ip netns add " + str( hostname )
+        self.topologyChanged()
         try:
             response = self.execute(
                 cmd=command,
@@ -2687,6 +2886,7 @@ class MininetCliDriver( Emulator ):
         command = "sudo ip link add " + str(hostport) +" type veth peer name " + str(ovsport)
         command += ";" +" sudo ifconfig " + str(hostport) + " hw ether " + str(hostportmac)
         command += ";" +" sudo ip link set " + str(hostport) + " netns " + str(hostname) 
+        self.topologyChanged()
         try:
             response = self.execute(
                 cmd=command,
@@ -2712,6 +2912,7 @@ class MininetCliDriver( Emulator ):
             command += " external-ids:attached-mac=" + str(attachedMac)
         if vmuuid:
             command += " external-ids:vm-uuid=" + str(vmuuid)
+        self.topologyChanged()
         try:
             response = self.execute(
                 cmd=command,
@@ -2731,6 +2932,7 @@ class MininetCliDriver( Emulator ):
 
     def setHostportIp(self, ip, hostname="host1", hostport1="host1-eth0" ):
         command = "sudo ip netns exec " + str(hostname) +" ifconfig " + str(hostport1) + " " + str(ip)
+        self.topologyChanged()
         try:
             response = self.execute(
                 cmd=command,
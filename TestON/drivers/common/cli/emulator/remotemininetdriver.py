@@ -88,6 +88,24 @@ class RemoteMininetDriver( Emulator ):
             main.log.error( "Failed to connect to the Mininet" )
             return main.FALSE
 
+    def restoreChannel( self ):
+        """
+        Reopens the ssh channel to the Mininet host after it was closed, so
+        execute can resend the command to the new shell.
+        Returns main.TRUE if the shell prompt is back, else main.FALSE
+        """
+        try:
+            if not self.reconnect():
+                main.log.error( self.name + ": Could not reopen the channel" )
+                return main.FALSE
+            self.handle.sendline( "" )
+            self.handle.expect( "\$" )
+            return main.TRUE
+        except ( pexpect.EOF, pexpect.TIMEOUT ):
+            main.log.error( self.name + ": Shell prompt not found after " +
+                            "reconnecting" )
+            return main.FALSE
+
     def checkForLoss( self, pingList ):
         """
         Returns main.FALSE for 0% packet loss and
@@ -23,6 +23,10 @@ import types
 import time
 import os
 from drivers.common.clidriver import CLI
+from core import jsonparser
+
+# Id and state of an intent in the text output of onos:intents
+intentStateRe = re.compile( r"id=([^,\s]+), state=(\w+)" )
 
 
 class OnosCliDriver( CLI ):
@@ -405,6 +409,100 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def sendlines( self, cmds, timeout=60, debug=False ):
+        """
+        Send several commands to the onos> prompt at once, without waiting
+        for the prompt between them. Each command is followed by an echo of
+        a unique marker and the output is split at the markers, so the
+        commands take one round-trip instead of one each.
+
+        Returns a list with the output of each command, in the order of
+        cmds, or None on error
+
+        Warning: There are no sanity checking to commands
+        sent using this method.
+        """
+        try:
+            if not cmds:
+                return []
+            token = "TESTON-MARK-" + os.urandom( 4 ).encode( 'hex' )
+            marks = [ token + "-" + str( i ) for i in range( len( cmds ) ) ]
+            lines = []
+            for cmd, mark in zip( cmds, marks ):
+                lines.append( cmd )
+                lines.append( "echo " + mark )
+            logStr = "\"Sending CLI commands: '" + "', '".join( cmds ) + "'\""
+            self.log( logStr )
+            self.handle.send( "\n".join( lines ) + "\n" )
+            # The echoed command is on the prompt line, the echo output on
+            # its own line
+            self.handle.expect( "[\r\n]" + marks[ -1 ], timeout=timeout )
+            response = self.handle.before + "\n" + marks[ -1 ]
+            self.handle.expect( "onos>", timeout=timeout )
+            main.log.info( str( len( cmds ) ) + " commands sent to " +
+                           self.name + "." )
+            if debug:
+                main.log.debug( self.name + ": Raw output" )
+                main.log.debug( self.name + ": " + repr( response ) )
+
+            # Remove ANSI color control strings and the extra return chars
+            ansiEscape = re.compile( r'\x1b[^m]*m' )
+            response = ansiEscape.sub( '', response )
+            response = re.sub( r"\s\r", "", response )
+
+            outputs = []
+            segment = []
+            for line in response.splitlines( True ):
+                if len( outputs ) < len( marks ) and \
+                        line.strip() == marks[ len( outputs ) ]:
+                    outputs.append( self.pipelinedOutput(
+                                        segment,
+                                        cmds[ len( outputs ) ],
+                                        marks[ len( outputs ) ] ) )
+                    segment = []
+                else:
+                    segment.append( line )
+            if debug:
+                for output in outputs:
+                    main.log.debug( self.name + ": " + repr( output ) )
+            return outputs
+        except pexpect.TIMEOUT:
+            main.log.error( self.name + ": Timeout waiting for the output " +
+                            "of " + str( cmds ) )
+            main.log.debug( self.name + ": " + repr( self.handle.before ) )
+            return None
+        except TypeError:
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+    def pipelinedOutput( self, lines, cmd, mark ):
+        """
+        Returns the output of one command from the lines sendlines got
+        between its marker and the marker of the previous command, that is
+        the prompt with the echoed command, the output, and the prompt with
+        the echoed marker command
+        """
+        start = 0
+        for i in range( len( lines ) ):
+            if cmd.strip() in lines[ i ]:
+                start = i + 1
+                break
+        end = len( lines )
+        for i in range( len( lines ) - 1, start - 1, -1 ):
+            if "echo " + mark in lines[ i ]:
+                end = i
+                break
+        return "".join( lines[ start:end ] ).strip()
+
     # IMPORTANT NOTE:
     # For all cli commands, naming convention should match
     # the cli command changing 'a:b' with 'aB'.
@@ -1100,6 +1198,85 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def pointIntentCmd(
+            self,
+            ingressDevice,
+            egressDevice,
+            portIngress="",
+            portEgress="",
+            ethType="",
+            ethSrc="",
+            ethDst="",
+            bandwidth="",
+            lambdaAlloc=False,
+            ipProto="",
+            ipSrc="",
+            ipDst="",
+            tcpSrc="",
+            tcpDst="" ):
+        """
+        Returns the add-point-intent command for the arguments of
+        addPointIntent, or None if a port is missing
+        """
+        # If there are no optional arguments
+        if not ethType and not ethSrc and not ethDst\
+                and not bandwidth and not lambdaAlloc \
+                and not ipProto and not ipSrc and not ipDst \
+                and not tcpSrc and not tcpDst:
+            cmd = "add-point-intent"
+
+        else:
+            cmd = "add-point-intent"
+
+            if ethType:
+                cmd += " --ethType " + str( ethType )
+            if ethSrc:
+                cmd += " --ethSrc " + str( ethSrc )
+            if ethDst:
+                cmd += " --ethDst " + str( ethDst )
+            if bandwidth:
+                cmd += " --bandwidth " + str( bandwidth )
+            if lambdaAlloc:
+                cmd += " --lambda "
+            if ipProto:
+                cmd += " --ipProto " + str( ipProto )
+            if ipSrc:
+                cmd += " --ipSrc " + str( ipSrc )
+            if ipDst:
+                cmd += " --ipDst " + str( ipDst )
+            if tcpSrc:
+                cmd += " --tcpSrc " + str( tcpSrc )
+            if tcpDst:
+                cmd += " --tcpDst " + str( tcpDst )
+
+        # Check whether the user appended the port
+        # or provided it as an input
+        if "/" in ingressDevice:
+            cmd += " " + str( ingressDevice )
+        else:
+            if not portIngress:
+                main.log.error( "You must specify the ingress port" )
+                # TODO: perhaps more meaningful return
+                #       Would it make sense to throw an exception and exit
+                #       the test?
+                return None
+
+            cmd += " " + \
+                str( ingressDevice ) + "/" +\
+                str( portIngress ) + " "
+
+        if "/" in egressDevice:
+            cmd += " " + str( egressDevice )
+        else:
+            if not portEgress:
+                main.log.error( "You must specify the egress port" )
+                return None
+
+            cmd += " " +\
+                str( egressDevice ) + "/" +\
+                str( portEgress )
+        return cmd
+
     def addPointIntent(
             self,
             ingressDevice,
@@ -1143,63 +1320,17 @@ class OnosCliDriver( CLI ):
               intent via cli
         """
         try:
-            # If there are no optional arguments
-            if not ethType and not ethSrc and not ethDst\
-                    and not bandwidth and not lambdaAlloc \
-                    and not ipProto and not ipSrc and not ipDst \
-                    and not tcpSrc and not tcpDst:
-                cmd = "add-point-intent"
-
-            else:
-                cmd = "add-point-intent"
-
-                if ethType:
-                    cmd += " --ethType " + str( ethType )
-                if ethSrc:
-                    cmd += " --ethSrc " + str( ethSrc )
-                if ethDst:
-                    cmd += " --ethDst " + str( ethDst )
-                if bandwidth:
-                    cmd += " --bandwidth " + str( bandwidth )
-                if lambdaAlloc:
-                    cmd += " --lambda "
-                if ipProto:
-                    cmd += " --ipProto " + str( ipProto )
-                if ipSrc:
-                    cmd += " --ipSrc " + str( ipSrc )
-                if ipDst:
-                    cmd += " --ipDst " + str( ipDst )
-                if tcpSrc:
-                    cmd += " --tcpSrc " + str( tcpSrc )
-                if tcpDst:
-                    cmd += " --tcpDst " + str( tcpDst )
-
-            # Check whether the user appended the port
-            # or provided it as an input
-            if "/" in ingressDevice:
-                cmd += " " + str( ingressDevice )
-            else:
-                if not portIngress:
-                    main.log.error( "You must specify the ingress port" )
-                    # TODO: perhaps more meaningful return
-                    #       Would it make sense to throw an exception and exit
-                    #       the test?
-                    return None
-
-                cmd += " " + \
-                    str( ingressDevice ) + "/" +\
-                    str( portIngress ) + " "
-
-            if "/" in egressDevice:
-                cmd += " " + str( egressDevice )
-            else:
-                if not portEgress:
-                    main.log.error( "You must specify the egress port" )
-                    return None
-
-                cmd += " " +\
-                    str( egressDevice ) + "/" +\
-                    str( portEgress )
+            cmd = self.pointIntentCmd( ingressDevice, egressDevice,
+                                       portIngress=portIngress,
+                                       portEgress=portEgress,
+                                       ethType=ethType, ethSrc=ethSrc,
+                                       ethDst=ethDst, bandwidth=bandwidth,
+                                       lambdaAlloc=lambdaAlloc,
+                                       ipProto=ipProto, ipSrc=ipSrc,
+                                       ipDst=ipDst, tcpSrc=tcpSrc,
+                                       tcpDst=tcpDst )
+            if cmd is None:
+                return None
 
             handle = self.sendline( cmd )
             # If error, return error message
@@ -1708,6 +1839,168 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def sendBatch( self, cmds, parse, batchSize=20 ):
+        """
+        Description:
+            Sends CLI commands batchSize at a time with sendlines, so a
+            batch costs one prompt round-trip instead of one per command
+        Required:
+            * cmds: list of CLI commands
+            * parse: function called with the output of a command, returning
+                     its result or None if the command failed
+        Optional:
+            * batchSize: number of commands sent per round-trip
+        Returns:
+            A tuple ( results, batches ) where results is the list of the
+            results in the order of cmds, None for the commands which
+            failed, and batches the list of ( number of commands, seconds )
+            of each batch. The commands of a batch share one round-trip,
+            so their latency is only known for the batch as a whole.
+        """
+        results = []
+        batches = []
+        for i in range( 0, len( cmds ), batchSize ):
+            batch = cmds[ i:i + batchSize ]
+            start = time.time()
+            outputs = self.sendlines( batch )
+            batches.append( ( len( batch ), time.time() - start ) )
+            if outputs is None:
+                outputs = []
+            for j in range( len( batch ) ):
+                result = None
+                if j < len( outputs ):
+                    result = parse( outputs[ j ] )
+                if result is None:
+                    main.log.error( self.name + ": Error running: " +
+                                    batch[ j ] )
+                results.append( result )
+        return results, batches
+
+    def addIntents( self, cmds, batchSize=20 ):
+        """
+        Required:
+            * cmds: list of intent CLI commands, i.e. add-host-intent
+        Optional:
+            * batchSize: number of commands sent per round-trip
+        Description:
+            Adds many intents with batchSize commands per CLI round-trip
+        Returns:
+            A dictionary with 'ids', the list of the intent IDs in the order
+            of cmds ( None for the intents which failed ), and 'batch', the
+            list of ( number of intents, seconds ) of each batch sent, see
+            sendBatch; None on Error
+        """
+        try:
+            def parseId( handle ):
+                if re.search( "Error", handle ):
+                    return None
+                match = re.search( 'id=(0x[\da-f]+),', handle )
+                return match.group( 1 ) if match else None
+
+            ids, batches = self.sendBatch( cmds, parseId, batchSize=batchSize )
+            main.log.info( self.name + ": Added " +
+                           str( len( ids ) - ids.count( None ) ) + " of " +
+                           str( len( ids ) ) + " intents" )
+            return { 'ids': ids, 'batch': batches }
+        except TypeError:
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+    def addHostIntents( self, hostPairs, batchSize=20 ):
+        """
+        Required:
+            * hostPairs: list of ( hostIdOne, hostIdTwo ) tuples
+        Optional:
+            * batchSize: number of intents sent per CLI round-trip
+        Description:
+            Adds a host-to-host intent between each pair of hosts
+        Returns:
+            A dictionary with 'ids', the list of the intent IDs in the order
+            of hostPairs ( None for the intents which failed ), and 'batch',
+            the list of ( number of intents, seconds ) of each batch sent;
+            None on Error
+        """
+        cmds = [ "add-host-intent " + str( hostIdOne ) + " " + str( hostIdTwo )
+                 for hostIdOne, hostIdTwo in hostPairs ]
+        return self.addIntents( cmds, batchSize=batchSize )
+
+    def addPointIntents( self, intents, batchSize=20 ):
+        """
+        Required:
+            * intents: list of dictionaries of addPointIntent arguments
+        Optional:
+            * batchSize: number of intents sent per CLI round-trip
+        Description:
+            Adds a point-to-point intent for each dictionary of arguments
+        Returns:
+            A dictionary with 'ids', the list of the intent IDs in the order
+            of intents ( None for the intents which failed ), and 'batch',
+            the list of ( number of intents, seconds ) of each batch sent;
+            None on Error
+        """
+        cmds = [ self.pointIntentCmd( **intent ) for intent in intents ]
+        if None in cmds:
+            return None
+        return self.addIntents( cmds, batchSize=batchSize )
+
+    def removeIntents( self, intentIds, app='org.onosproject.cli',
+                       purge=False, sync=False, batchSize=20 ):
+        """
+        Required:
+            * intentIds: list of intent IDs
+        Optional:
+            * app: application id of the intents
+            * purge: purge the intents from the store after removal
+            * sync: waits for each removal before running the next one
+            * batchSize: number of intents removed per CLI round-trip
+        Description:
+            Removes many intents with batchSize commands per CLI round-trip
+        Returns:
+            A dictionary with 'result', the list of main.TRUE or main.FALSE
+            of each removal in the order of intentIds, and 'batch', the list
+            of ( number of intents, seconds ) of each batch sent;
+            None on Error
+        """
+        try:
+            cmdStr = "remove-intent"
+            if purge:
+                cmdStr += " -p"
+            if sync:
+                cmdStr += " -s"
+            cmds = [ cmdStr + " " + app + " " + str( intentId )
+                     for intentId in intentIds ]
+
+            def parseError( handle ):
+                if re.search( "Error", handle ):
+                    return None
+                return main.TRUE
+
+            results, batches = self.sendBatch( cmds, parseError,
+                                               batchSize=batchSize )
+            return { 'result': [ result or main.FALSE for result in results ],
+                     'batch': batches }
+        except TypeError:
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
     def purgeWithdrawnIntents( self ):
         """
         Purges all WITHDRAWN Intents
@@ -1787,6 +2080,72 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def intentsIndex( self, intentsJson=None ):
+        """
+        Description:
+            Index the intents by ID, so lookups don't have to scan the
+            whole intents list.
+        Optional:
+            intentsJson - json string from the onos:intents api, it is
+                          fetched from ONOS if not given. An index returned
+                          by this function is given back as is.
+        Returns:
+            A dictionary with:
+            'intents' - dictionary of intent ID to the intent
+            'states' - dictionary of state to the number of intents
+            'types' - dictionary of intent type to a dictionary of state
+                      to the number of intents of that type
+            Returns None on error
+        """
+        try:
+            if isinstance( intentsJson, types.DictType ):
+                return intentsJson
+            if not intentsJson:
+                intentsJson = self.intents()
+            # The same intents output is only indexed once
+            return jsonparser.driverMemo( self ).parse( intentsJson,
+                                                      self.indexIntents )
+        except ( TypeError, ValueError ):
+            main.log.exception( self.name + ": Object not as expected" )
+            main.log.debug( self.name + ": intents: " + repr( intentsJson ) )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+    def indexIntents( self, intentsJson ):
+        """
+        Builds the intents index of intentsIndex from the intents json
+        """
+        index = { 'intents': {}, 'states': {}, 'types': {} }
+        for intent in jsonparser.iterArray( intentsJson ):
+            state = intent.get( 'state' )
+            index[ 'intents' ][ intent.get( 'id' ) ] = intent
+            index[ 'states' ][ state ] = index[ 'states' ].get( state, 0 ) + 1
+            typeStates = index[ 'types' ].setdefault( intent.get( 'type' ), {} )
+            typeStates[ state ] = typeStates.get( state, 0 ) + 1
+        return index
+
+    def iterIntents( self, intentsJson=None ):
+        """
+        Description:
+            Yields the intents one at a time instead of parsing the whole
+            intents json at once
+        Optional:
+            intentsJson - json string from the onos:intents api, it is
+                          fetched from ONOS if not given
+        """
+        if not intentsJson:
+            intentsJson = self.intents()
+        for intent in jsonparser.iterArray( intentsJson ):
+            yield intent
+
     def getIntentState(self, intentsId, intentsJson=None):
         """
             Check intent state.
@@ -1797,7 +2156,8 @@ class OnosCliDriver( CLI ):
             corresponding states as the values
             Parameters:
             intentId: intent ID (string type)
-            intentsJson: parsed json object from the onos:intents api
+            intentsJson: json string from the onos:intents api or an index
+                         from intentsIndex
             Returns:
             state = An intent's state- INSTALL,WITHDRAWN etc.
             stateDict = Dictionary of intent's state. intent ID as the keys and
@@ -1805,28 +2165,22 @@ class OnosCliDriver( CLI ):
         """
         try:
             state = "State is Undefined"
-            if not intentsJson:
-                intentsJsonTemp = json.loads( self.intents() )
-            else:
-                intentsJsonTemp = json.loads( intentsJson )
+            index = self.intentsIndex( intentsJson )
+            if index is None:
+                return None
+            intentsById = index[ 'intents' ]
             if isinstance( intentsId, types.StringType ):
-                for intent in intentsJsonTemp:
-                    if intentsId == intent[ 'id' ]:
-                        state = intent[ 'state' ]
-                        return state
+                if intentsId in intentsById:
+                    return intentsById[ intentsId ][ 'state' ]
                 main.log.info( "Cannot find intent ID" + str( intentsId ) +
                                " on the list" )
                 return state
             elif isinstance( intentsId, types.ListType ):
                 dictList = []
-                for i in xrange( len( intentsId ) ):
-                    stateDict = {}
-                    for intents in intentsJsonTemp:
-                        if intentsId[ i ] == intents[ 'id' ]:
-                            stateDict[ 'state' ] = intents[ 'state' ]
-                            stateDict[ 'id' ] = intentsId[ i ]
-                            dictList.append( stateDict )
-                            break
+                for intentId in intentsId:
+                    if intentId in intentsById:
+                        dictList.append( { 'state': intentsById[ intentId ][ 'state' ],
+                                           'id': intentId } )
                 if len( intentsId ) != len( dictList ):
                     main.log.info( "Cannot find some of the intent ID state" )
                 return dictList
@@ -1846,6 +2200,93 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def intentStates( self, intentsId ):
+        """
+        Description:
+            Get the states of a few intents without fetching all the
+            intents, the intents list is filtered by ONOS
+        Required:
+            intentsId - List of intent IDs
+        Returns:
+            A dictionary of intent ID to its state, the IDs which are not
+            found in ONOS are left out;
+            Returns None on error
+        """
+        try:
+            intentsId = [ str( intentId ) for intentId in intentsId ]
+            if not intentsId:
+                return {}
+            cmdStr = 'onos:intents | grep "id=(' + "|".join( intentsId ) +\
+                     '),"'
+            output = self.sendline( cmdStr )
+            if output is None or re.search( "Error", output ):
+                main.log.error( self.name + ": Error in getting the intents " +
+                                "states: " + str( output ) )
+                return None
+            states = {}
+            for intentId, state in intentStateRe.findall( output ):
+                if intentId in intentsId:
+                    states[ intentId ] = state
+            return states
+        except TypeError:
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+    def getPendingIntents( self, intentsId="ALL", expectedState='INSTALLED',
+                           intentsJson=None ):
+        """
+        Description:
+            Find the intents which are not in the expected state(s) yet
+        Optional:
+            intentsId - List of intents ID to be checked, or "ALL" to check
+                        all the intents in ONOS
+            expectedState - Expected state or list of expected states
+            intentsJson - json string from the onos:intents api or an index
+                          from intentsIndex, it is fetched from ONOS if not
+                          given
+        Returns:
+            A list of the intent IDs which are not in the expected state(s),
+            including the IDs which are not found in ONOS;
+            Returns None on error
+        """
+        try:
+            index = self.intentsIndex( intentsJson )
+            if index is None:
+                return None
+            intentsById = index[ 'intents' ]
+            if isinstance( expectedState, types.StringType ):
+                expectedState = [ expectedState ]
+            expectedState = set( expectedState )
+            if intentsId == "ALL":
+                intentsId = intentsById.keys()
+            pending = []
+            for intentId in intentsId:
+                intent = intentsById.get( intentId )
+                if intent is None or intent.get( 'state' ) not in expectedState:
+                    pending.append( intentId )
+            return pending
+        except TypeError:
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
     def checkIntentState( self, intentsId, expectedState='INSTALLED' ):
         """
         Description:
@@ -1862,42 +2303,32 @@ class OnosCliDriver( CLI ):
             , otherwise, returns main.FALSE.
         """
         try:
-            # Generating a dictionary: intent id as a key and state as value
+            # Generating a dictionary: intent id as a key and intent as value
             returnValue = main.TRUE
-            intentsDict = self.getIntentState( intentsId )
+            index = self.intentsIndex()
+            if index is None:
+                return main.FALSE
+            intentsById = index[ 'intents' ]
 
-            #print "len of intentsDict ", str( len( intentsDict ) )
-            if len( intentsId ) != len( intentsDict ):
+            if any( intentId not in intentsById for intentId in intentsId ):
                 main.log.info( self.name + "There is something wrong " +
                                "getting intents state" )
                 return main.FALSE
 
-            if isinstance( expectedState, types.StringType ):
-                for intents in intentsDict:
-                    if intents.get( 'state' ) != expectedState:
-                        main.log.debug( self.name + " : Intent ID - " +
-                                        intents.get( 'id' ) +
-                                        " actual state = " +
-                                        intents.get( 'state' )
-                                        + " does not equal expected state = "
-                                        + expectedState )
-                        returnValue = main.FALSE
-
-            elif isinstance( expectedState, types.ListType ):
-                for intents in intentsDict:
-                    if not any( state == intents.get( 'state' ) for state in
-                                expectedState ):
-                        main.log.debug( self.name + " : Intent ID - " +
-                                        intents.get( 'id' ) +
-                                        " actual state = " +
-                                        intents.get( 'state' ) +
-                                        " does not equal expected states = "
-                                        + str( expectedState ) )
-                        returnValue = main.FALSE
+            pending = self.getPendingIntents( intentsId, expectedState,
+                                              intentsJson=index )
+            for intentId in pending:
+                main.log.debug( self.name + " : Intent ID - " +
+                                intentId +
+                                " actual state = " +
+                                intentsById[ intentId ].get( 'state' ) +
+                                " does not equal expected state = "
+                                + str( expectedState ) )
+                returnValue = main.FALSE
 
             if returnValue == main.TRUE:
                 main.log.info( self.name + ": All " +
-                               str( len( intentsDict ) ) +
+                               str( len( intentsId ) ) +
                                " intents are in " + str( expectedState ) +
                                " state" )
             return returnValue
@@ -1914,10 +2345,11 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
-    def flows( self, jsonFormat=True ):
+    def flows( self, jsonFormat=True, device="" ):
         """
         Optional:
             * jsonFormat: enable output formatting in json
+            * device: only get the flows of this device
         Description:
             Obtain flows currently installed
         """
@@ -1925,6 +2357,8 @@ class OnosCliDriver( CLI ):
             cmdStr = "flows"
             if jsonFormat:
                 cmdStr += " -j"
+            if device:
+                cmdStr += " any " + str( device )
             handle = self.sendline( cmdStr )
             if re.search( "Error:", handle ):
                 main.log.error( self.name + ": flows() response: " +
@@ -1943,6 +2377,22 @@ class OnosCliDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def iterFlows( self, device="", flowsJson=None ):
+        """
+        Description:
+            Yields a ( deviceId, flow ) tuple for each flow, parsing the
+            flows json one device at a time instead of all at once
+        Optional:
+            * device: only get the flows of this device
+            * flowsJson: json string from the flows api, it is fetched
+                         from ONOS if not given
+        """
+        if not flowsJson:
+            flowsJson = self.flows( device=device )
+        for entry in jsonparser.iterArray( flowsJson ):
+            for flow in entry.get( 'flows' ):
+                yield ( entry.get( 'device' ), flow )
+
     def checkFlowsState( self ):
         """
         Description:
@@ -1954,23 +2404,158 @@ class OnosCliDriver( CLI ):
                           otherwise.
         """
         try:
-            tempFlows = json.loads( self.flows() )
-            #print tempFlows[0]
             returnValue = main.TRUE
 
-            for device in tempFlows:
-                for flow in device.get( 'flows' ):
-                    if flow.get( 'state' ) != 'ADDED' and flow.get( 'state' ) != \
-                            'PENDING_ADD':
+            for device, flow in self.iterFlows():
+                if flow.get( 'state' ) != 'ADDED' and flow.get( 'state' ) != \
+                        'PENDING_ADD':
 
-                        main.log.info( self.name + ": flow Id: " +
-                                       str( flow.get( 'groupId' ) ) +
-                                       " | state:" +
-                                       str( flow.get( 'state' ) ) )
-                        returnValue = main.FALSE
+                    main.log.info( self.name + ": flow Id: " +
+                                   str( flow.get( 'groupId' ) ) +
+                                   " | state:" +
+                                   str( flow.get( 'state' ) ) )
+                    returnValue = main.FALSE
 
             return returnValue
-        except TypeError:
+        except ( TypeError, ValueError ):
+            main.log.exception( self.name + ": Object not as expected" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+    def waitForConvergence( self, intentsId="ALL", expectedState='INSTALLED',
+                            checkFlows=True, timeout=60, sleep=1, maxSleep=8,
+                            fetchThreshold=10 ):
+        """
+        Description:
+            Wait for the intents to be in the expected state(s) and, if
+            checkFlows is True, for the flows to be ADDED. Objects which
+            already converged are not checked again, and the wait between
+            polls doubles up to maxSleep while nothing converges. Once
+            fetchThreshold or less intents are pending, only their states
+            are fetched, and once fetchThreshold or less flows are pending,
+            only the flows of their devices are fetched. Pending flows which
+            are removed from their device are dropped.
+        Optional:
+            intentsId - List of intents ID to wait for, or "ALL" for all the
+                        intents in ONOS when the wait starts
+            expectedState - Expected state or list of expected states
+            checkFlows - Also wait for the flows to be ADDED
+            timeout - Seconds to wait before giving up
+            sleep - Seconds between the first polls
+            maxSleep - Maximum seconds between polls
+            fetchThreshold - Number of pending intents or flows under which
+                             only the pending intents or the devices of the
+                             pending flows are fetched
+        Returns:
+            A dictionary with:
+            'result' - main.TRUE if everything converged before the timeout,
+                       otherwise main.FALSE
+            'intents' - dictionary of intent ID to the seconds it took to be
+                        in the expected state
+            'flows' - dictionary of "deviceId/flowId" to the seconds it took
+                      to be ADDED
+            'pending' - list of the intent IDs and flows which did not
+                        converge
+            Returns None on error
+        """
+        try:
+            if isinstance( expectedState, types.StringType ):
+                expectedState = [ expectedState ]
+            start = time.time()
+            intentTimes = {}
+            flowTimes = {}
+            # Intent IDs and flow key to device ID of the objects which did
+            # not converge yet
+            pendingIntents = None
+            pendingFlows = {}
+            delay = sleep
+            polls = 0
+            while True:
+                polls += 1
+                converged = 0
+                # Intents
+                if pendingIntents and len( pendingIntents ) <= fetchThreshold:
+                    # Only ask for the states of the pending intents
+                    states = self.intentStates( pendingIntents )
+                    if states is None:
+                        return None
+                    stillPending = [ intentId for intentId in pendingIntents
+                                     if states.get( intentId ) not in expectedState ]
+                elif pendingIntents is None or pendingIntents:
+                    index = self.intentsIndex()
+                    if index is None:
+                        return None
+                    if pendingIntents is None:
+                        if intentsId == "ALL":
+                            intentsId = index[ 'intents' ].keys()
+                        pendingIntents = set( intentsId )
+                    stillPending = self.getPendingIntents( pendingIntents,
+                                                           expectedState,
+                                                           intentsJson=index )
+                if pendingIntents:
+                    elapsed = time.time() - start
+                    for intentId in pendingIntents.difference( stillPending ):
+                        intentTimes[ intentId ] = elapsed
+                        converged += 1
+                    pendingIntents = set( stillPending )
+                # Flows
+                if checkFlows:
+                    if polls == 1 or len( pendingFlows ) > fetchThreshold:
+                        flowsList = list( self.iterFlows() )
+                    else:
+                        flowsList = []
+                        for device in set( pendingFlows.values() ):
+                            flowsList += list( self.iterFlows( device=device ) )
+                    elapsed = time.time() - start
+                    fetched = set()
+                    for device, flow in flowsList:
+                        key = str( device ) + "/" + str( flow.get( 'id' ) )
+                        fetched.add( key )
+                        if key in flowTimes:
+                            continue
+                        if flow.get( 'state' ) == 'ADDED':
+                            flowTimes[ key ] = elapsed
+                            if pendingFlows.pop( key, None ):
+                                converged += 1
+                        else:
+                            pendingFlows[ key ] = device
+                    # Pending flows removed from their device are not
+                    # waited for anymore
+                    for key in set( pendingFlows ).difference( fetched ):
+                        main.log.debug( self.name + ": Flow " + key +
+                                        " was removed before it was ADDED" )
+                        del pendingFlows[ key ]
+                pending = list( pendingIntents ) + pendingFlows.keys()
+                remaining = timeout - ( time.time() - start )
+                if not pending or remaining <= 0:
+                    break
+                # Back off while nothing converges
+                delay = sleep if converged else min( delay * 2, maxSleep )
+                main.log.debug( self.name + ": " + str( len( pending ) ) +
+                                " objects did not converge yet, checking " +
+                                "again in " + str( delay ) + " seconds" )
+                time.sleep( min( delay, remaining ) )
+            if pending:
+                main.log.warn( self.name + ": " + str( len( pending ) ) +
+                               " objects did not converge after " +
+                               str( timeout ) + " seconds: " + str( pending ) )
+                result = main.FALSE
+            else:
+                main.log.info( self.name + ": Converged in " +
+                               str( round( time.time() - start, 3 ) ) +
+                               " seconds" )
+                result = main.TRUE
+            return { 'result': result, 'intents': intentTimes,
+                     'flows': flowTimes, 'pending': pending }
+        except ( TypeError, ValueError ):
             main.log.exception( self.name + ": Object not as expected" )
             return None
         except pexpect.EOF:
@@ -21,6 +21,8 @@ import types
 import pexpect
 import os
 import os.path
+import re
+import threading
 from requests.models import Response
 from drivers.common.clidriver import CLI
 
@@ -34,6 +36,13 @@ class OnosDriver( CLI ):
         self.name = None
         self.home = None
         self.handle = None
+        # Node ip to the state of scanLogs on its log
+        self.logScans = {}
+        # State of the log tails, see startLogTail
+        self.logTails = {}
+        self.logSubscriptions = {}
+        self.logLatest = {}
+        self.logLock = threading.Lock()
         super( CLI, self ).__init__()
 
     def connect( self, **connectargs ):
@@ -140,6 +149,24 @@ class OnosDriver( CLI ):
             main.cleanup()
             main.exit()
 
+    def restoreChannel( self ):
+        """
+        Reopens the ssh channel to the bench after it was closed and goes
+        back to the ONOS home directory, so execute can resend the command.
+        Returns main.TRUE if the shell prompt is back, else main.FALSE
+        """
+        try:
+            if not self.reconnect():
+                main.log.error( self.name + ": Could not reopen the channel" )
+                return main.FALSE
+            self.handle.sendline( "cd " + self.home )
+            self.handle.expect( "\$" )
+            return main.TRUE
+        except ( pexpect.EOF, pexpect.TIMEOUT ):
+            main.log.error( self.name + ": Shell prompt not found after " +
+                            "reconnecting" )
+            return main.FALSE
+
     def disconnect( self ):
         """
         Called when Test is complete to disconnect the ONOS handle.
@@ -1421,7 +1448,7 @@ class OnosDriver( CLI ):
             main.cleanup()
             main.exit()
 
-    def tsharkPcap( self, interface, dirFile ):
+    def tsharkPcap( self, interface, dirFile, captureFilter="" ):
         """
         Capture all packet activity and store in specified
         directory/file
@@ -1429,12 +1456,18 @@ class OnosDriver( CLI ):
         Required:
             * interface: interface to capture
             * dir: directory/filename to store pcap
+        Optional:
+            * captureFilter: capture filter, i.e. "tcp port 6633", to only
+              store the packets read by core.ofpcap
         """
         try:
             self.handle.sendline( "" )
             self.handle.expect( "\$" )
 
-            self.handle.sendline( "tshark -i " + str( interface ) + " -t e -w " + str( dirFile ) + " &" )
+            cmd = "tshark -i " + str( interface ) + " -t e -w " + str( dirFile )
+            if captureFilter:
+                cmd += " -f \"" + str( captureFilter ) + "\""
+            self.handle.sendline( cmd + " &" )
             self.handle.sendline( "\r" )
             self.handle.expect( "Capturing on" )
             self.handle.sendline( "\r" )
@@ -2057,13 +2090,121 @@ class OnosDriver( CLI ):
 
         return sorted( self.onosIps.values() )
 
+    def scanLogs( self, nodeIps, searchTerms, lastLines=5, timeout=300,
+                  logFile="/opt/onos/log/karaf.log" ):
+        """
+        Count the lines of the karaf log of each node containing each of the
+        search terms.
+
+        The log of every node is read once, on the node, by one grep for all
+        the terms, and all the nodes are scanned at the same time. The byte
+        offset reached in each log is remembered, so the next scan of a
+        node only reads what was logged since, unless the log was rotated
+        or new terms are searched for.
+
+        Returns a dictionary of node ip to a dictionary with:
+            'counts' - dictionary of term to the number of lines with it
+            'last' - dictionary of term to the list of the last lastLines
+                     lines with it
+        """
+        import collections
+        if isinstance( nodeIps, types.StringTypes ):
+            nodeIps = [ nodeIps ]
+        if isinstance( searchTerms, types.StringTypes ):
+            searchTerms = [ searchTerms ]
+        for ip in nodeIps:
+            scan = self.logScans.get( ip )
+            if scan is None or not set( searchTerms ) <= set( scan[ 'terms' ] )\
+                    or scan[ 'lastLines' ] != lastLines:
+                # Start over to count the new terms in the whole log
+                terms = sorted( set( searchTerms ) |
+                                set( scan[ 'terms' ] if scan else [] ) )
+                self.logScans[ ip ] = {
+                    'terms': terms,
+                    'lastLines': lastLines,
+                    'offset': 0,
+                    'counts': dict( ( term, 0 ) for term in terms ),
+                    'last': dict( ( term, collections.deque( maxlen=lastLines ) )
+                                  for term in terms ) }
+        try:
+            jobs = []
+            for ip in nodeIps:
+                scan = self.logScans[ ip ]
+                patterns = " ".join( "-e '" + term.replace( "'", "'\\''" ) + "'"
+                                     for term in scan[ 'terms' ] )
+                # The script is sent in double quotes, where these are
+                # still special
+                patterns = re.sub( r'(["$`\\])', r'\\\1', patterns )
+                # Runs on the node. Starts over if the log got smaller, i.e.
+                # it was rotated or onos was reinstalled
+                script = "s=\\$(wc -c < " + logFile + "); o=" +\
+                         str( scan[ 'offset' ] ) + "; [ \\$s -lt \\$o ] && o=0; " +\
+                         "echo TESTON-SIZE \\$s \\$o; tail -c +\\$((o+1)) " +\
+                         logFile + " | head -c \\$((s-o)) | grep -F " + patterns
+                # Each node writes to its own file so lines are not mixed
+                jobs.append( "( onos-ssh " + ip + " \"" + script + "\" < /dev/null" +
+                             " | sed 's/^/" + ip + "|/' > /tmp/teston-logscan-" +
+                             ip + " ) &" )
+            files = " ".join( "/tmp/teston-logscan-" + ip for ip in nodeIps )
+            # The quotes keep the marker out of the echoed command
+            cmd = " ".join( jobs ) + " wait; cat " + files + "; rm -f " +\
+                files + "; echo TESTON-SCAN''-DONE"
+            self.handle.sendline( cmd )
+            self.handle.expect( "TESTON-SCAN-DONE", timeout=timeout )
+            output = self.handle.before
+            self.handle.expect( "\$" )
+        except pexpect.TIMEOUT:
+            main.log.error( self.name + ": Log scan did not finish in " +
+                            str( timeout ) + " seconds" )
+            self.handle.send( "\x03" )
+            self.handle.expect( "\$" )
+            return None
+        except pexpect.EOF:
+            main.log.error( self.name + ": EOF exception found" )
+            main.log.error( self.name + ":    " + self.handle.before )
+            main.cleanup()
+            main.exit()
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
+
+        sizeRE = re.compile( r"TESTON-SIZE (?P<size>\d+) (?P<offset>\d+)" )
+        for line in output.splitlines():
+            ip, sep, logLine = line.strip( "\r" ).partition( "|" )
+            scan = self.logScans.get( ip )
+            if not sep or scan is None:
+                continue
+            match = sizeRE.match( logLine )
+            if match:
+                if int( match.group( 'offset' ) ) < scan[ 'offset' ]:
+                    # The log was rotated
+                    for term in scan[ 'terms' ]:
+                        scan[ 'counts' ][ term ] = 0
+                        scan[ 'last' ][ term ].clear()
+                scan[ 'offset' ] = int( match.group( 'size' ) )
+                continue
+            for term in scan[ 'terms' ]:
+                if term in logLine:
+                    scan[ 'counts' ][ term ] += 1
+                    scan[ 'last' ][ term ].append( logLine )
+        results = {}
+        for ip in nodeIps:
+            scan = self.logScans[ ip ]
+            results[ ip ] = { 'counts': dict( ( term, scan[ 'counts' ][ term ] )
+                                              for term in searchTerms ),
+                              'last': dict( ( term, list( scan[ 'last' ][ term ] ) )
+                                            for term in searchTerms ) }
+        return results
+
     def logReport( self, nodeIp, searchTerms, outputMode="s" ):
         '''
             - accepts either a list or a string for "searchTerms" these
               terms will be searched for in the log and have their
               instances counted
 
-            - nodeIp is the ip of the node whos log is to be scanned
+            - nodeIp is the ip of the node whos log is to be scanned, or a
+              list of ips to scan the logs of several nodes at once
 
             - output modes:
                 "s" -   Simple. Quiet output mode that just prints
@@ -2072,50 +2213,269 @@ class OnosDriver( CLI ):
                 "d" -   Detailed. Prints number of occurences as well as the entire
                         line for each of the last 5 occurences
 
-            - returns total of the number of instances of all search terms
+            - returns total of the number of instances of all search terms,
+              or -1 if the logs could not be scanned
+
+            See scanLogs, only the part of the log written since the last
+            report is read
         '''
         main.log.info("========================== Log Report ===========================\n")
 
         if type(searchTerms) is str:
             searchTerms = [searchTerms]
-
-        logLines = [ [" "] for i in range(len(searchTerms)) ]
-
-        for term in range(len(searchTerms)):
-            logLines[term][0] = searchTerms[term]
-
+        nodeIps = [ nodeIp ] if isinstance( nodeIp, types.StringTypes ) else nodeIp
+
+        results = self.scanLogs( nodeIps, searchTerms )
+        if results is None:
+            main.log.error( self.name + ": The log report is incomplete, " +
+                            "the logs could not be scanned" )
+            main.log.info("================================================================\n")
+            return -1
         totalHits = 0
-        for term in range(len(searchTerms)):
-            cmd = "onos-ssh " + nodeIp + " cat /opt/onos/log/karaf.log | grep " + searchTerms[term]
-            self.handle.sendline(cmd)
-            self.handle.expect(":~")
-            before = (self.handle.before).splitlines()
+        for ip in nodeIps:
+            if ip not in results:
+                continue
+            if len( nodeIps ) > 1:
+                main.log.info( ip + ":" )
+            for term in searchTerms:
+                count = results[ ip ][ 'counts' ][ term ]
+                main.log.info( str( term ) + ": " + str( count ) )
+                totalHits += count
+
+            if outputMode != "s" and outputMode != "S":
+                for term in searchTerms:
+                    lastLines = results[ ip ][ 'last' ][ term ]
+                    if lastLines:
+                        main.log.info( term + ": \n" + "\n".join( lastLines ) + "\n" )
 
-            count = [searchTerms[term],0]
+        main.log.info("================================================================\n")
+        return totalHits
 
-            for line in before:
-                if searchTerms[term] in line and "grep" not in line:
-                    count[1] += 1
-                    if before.index(line) > ( len(before) - 7 ):
-                        logLines[term].append(line)
+    def startLogTail( self, nodeIps, logFile="/opt/onos/log/karaf.log" ):
+        """
+        Start following the karaf log of each node in the background.
 
-            main.log.info( str(count[0]) + ": " + str(count[1]) )
-            if term == len(searchTerms)-1:
-                print("\n")
-            totalHits += int(count[1])
+        Each node gets its own ssh channel to the bench running
+        "onos-ssh <ip> tail -F", and a thread parsing every new line into
+        an event dictionary with the 'node', 'time' it was read, the
+        'line' and its karaf fields 'timestamp', 'level', 'thread',
+        'logger', 'bundle' and 'message' ( None for the lines of a stack
+        trace ).
 
-        if outputMode != "s" and outputMode != "S":
-            outputString = ""
-            for i in logLines:
-                outputString = i[0] + ": \n"
-                for x in range(1,len(i)):
-                    outputString += ( i[x] + "\n" )
+        The byte offset read up to in each log is kept, so if the channel
+        of a node is closed under the tail it is reopened at that offset
+        and no line is lost or read twice. The tail starts over at the
+        beginning of the log if it got smaller than the offset.
 
-                if outputString != (i[0] + ": \n"):
-                    main.log.info(outputString)
+        Use subscribeLog to get the events matching a string as they
+        arrive and latestLogEvent to look up the last one. Stop with
+        stopLogTail.
 
-        main.log.info("================================================================\n")
-        return totalHits
+        Returns main.TRUE if all the tails were started, else main.FALSE
+        """
+        if isinstance( nodeIps, types.StringTypes ):
+            nodeIps = [ nodeIps ]
+        result = main.TRUE
+        for ip in nodeIps:
+            if ip in self.logTails:
+                continue
+            try:
+                handle, offset = self.spawnLogTail( ip, logFile )
+            except ( pexpect.EOF, pexpect.TIMEOUT ):
+                main.log.error( self.name + ": Could not start the log tail " +
+                                "of " + ip )
+                result = main.FALSE
+                continue
+            thread = threading.Thread( target=self.readLogTail,
+                                       name="logtail-" + ip,
+                                       args=( ip, handle ) )
+            thread.daemon = True
+            with self.logLock:
+                self.logTails[ ip ] = { 'handle': handle, 'thread': thread,
+                                        'logFile': logFile, 'offset': offset }
+            thread.start()
+            main.log.info( self.name + ": Following the log of " + ip )
+        return result
+
+    def spawnLogTail( self, ip, logFile, offset=None ):
+        """
+        Opens a ssh channel to the bench following the log of a node from
+        the byte offset, from the current end of the log if offset is None.
+        Returns the handle and the offset the tail starts at.
+        """
+        from drivers.common.clidriver import sshTransport
+        sshOptions = sshTransport.options()
+        if self.port:
+            sshOptions += "-p " + str( self.port ) + " "
+        handle = pexpect.spawn( "ssh " + sshOptions + self.user_name +
+                                "@" + self.ip_address,
+                                env={ "TERM": "xterm-mono" },
+                                maxread=50000 )
+        try:
+            i = handle.expect( [ 'password:|Password:', '\$' ], 120 )
+            if i == 0:
+                handle.sendline( self.pwd or "" )
+                handle.expect( '\$', 120 )
+            # Runs on the node, starts over if the log got smaller than the
+            # offset, i.e. it was rotated or onos was reinstalled
+            start = "\\$s" if offset is None else str( offset )
+            handle.sendline( "onos-ssh " + ip + " \"s=\\$(wc -c < " + logFile +
+                             "); o=" + start + "; [ \\$s -lt \\$o ] && o=0; " +
+                             "echo TESTON-TAIL-\\$o; tail -F -c +\\$((o+1)) " +
+                             logFile + "\"" )
+            handle.expect( "TESTON-TAIL-(\d+)\r?\n" )
+        except ( pexpect.EOF, pexpect.TIMEOUT ):
+            handle.close( force=True )
+            raise
+        return handle, int( handle.match.group( 1 ) )
+
+    def readLogTail( self, ip, handle ):
+        """
+        Thread reading the log tail of a node, see startLogTail
+        """
+        # 2016-01-05 10:11:12,345 | INFO  | thread | Logger | bundle | message
+        karafRE = re.compile( r"(?P<timestamp>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d+)" +
+                              r" \| (?P<level>\w+)\s*\| (?P<thread>.*?)\s*\|" +
+                              r" (?P<logger>.*?)\s*\| (?P<bundle>.*?)\s*\|" +
+                              r" (?P<message>.*)$" )
+        fields = [ 'timestamp', 'level', 'thread', 'logger', 'bundle',
+                   'message' ]
+
+        def current():
+            # The tail is stopped, or was restarted by another thread
+            return self.logTails.get( ip, {} ).get( 'handle' ) is handle
+
+        retries = 0
+        while current():
+            try:
+                line = handle.readline()
+            except pexpect.TIMEOUT:
+                continue
+            except ( pexpect.EOF, ValueError, OSError ):
+                line = ""
+            if not line:
+                # The channel was closed, reopen it where the tail stopped
+                with self.logLock:
+                    if not current():
+                        break
+                    tail = self.logTails[ ip ]
+                if retries >= 3:
+                    main.log.error( self.name + ": Lost the log tail of " + ip )
+                    break
+                retries += 1
+                main.log.warn( self.name + ": Log tail of " + ip + " closed, " +
+                               "restarting it at byte " + str( tail[ 'offset' ] ) )
+                time.sleep( retries )
+                try:
+                    newHandle, offset = self.spawnLogTail( ip, tail[ 'logFile' ],
+                                                           tail[ 'offset' ] )
+                except ( pexpect.EOF, pexpect.TIMEOUT ):
+                    continue
+                with self.logLock:
+                    if not current():
+                        newHandle.close( force=True )
+                        break
+                    tail[ 'handle' ] = newHandle
+                    tail[ 'offset' ] = offset
+                try:
+                    handle.close( force=True )
+                except Exception:
+                    pass
+                handle = newHandle
+                continue
+            retries = 0
+            # The pty turns each "\n" of the log into "\r\n"
+            line = line.rstrip( "\r\n" )
+            size = len( line ) + 1
+            event = { 'node': ip, 'time': time.time(), 'line': line }
+            match = karafRE.match( line )
+            for field in fields:
+                event[ field ] = match.group( field ) if match else None
+            with self.logLock:
+                if current():
+                    self.logTails[ ip ][ 'offset' ] += size
+                subscriptions = list( self.logSubscriptions.items() )
+                for pattern, callbacks in subscriptions:
+                    if pattern in line:
+                        self.logLatest[ ( ip, pattern ) ] = event
+            for pattern, callbacks in subscriptions:
+                if pattern in line:
+                    for callback in callbacks:
+                        try:
+                            callback( event )
+                        except Exception:
+                            main.log.exception( self.name + ": Error in " +
+                                                "the log subscriber of " +
+                                                pattern )
+        with self.logLock:
+            if current():
+                self.logTails.pop( ip, None )
+
+    def subscribeLog( self, pattern, callback=None ):
+        """
+        Follow the log lines containing the pattern string on all the
+        tailed nodes. The last one of each node can then be looked up with
+        latestLogEvent, and callback, if given, is called from the tail
+        thread with each event, see startLogTail
+        """
+        with self.logLock:
+            callbacks = self.logSubscriptions.setdefault( pattern, [] )
+            if callback is not None:
+                callbacks.append( callback )
+        return main.TRUE
+
+    def unsubscribeLog( self, pattern ):
+        with self.logLock:
+            self.logSubscriptions.pop( pattern, None )
+            for key in [ key for key in self.logLatest.keys()
+                         if key[ 1 ] == pattern ]:
+                self.logLatest.pop( key, None )
+
+    def latestLogEvent( self, nodeIp, pattern, since=None, timeout=0 ):
+        """
+        Returns the last event logged by the node containing the pattern,
+        which has to be subscribed to with subscribeLog.
+
+        since - only return an event read after this time.time()
+        timeout - seconds to wait for such an event if there is none yet
+
+        Returns None if there is no such event
+        """
+        deadline = time.time() + timeout
+        while True:
+            with self.logLock:
+                event = self.logLatest.get( ( nodeIp, pattern ) )
+            if event is not None and ( since is None or event[ 'time' ] >= since ):
+                return event
+            if time.time() >= deadline:
+                return None
+            time.sleep( 0.1 )
+
+    def stopLogTail( self, nodeIps=None ):
+        """
+        Stop following the log of the given nodes, of all of them by
+        default
+        """
+        if nodeIps is None:
+            nodeIps = self.logTails.keys()
+        elif isinstance( nodeIps, types.StringTypes ):
+            nodeIps = [ nodeIps ]
+        for ip in nodeIps:
+            with self.logLock:
+                tail = self.logTails.pop( ip, None )
+            if tail is None:
+                continue
+            try:
+                tail[ 'handle' ].sendcontrol( "c" )
+                tail[ 'handle' ].close( force=True )
+            except Exception:
+                pass
+            tail[ 'thread' ].join( 5 )
+            with self.logLock:
+                for key in [ key for key in self.logLatest.keys()
+                             if key[ 0 ] == ip ]:
+                    self.logLatest.pop( key, None )
+        return main.TRUE
 
     def copyMininetFile( self, fileName, localPath, userName, ip,
                          mnPath='~/mininet/custom/', timeout = 60 ):
@@ -2191,21 +2551,39 @@ class OnosDriver( CLI ):
         serviceConfig.write("""${ONOS_HOME}/apache-karaf-$KARAF_VERSION/bin/karaf "$@" \n """)
         serviceConfig.close()
 
-    def createDBFile(self, testData):
-
-        filename = main.TEST + "DB"
-        DBString = ""
-
-        for item in testData:
-            if type(item) is string:
-                item = "'" + item + "'"
-            if testData.index(item) < len(testData-1):
-                item += ","
-            DBString += str(item)
+    def createDBFile( self, testData ):
+        """
+        Add a row of results to the <test name>DB file, written as SQL
+        values at the end of the test case, i.e.
+            'commit',3.0,'baremetal1',1234.5
 
-        DBFile = open(filename, "a")
-        DBFile.write(DBString)
-        DBFile.close()
+        Required:
+            * testData: list of the values of the row, strings are quoted,
+                        numbers are written as floats and None as NULL
+        Returns main.TRUE, or main.FALSE if the values do not match the
+        number of values of the first row, or a string is given where the
+        first row had a number or the other way around.
+        """
+        try:
+            schema = []
+            for index, item in enumerate( testData ):
+                kind = str if isinstance( item, basestring ) else float
+                schema.append( ( "value" + str( index ), kind ) )
+            sink = main.resultSink( main.TEST + "DB", schema, backend="csv",
+                                    header=False, dialect="sqlvalues" )
+            if len( testData ) != len( sink.columns ):
+                raise ValueError( "Expected " + str( len( sink.columns ) ) +
+                                  " values" )
+            sink.add( dict( zip( sink.columns, testData ) ) )
+            return main.TRUE
+        except ( TypeError, ValueError ):
+            main.log.exception( self.name + ": Row " + str( testData ) +
+                                " does not match the results file" )
+            return main.FALSE
+        except Exception:
+            main.log.exception( self.name + ": Uncaught exception!" )
+            main.cleanup()
+            main.exit()
 
     def verifySummary(self, ONOSIp,*deviceCount):
 
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+ClusterSnapshot captures the state of all the nodes of an ONOS cluster at
+once, so tests can check and compare it without fetching it again.
+
+    TestON is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 2 of the License, or
+    ( at your option ) any later version.
+
+    TestON is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with TestON.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+import time
+
+from core import consistency
+from core import jsonparser
+
+
+def rolesKeys( entry ):
+    return [ ( entry.get( 'id' ), entry ) ]
+
+
+def intentsKeys( entry ):
+    return [ ( entry.get( 'id' ), entry ) ]
+
+
+def flowsKeys( entry ):
+    return [ ( str( entry.get( 'device' ) ) + "/" + str( flow.get( 'id' ) ),
+               flow ) for flow in entry.get( 'flows', [] ) ]
+
+
+def leadersKeys( entry ):
+    return [ ( entry.get( 'topic' ), entry ) ]
+
+
+def partitionsKeys( entry ):
+    return [ ( entry.get( 'name' ), entry ) ]
+
+
+class ClusterSnapshot( object ):
+    """
+    Usage:
+        before = ClusterSnapshot( main.CLIs ).capture()
+        ...
+        after = ClusterSnapshot( main.CLIs ).capture()
+        after.consistent( 'intents' )
+        after.diff( before, 'intents' )
+
+    Each node answers all the views in one round-trip with sendlines, and
+    the nodes are captured in parallel. The json of a view is only parsed,
+    and indexed by the key of its entries, when it is first used.
+    """
+
+    # View name to its CLI command and the function giving the
+    # ( key, entry ) pairs of an element of its json output
+    views = { 'roles': ( "roles -j", rolesKeys ),
+              'intents': ( "intents -j", intentsKeys ),
+              'flows': ( "flows -j", flowsKeys ),
+              'leaders': ( "onos:leaders -j", leadersKeys ),
+              'partitions': ( "onos:partitions -j", partitionsKeys ) }
+    # Fields which differ between nodes without being inconsistent
+    volatile = { 'flows': ( 'life', 'packets', 'bytes', 'lastSeen' ) }
+
+    def __init__( self, nodes, views=None ):
+        """
+        nodes - list of OnosCliDriver components, i.e. main.CLIs
+        views - list of the views to capture, defaults to all of them
+        """
+        self.nodes = list( nodes )
+        self.viewNames = list( views or sorted( self.views.keys() ) )
+        # View name to the list of raw outputs, one per node
+        self.raw = {}
+        # Node index to the ( start, end ) time of its capture
+        self.times = {}
+        self.timestamp = None
+        self.parsed = {}
+        self.indexes = {}
+
+    def capture( self, timeout=60 ):
+        """
+        Fetch all the views from all the nodes at once. Returns the snapshot
+        """
+        cmds = [ self.views[ view ][ 0 ] for view in self.viewNames ]
+        self.timestamp = time.time()
+        self.raw = dict( ( view, [ None ] * len( self.nodes ) )
+                         for view in self.viewNames )
+        self.parsed = {}
+        self.indexes = {}
+
+        def fetch( i ):
+            start = time.time()
+            outputs = self.nodes[ i ].sendlines( cmds, timeout=timeout )
+            self.times[ i ] = ( start, time.time() )
+            for view, output in zip( self.viewNames, outputs or [] ):
+                self.raw[ view ][ i ] = output
+
+        threads = []
+        for i in range( len( self.nodes ) ):
+            t = main.Thread( target=fetch,
+                             name="snapshot-" + str( i ),
+                             args=[ i ] )
+            threads.append( t )
+            t.start()
+        for t in threads:
+            t.join()
+        main.log.info( "Captured " + ", ".join( self.viewNames ) + " of " +
+                       str( len( self.nodes ) ) + " nodes in " +
+                       str( round( time.time() - self.timestamp, 3 ) ) +
+                       " seconds" )
+        return self
+
+    def errors( self ):
+        """
+        Returns a list of ( view, node index ) of the outputs which are
+        missing or contain an error
+        """
+        errors = []
+        for view in self.viewNames:
+            for i, output in enumerate( self.raw.get( view, [] ) ):
+                if not output or "Error" in output:
+                    errors.append( ( view, i ) )
+        return errors
+
+    def json( self, view, node ):
+        """
+        Returns the parsed output of a view on a node, None if it can't be
+        parsed
+        """
+        key = ( view, node )
+        if key not in self.parsed:
+            try:
+                memo = jsonparser.driverMemo( self.nodes[ node ] )
+                self.parsed[ key ] = memo.parse( self.raw[ view ][ node ] )
+            except ( ValueError, TypeError ):
+                main.log.exception( "Error parsing the " + view + " of " +
+                                    self.nodes[ node ].name )
+                main.log.debug( repr( self.raw[ view ][ node ] ) )
+                self.parsed[ key ] = None
+        return self.parsed[ key ]
+
+    def index( self, view, node ):
+        """
+        Returns a dictionary of the entries of a view on a node, keyed by
+        device id for roles, intent id for intents, "device/flow id" for
+        flows, topic for leaders and name for partitions
+        """
+        key = ( view, node )
+        if key not in self.indexes:
+            parsed = self.json( view, node )
+            index = {}
+            keys = self.views[ view ][ 1 ]
+            for element in parsed or []:
+                index.update( keys( element ) )
+            self.indexes[ key ] = index
+        return self.indexes[ key ]
+
+    def compare( self, view, unordered=False ):
+        """
+        Compares the view of all the nodes by the content hash of their
+        entries, see core.consistency.compare
+        """
+        recordSets = []
+        for i in range( len( self.nodes ) ):
+            recordSet = consistency.RecordSet( ignore=self.volatile.get( view, () ),
+                                               unordered=unordered )
+            for key, entry in self.index( view, i ).items():
+                recordSet.add( key, entry )
+            recordSets.append( recordSet )
+        return consistency.compare( recordSets )
+
+    def consistent( self, view, limit=20 ):
+        """
+        Returns main.TRUE if all the nodes have the same view, otherwise
+        logs at most limit of the entries which differ and returns
+        main.FALSE
+        """
+        outputs = self.raw[ view ]
+        if not outputs or not all( outputs ):
+            return main.FALSE
+        if all( output == outputs[ 0 ] for output in outputs ):
+            return main.TRUE
+        result = self.compare( view )
+        if result[ 'consistent' ]:
+            return main.TRUE
+        names = [ node.name for node in self.nodes ]
+        for line in consistency.report( result, names, limit=limit ):
+            main.log.warn( "Inconsistent " + view + ": " + line )
+        return main.FALSE
+
+    def diffIndexes( self, old, new ):
+        """
+        Returns a dictionary with the sorted 'added', 'removed' and
+        'changed' keys between two indexes
+        """
+        oldKeys = set( old )
+        newKeys = set( new )
+        return { 'added': sorted( newKeys - oldKeys ),
+                 'removed': sorted( oldKeys - newKeys ),
+                 'changed': sorted( key for key in oldKeys & newKeys
+                                    if old[ key ] != new[ key ] ) }
+
+    def diff( self, other, view, node=0 ):
+        """
+        Returns the 'added', 'removed' and 'changed' entries of a view on a
+        node since an older snapshot
+        """
+        return self.diffIndexes( other.index( view, node ),
+                                 self.index( view, node ) )
+
+    def diffNodes( self, view, first, second ):
+        """
+        Returns the 'added', 'removed' and 'changed' entries of a view on
+        the second node compared to the first one
+        """
+        return self.diffIndexes( self.index( view, first ),
+                                 self.index( view, second ) )
+
+    def summary( self ):
+        """
+        Returns a dictionary of view to the list of the number of entries
+        of that view on each node
+        """
+        return dict( ( view, [ len( self.index( view, i ) )
+                               for i in range( len( self.nodes ) ) ] )
+                     for view in self.viewNames )
@@ -24,10 +24,153 @@ author:s: Anil Kumar ( anilkumar.s@paxterrasolutions.com ),
 """
 import pexpect
 import re
+import os
+import sys
+import atexit
+import threading
+import subprocess
 
 from drivers.component import Component
 
 
+class SSHTransport( object ):
+
+    """
+        Keeps track of the ssh channels opened by the CLI drivers.
+
+        Channels to the same ( user, host, port ) are multiplexed over one
+        authenticated ssh master connection using OpenSSH's ControlMaster,
+        so only the first channel to a host pays for the ssh handshake.
+        The control sockets live in a directory only the user can access.
+        A master is shut down when the last channel using it is released,
+        and the remaining ones when TestON exits.
+    """
+    def __init__( self ):
+        self.controlDir = os.path.join( os.path.expanduser( "~" ), ".ssh",
+                                        "teston-cm" )
+        self.persist = 600
+        self.lock = threading.Lock()
+        self.channels = {}
+        self.masterLocks = {}
+        self.masters = set()
+        self.opened = {}
+
+    def key( self, user, host, port ):
+        return ( str( user ), str( host ), str( port ) if port else "22" )
+
+    def controlPath( self ):
+        """
+            Returns the ControlPath pattern of the master sockets, creating
+            their directory with mode 0700 if needed
+        """
+        if not os.path.isdir( self.controlDir ):
+            try:
+                os.makedirs( self.controlDir, 0700 )
+            except OSError:
+                # Created by another channel in the meantime
+                if not os.path.isdir( self.controlDir ):
+                    raise
+        os.chmod( self.controlDir, 0700 )
+        return os.path.join( self.controlDir, "%r@%h:%p" )
+
+    def options( self, persist=None ):
+        """
+            Returns the ssh options used to share the master connection
+        """
+        persist = persist if persist else self.persist
+        return "-o ControlMaster=auto -o ControlPath=" + self.controlPath() +\
+               " -o ControlPersist=" + str( persist ) + " "
+
+    def masterLock( self, key ):
+        """
+            Returns the lock serializing the creation of the master
+            connection for this key. Opening the first channels one at a
+            time lets every other channel reuse the same master.
+        """
+        with self.lock:
+            return self.masterLocks.setdefault( key, threading.Lock() )
+
+    def register( self, key, driver, multiplex=True ):
+        with self.lock:
+            channels = self.channels.setdefault( key, [] )
+            if driver not in channels:
+                channels.append( driver )
+            self.opened[ key ] = self.opened.get( key, 0 ) + 1
+            if multiplex:
+                self.masters.add( key )
+
+    def release( self, key, driver ):
+        """
+            Forget the channel of the driver, and shut down the master
+            connection of the key if it was its last live channel
+        """
+        with self.lock:
+            if driver in self.channels.get( key, [] ):
+                self.channels[ key ].remove( driver )
+            if key not in self.masters:
+                return
+        # Channels opening while the master is shut down hold its lock
+        with self.masterLock( key ):
+            if not self.liveChannels( key ):
+                self.closeMaster( key )
+
+    def closeMaster( self, key ):
+        """
+            Ask the master connection of the key to exit
+        """
+        with self.lock:
+            self.masters.discard( key )
+        user, host, port = key
+        devnull = open( os.devnull, "w" )
+        try:
+            subprocess.call( [ "ssh", "-o", "ControlPath=" + self.controlPath(),
+                               "-p", port, "-O", "exit", user + "@" + host ],
+                             stdout=devnull, stderr=devnull )
+        except OSError:
+            pass
+        finally:
+            devnull.close()
+
+    def closeAll( self ):
+        """
+            Shut down all the master connections still open
+        """
+        for key in list( self.masters ):
+            self.closeMaster( key )
+
+    def liveChannels( self, key ):
+        """
+            Returns the drivers with a live channel for the key, dropping
+            the ones whose ssh process has exited
+        """
+        with self.lock:
+            live = [ driver for driver in self.channels.get( key, [] )
+                     if driver.handle and driver.handle.isalive() ]
+            self.channels[ key ] = live
+            return list( live )
+
+    def stats( self ):
+        """
+            Returns a dictionary of "user@host:port" to the number of live
+            channels and the number of channels opened so far
+        """
+        stats = {}
+        for key in self.channels.keys():
+            name = key[ 0 ] + "@" + key[ 1 ] + ":" + key[ 2 ]
+            stats[ name ] = { "live": len( self.liveChannels( key ) ),
+                              "opened": self.opened.get( key, 0 ) }
+        return stats
+
+sshTransport = SSHTransport()
+atexit.register( sshTransport.closeAll )
+
+controlCharRe = re.compile( r"[\x01-\x1F\x7F]" )
+cursorPositionRe = re.compile( r"\[\d+\;\d+H" )
+partialEscapeRe = re.compile( r"\x1b?\[[\d;]*$" )
+pagerRe = re.compile( r"--More--|^:$", re.M )
+notFoundRe = re.compile( r"Command not found\." )
+
+
 class CLI( Component ):
 
     """
@@ -46,6 +189,67 @@ class CLI( Component ):
             vars( self )[ key ] = connectargs[ key ]
 
         connect_result = super( CLI, self ).connect()
+        return self.openChannel()
+
+    def openChannel( self ):
+        """
+           Opens a ssh channel to the host of this component. Unless the
+           'ssh_multiplex' option of the component is False, the channel
+           is multiplexed on the shared master connection for the host.
+           Returns the handle or main.FALSE
+        """
+        options = getattr( self, "options", None ) or {}
+        multiplex = str( options.get( "ssh_multiplex", True ) ).lower() not in\
+            [ "false", "0", "no" ]
+        sshOptions = ""
+        if multiplex:
+            sshOptions = sshTransport.options( options.get( "ssh_persist" ) )
+        self.transportKey = sshTransport.key( self.user_name,
+                                              self.ip_address,
+                                              self.port )
+        if multiplex and not sshTransport.liveChannels( self.transportKey ):
+            # First channel to this host creates the master connection
+            with sshTransport.masterLock( self.transportKey ):
+                handle = self.sshLogin( sshOptions )
+                if handle:
+                    sshTransport.register( self.transportKey, self )
+        else:
+            handle = self.sshLogin( sshOptions )
+            if handle:
+                sshTransport.register( self.transportKey, self, multiplex )
+        return handle
+
+    def reconnect( self ):
+        """
+           Reopens the ssh channel of this component after it was closed.
+           Returns the handle or main.FALSE
+        """
+        main.log.warn( str( self.name ) + ": ssh channel to " +
+                       str( self.ip_address ) + " closed, reconnecting" )
+        try:
+            if self.handle:
+                self.handle.close()
+        except Exception:
+            pass
+        sshTransport.release( getattr( self, "transportKey", None ), self )
+        return self.openChannel()
+
+    def restoreChannel( self ):
+        """
+           Called by execute when the ssh channel was closed under a command.
+           Drivers whose commands run in a state a new login shell is not in,
+           i.e. the ONOS or Mininet cli, must not resend them to a fresh
+           shell. A driver which can get back to its prompt overrides this
+           to call reconnect and restore the prompt, the command is then
+           sent again once.
+           Returns main.TRUE if the command can be resent, else main.FALSE
+        """
+        return main.FALSE
+
+    def sshLogin( self, sshOptions="" ):
+        """
+           Spawns the ssh process and logs in to the remote host.
+        """
         ssh_newkey = 'Are you sure you want to continue connecting'
         refused = "ssh: connect to host " + \
             self.ip_address + " port 22: Connection refused"
@@ -54,6 +258,7 @@ class CLI( Component ):
                 'ssh -p ' +
                 self.port +
                 ' ' +
+                sshOptions +
                 self.user_name +
                 '@' +
                 self.ip_address,
@@ -62,6 +267,7 @@ class CLI( Component ):
         else:
             self.handle = pexpect.spawn(
                 'ssh -X ' +
+                sshOptions +
                 self.user_name +
                 '@' +
                 self.ip_address,
@@ -129,6 +335,7 @@ class CLI( Component ):
         return self.handle
 
     def disconnect( self ):
+        sshTransport.release( getattr( self, "transportKey", None ), self )
         result = super( CLI, self ).disconnect( self )
         result = main.TRUE
         # self.execute( cmd="exit",timeout=120,prompt="(.*)" )
@@ -162,24 +369,40 @@ class CLI( Component ):
             return 0
         if args[ "MORE" ] is None:
             args[ "MORE" ] = " "
-        self.handle.sendline( cmd )
-        self.lastCommand = cmd
-        index = self.handle.expect( [
-                    expectPrompt,
-                                    "--More--",
-                                    'Command not found.',
-                                    pexpect.TIMEOUT,
-                                    "^:$" ],
-                            timeout=timeoutVar )
+        try:
+            self.handle.sendline( cmd )
+            self.lastCommand = cmd
+            index = self.handle.expect( [
+                        expectPrompt,
+                                        "--More--",
+                                        'Command not found.',
+                                        pexpect.TIMEOUT,
+                                        "^:$" ],
+                                timeout=timeoutVar )
+        except pexpect.EOF:
+            # The ssh channel went away, retry the command once if the
+            # driver could reopen it at the same prompt
+            error = sys.exc_info()
+            if not self.restoreChannel():
+                raise error[ 0 ], error[ 1 ], error[ 2 ]
+            self.handle.sendline( cmd )
+            index = self.handle.expect( [
+                        expectPrompt,
+                                        "--More--",
+                                        'Command not found.',
+                                        pexpect.TIMEOUT,
+                                        "^:$" ],
+                                timeout=timeoutVar )
+        # Collect the pages in a list and join them once at the end
+        output = []
         if index == 0:
-            self.LASTRSP = self.LASTRSP + \
-                self.handle.before + self.handle.after
+            output.append( self.handle.before + self.handle.after )
             main.log.info(
                 "Executed :" + str(
                     cmd ) + " \t\t Expected Prompt '" + str(
                         expectPrompt) + "' Found" )
         elif index == 1:
-            self.LASTRSP = self.LASTRSP + self.handle.before
+            output.append( self.handle.before )
             self.handle.send( args[ "MORE" ] )
             main.log.info(
                 "Found More screen to go , Sending a key to proceed" )
@@ -191,17 +414,17 @@ class CLI( Component ):
                 self.handle.send( args[ "MORE" ] )
                 indexMore = self.handle.expect(
                     [ "--More--", expectPrompt ], timeout=timeoutVar )
-                self.LASTRSP = self.LASTRSP + self.handle.before
+                output.append( self.handle.before )
         elif index == 2:
             main.log.error( "Command not found" )
-            self.LASTRSP = self.LASTRSP + self.handle.before
+            output.append( self.handle.before )
         elif index == 3:
             main.log.error( "Expected Prompt not found , Time Out!!" )
             main.log.error( expectPrompt )
             return "Expected Prompt not found , Time Out!!"
 
         elif index == 4:
-            self.LASTRSP = self.LASTRSP + self.handle.before
+            output.append( self.handle.before )
             # self.handle.send( args[ "MORE" ] )
             self.handle.sendcontrol( "D" )
             main.log.info(
@@ -214,17 +437,115 @@ class CLI( Component ):
                 self.handle.sendcontrol( "D" )
                 indexMore = self.handle.expect(
                     [ "^:$", expectPrompt ], timeout=timeoutVar )
-                self.LASTRSP = self.LASTRSP + self.handle.before
+                output.append( self.handle.before )
 
+        self.LASTRSP = "".join( output )
         main.last_response = self.remove_contol_chars( self.LASTRSP )
         return self.LASTRSP
 
+    def executeStream( self, **execparams ):
+        """
+        Generator version of execute. It takes the same arguments as execute:
+        cmd => represents command to be executed,
+        prompt => represents expect command prompt or output,
+        timeout => timeout for command execution,
+        more => to provide a key press if it is on.
+
+        It yields the output of the command in chunks as it arrives, with
+        the control characters already removed. Pager prompts ( --More--
+        and ':' ) are answered inside the generator and are not yielded.
+        The response is not kept in self.LASTRSP, callers should consume
+        the chunks as they arrive:
+
+            for chunk in main.Mininet1.executeStream( cmd="dump" ):
+                parser.feed( chunk )
+
+        The generator stops when the expected prompt is found, the
+        prompt itself is left in self.handle.after. As in execute, a
+        'Command not found.' answer is logged as an error.
+        """
+        defaultPrompt = '.*[$>\#]'
+        args = utilities.parse_args( [ "CMD",
+                                       "TIMEOUT",
+                                       "PROMPT",
+                                       "MORE" ],
+                                     **execparams )
+        expectPrompt = args[ "PROMPT" ] if args[ "PROMPT" ] else defaultPrompt
+        timeoutVar = args[ "TIMEOUT" ] if args[ "TIMEOUT" ] else 10
+        more = args[ "MORE" ] if args[ "MORE" ] is not None else " "
+        if not args[ "CMD" ]:
+            return
+        cmd = args[ "CMD" ]
+        promptRe = re.compile( expectPrompt )
+        # Only the unconsumed tail of the output is searched for the
+        # prompt and the pager, everything before it is yielded
+        keep = 256
+        pending = ""
+        notFound = False
+        self.handle.sendline( cmd )
+        self.lastCommand = cmd
+        while True:
+            try:
+                pending += self.handle.read_nonblocking( size=8192,
+                                                         timeout=timeoutVar )
+            except pexpect.TIMEOUT:
+                main.log.error( "Expected Prompt not found , Time Out!!" )
+                main.log.error( expectPrompt )
+                if pending:
+                    yield self.remove_contol_chars( pending )
+                return
+            except pexpect.EOF:
+                main.log.error( str( self.name ) + ": EOF while reading the " +
+                                "output of " + str( cmd ) )
+                if pending:
+                    yield self.remove_contol_chars( pending )
+                return
+            done = False
+            if not notFound and notFoundRe.search( pending ):
+                # Like execute, the output is still given to the caller
+                main.log.error( "Command not found" )
+                notFound = True
+            match = promptRe.search( pending )
+            pager = pagerRe.search( pending )
+            if pager and ( not match or pager.start() < match.start() ):
+                chunk = pending[ :pager.start() ]
+                if pager.group() == "--More--":
+                    self.handle.send( more )
+                else:
+                    self.handle.sendcontrol( "D" )
+                pending = pending[ pager.end(): ]
+            elif match:
+                chunk = pending[ :match.start() ]
+                self.handle.before = chunk
+                self.handle.after = match.group()
+                # Give back anything received after the prompt
+                self.handle.buffer = pending[ match.end(): ] + self.handle.buffer
+                pending = ""
+                done = True
+            else:
+                cut = len( pending ) - keep
+                if cut <= 0:
+                    continue
+                # Don't split an escape sequence between two chunks
+                partial = partialEscapeRe.search( pending, max( cut - 16, 0 ), cut )
+                if partial:
+                    cut = partial.start()
+                chunk = pending[ :cut ]
+                pending = pending[ cut: ]
+            if chunk:
+                yield self.remove_contol_chars( chunk )
+            if done:
+                main.log.info( "Executed :" + str( cmd ) +
+                               " \t\t Expected Prompt '" +
+                               str( expectPrompt ) + "' Found" )
+                return
+
     def remove_contol_chars( self, response ):
         # RE_XML_ILLEGAL = '([\u0000-\u0008\u000b-\u000c\u000e-\u001f\ufffe-\uffff])|([%s-%s][^%s-%s])|([^%s-%s][%s-%s])|([%s-%s]$)|(^[%s-%s])'%( unichr( 0xd800 ),unichr( 0xdbff ),unichr( 0xdc00 ),unichr( 0xdfff ),unichr( 0xd800 ),unichr( 0xdbff ),unichr( 0xdc00 ),unichr( 0xdfff ),unichr( 0xd800 ),unichr( 0xdbff ),unichr( 0xdc00 ),unichr( 0xdfff ) )
         # response = re.sub( RE_XML_ILLEGAL, "\n", response )
-        response = re.sub( r"[\x01-\x1F\x7F]", "", response )
+        response = controlCharRe.sub( "", response )
         # response = re.sub( r"\[\d+\;1H", "\n", response )
-        response = re.sub( r"\[\d+\;\d+H", "", response )
+        response = cursorPositionRe.sub( "", response )
         return response
 
     def runAsSudoUser( self, handle, pwd, default ):
@@ -98,6 +98,7 @@ class HAminorityRestart:
             main.exit()
 
         main.CLIs = []
+        main.snapshot = None
         main.nodes = []
         ipList = []
         for i in range( 1, main.numCtrls + 1 ):
@@ -1111,6 +1112,7 @@ class HAminorityRestart:
         Reading state of ONOS
         """
         import json
+        from drivers.common.cli.onossnapshot import ClusterSnapshot
         import time
         assert main.numCtrls, "main.numCtrls not defined"
         assert main, "main not defined"
@@ -1147,21 +1149,12 @@ class HAminorityRestart:
             onfail="Some devices don't have a master assigned" )
 
         main.step( "Get the Mastership of each switch from each controller" )
-        ONOSMastership = []
         mastershipCheck = main.FALSE
         consistentMastership = True
         rolesResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].roles,
-                             name="roles-" + str( i ),
-                             args=[] )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSMastership.append( t.result )
+        main.snapshot = ClusterSnapshot( main.CLIs[ :main.numCtrls ] )
+        snapshot = main.snapshot.capture()
+        ONOSMastership = snapshot.raw[ 'roles' ]
 
         for i in range( main.numCtrls ):
             if not ONOSMastership[i] or "Error" in ONOSMastership[i]:
@@ -1178,7 +1171,7 @@ class HAminorityRestart:
             onfail="Error in reading roles from ONOS" )
 
         main.step( "Check for consistency in roles from each controller" )
-        if all([ i == ONOSMastership[ 0 ] for i in ONOSMastership ] ):
+        if snapshot.consistent( 'roles' ):
             main.log.info(
                 "Switch roles are consistent across all ONOS nodes" )
         else:
@@ -1189,41 +1182,17 @@ class HAminorityRestart:
             onpass="Switch roles are consistent across all ONOS nodes",
             onfail="ONOS nodes have different views of switch roles" )
 
-        if rolesResults and not consistentMastership:
-            for i in range( main.numCtrls ):
-                try:
-                    main.log.warn(
-                        "ONOS" + str( i + 1 ) + " roles: ",
-                        json.dumps(
-                            json.loads( ONOSMastership[ i ] ),
-                            sort_keys=True,
-                            indent=4,
-                            separators=( ',', ': ' ) ) )
-                except ( ValueError, TypeError ):
-                    main.log.warn( repr( ONOSMastership[ i ] ) )
-        elif rolesResults and consistentMastership:
+        if rolesResults and consistentMastership:
             mastershipCheck = main.TRUE
             mastershipState = ONOSMastership[ 0 ]
 
         main.step( "Get the intents from each controller" )
         global intentState
         intentState = []
-        ONOSIntents = []
         intentCheck = main.FALSE
         consistentIntents = True
         intentsResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].intents,
-                             name="intents-" + str( i ),
-                             args=[],
-                             kwargs={ 'jsonFormat': True } )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSIntents.append( t.result )
+        ONOSIntents = snapshot.raw[ 'intents' ]
 
         for i in range( main.numCtrls ):
             if not ONOSIntents[ i ] or "Error" in ONOSIntents[ i ]:
@@ -1239,7 +1208,7 @@ class HAminorityRestart:
             onfail="Error in reading intents from ONOS" )
 
         main.step( "Check for consistency in Intents from each controller" )
-        if all([ sorted( i ) == sorted( ONOSIntents[ 0 ] ) for i in ONOSIntents ] ):
+        if snapshot.consistent( 'intents' ):
             main.log.info( "Intents are consistent across all ONOS " +
                              "nodes" )
         else:
@@ -1264,66 +1233,34 @@ class HAminorityRestart:
             main.log.warn( title )
             # get all intent keys in the cluster
             keys = []
+            nodes = []
             for nodeStr in ONOSIntents:
                 node = json.loads( nodeStr )
+                nodes.append( node )
                 for intent in node:
                     keys.append( intent.get( 'id' ) )
             keys = set( keys )
             for key in keys:
                 row = "%-13s" % key
-                for nodeStr in ONOSIntents:
-                    node = json.loads( nodeStr )
+                for node in nodes:
                     for intent in node:
                         if intent.get( 'id', "Error" ) == key:
                             row += "%-15s" % intent.get( 'state' )
                 main.log.warn( row )
             # End table view
 
-        if intentsResults and not consistentIntents:
-            # print the json objects
-            n = len(ONOSIntents)
-            main.log.debug( "ONOS" + str( n ) + " intents: " )
-            main.log.debug( json.dumps( json.loads( ONOSIntents[ -1 ] ),
-                                        sort_keys=True,
-                                        indent=4,
-                                        separators=( ',', ': ' ) ) )
-            for i in range( main.numCtrls ):
-                if ONOSIntents[ i ] != ONOSIntents[ -1 ]:
-                    main.log.debug( "ONOS" + str( i + 1 ) + " intents: " )
-                    main.log.debug( json.dumps( json.loads( ONOSIntents[i] ),
-                                                sort_keys=True,
-                                                indent=4,
-                                                separators=( ',', ': ' ) ) )
-                else:
-                    main.log.debug( main.nodes[ i ].name + " intents match ONOS" +
-                                    str( n ) + " intents" )
-        elif intentsResults and consistentIntents:
+        if intentsResults and consistentIntents:
             intentCheck = main.TRUE
             intentState = ONOSIntents[ 0 ]
 
         main.step( "Get the flows from each controller" )
         global flowState
         flowState = []
-        ONOSFlows = []
         ONOSFlowsJson = []
         flowCheck = main.FALSE
         consistentFlows = True
         flowsResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].flows,
-                             name="flows-" + str( i ),
-                             args=[],
-                             kwargs={ 'jsonFormat': True } )
-            threads.append( t )
-            t.start()
-
-        # NOTE: Flows command can take some time to run
-        time.sleep(30)
-        for t in threads:
-            t.join()
-            result = t.result
-            ONOSFlows.append( result )
+        ONOSFlows = snapshot.raw[ 'flows' ]
 
         for i in range( main.numCtrls ):
             num = str( i + 1 )
@@ -1734,6 +1671,7 @@ class HAminorityRestart:
         Check state after ONOS failure
         """
         import json
+        from drivers.common.cli.onossnapshot import ClusterSnapshot
         assert main.numCtrls, "main.numCtrls not defined"
         assert main, "main not defined"
         assert utilities.assert_equals, "utilities.assert_equals not defined"
@@ -1762,20 +1700,17 @@ class HAminorityRestart:
             onfail="Some devices don't have a master assigned" )
 
         main.step( "Read device roles from ONOS" )
-        ONOSMastership = []
         consistentMastership = True
         rolesResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].roles,
-                             name="roles-" + str( i ),
-                             args=[] )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSMastership.append( t.result )
+        snapshot = ClusterSnapshot( main.CLIs[ :main.numCtrls ],
+                                    views=[ 'roles', 'intents' ] )
+        snapshot.capture()
+        if main.snapshot:
+            main.log.debug( "Roles changed since CASE5: " +
+                            str( snapshot.diff( main.snapshot, 'roles' ) ) )
+            main.log.debug( "Intents changed since CASE5: " +
+                            str( snapshot.diff( main.snapshot, 'intents' ) ) )
+        ONOSMastership = snapshot.raw[ 'roles' ]
 
         for i in range( main.numCtrls ):
             if not ONOSMastership[i] or "Error" in ONOSMastership[i]:
@@ -1792,7 +1727,7 @@ class HAminorityRestart:
             onfail="Error in reading roles from ONOS" )
 
         main.step( "Check for consistency in roles from each controller" )
-        if all([ i == ONOSMastership[ 0 ] for i in ONOSMastership ] ):
+        if snapshot.consistent( 'roles' ):
             main.log.info(
                 "Switch roles are consistent across all ONOS nodes" )
         else:
@@ -1803,16 +1738,6 @@ class HAminorityRestart:
             onpass="Switch roles are consistent across all ONOS nodes",
             onfail="ONOS nodes have different views of switch roles" )
 
-        if rolesResults and not consistentMastership:
-            for i in range( main.numCtrls ):
-                main.log.warn(
-                    "ONOS" + str( i + 1 ) + " roles: ",
-                    json.dumps(
-                        json.loads( ONOSMastership[ i ] ),
-                        sort_keys=True,
-                        indent=4,
-                        separators=( ',', ': ' ) ) )
-
         # NOTE: we expect mastership to change on controller failure
         '''
         description2 = "Compare switch roles from before failure"
@@ -1848,22 +1773,10 @@ class HAminorityRestart:
         '''
 
         main.step( "Get the intents and compare across all nodes" )
-        ONOSIntents = []
         intentCheck = main.FALSE
         consistentIntents = True
         intentsResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].intents,
-                             name="intents-" + str( i ),
-                             args=[],
-                             kwargs={ 'jsonFormat': True } )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSIntents.append( t.result )
+        ONOSIntents = snapshot.raw[ 'intents' ]
 
         for i in range( main.numCtrls ):
             if not ONOSIntents[ i ] or "Error" in ONOSIntents[ i ]:
@@ -1879,7 +1792,7 @@ class HAminorityRestart:
             onfail="Error in reading intents from ONOS" )
 
         main.step( "Check for consistency in Intents from each controller" )
-        if all([ sorted( i ) == sorted( ONOSIntents[ 0 ] ) for i in ONOSIntents ] ):
+        if snapshot.consistent( 'intents' ):
             main.log.info( "Intents are consistent across all ONOS " +
                              "nodes" )
         else:
@@ -1897,15 +1810,16 @@ class HAminorityRestart:
         main.log.warn( title )
         # get all intent keys in the cluster
         keys = []
+        nodes = []
         for nodeStr in ONOSIntents:
             node = json.loads( nodeStr )
+            nodes.append( node )
             for intent in node:
                 keys.append( intent.get( 'id' ) )
         keys = set( keys )
         for key in keys:
             row = "%-13s" % key
-            for nodeStr in ONOSIntents:
-                node = json.loads( nodeStr )
+            for node in nodes:
                 for intent in node:
                     if intent.get( 'id' ) == key:
                         row += "%-15s" % intent.get( 'state' )
@@ -1931,15 +1845,7 @@ class HAminorityRestart:
             out = [ (i, nodeStates.count( i ) ) for i in set( nodeStates ) ]
             main.log.info( dict( out ) )
 
-        if intentsResults and not consistentIntents:
-            for i in range( main.numCtrls ):
-                main.log.warn( "ONOS" + str( i + 1 ) + " intents: " )
-                main.log.warn( json.dumps(
-                    json.loads( ONOSIntents[ i ] ),
-                    sort_keys=True,
-                    indent=4,
-                    separators=( ',', ': ' ) ) )
-        elif intentsResults and consistentIntents:
+        if intentsResults and consistentIntents:
             intentCheck = main.TRUE
 
         # NOTE: Store has no durability, so intents are lost across system
@@ -98,6 +98,7 @@ class HAsanity:
             main.exit()
 
         main.CLIs = []
+        main.snapshot = None
         main.nodes = []
         ipList = []
         for i in range( 1, main.numCtrls + 1 ):
@@ -1116,6 +1117,7 @@ class HAsanity:
         Reading state of ONOS
         """
         import json
+        from drivers.common.cli.onossnapshot import ClusterSnapshot
         import time
         assert main.numCtrls, "main.numCtrls not defined"
         assert main, "main not defined"
@@ -1152,21 +1154,12 @@ class HAsanity:
             onfail="Some devices don't have a master assigned" )
 
         main.step( "Get the Mastership of each switch from each controller" )
-        ONOSMastership = []
         mastershipCheck = main.FALSE
         consistentMastership = True
         rolesResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].roles,
-                             name="roles-" + str( i ),
-                             args=[] )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSMastership.append( t.result )
+        main.snapshot = ClusterSnapshot( main.CLIs[ :main.numCtrls ] )
+        snapshot = main.snapshot.capture()
+        ONOSMastership = snapshot.raw[ 'roles' ]
 
         for i in range( main.numCtrls ):
             if not ONOSMastership[i] or "Error" in ONOSMastership[i]:
@@ -1183,7 +1176,7 @@ class HAsanity:
             onfail="Error in reading roles from ONOS" )
 
         main.step( "Check for consistency in roles from each controller" )
-        if all([ i == ONOSMastership[ 0 ] for i in ONOSMastership ] ):
+        if snapshot.consistent( 'roles' ):
             main.log.info(
                 "Switch roles are consistent across all ONOS nodes" )
         else:
@@ -1194,41 +1187,17 @@ class HAsanity:
             onpass="Switch roles are consistent across all ONOS nodes",
             onfail="ONOS nodes have different views of switch roles" )
 
-        if rolesResults and not consistentMastership:
-            for i in range( main.numCtrls ):
-                try:
-                    main.log.warn(
-                        "ONOS" + str( i + 1 ) + " roles: ",
-                        json.dumps(
-                            json.loads( ONOSMastership[ i ] ),
-                            sort_keys=True,
-                            indent=4,
-                            separators=( ',', ': ' ) ) )
-                except ( ValueError, TypeError ):
-                    main.log.warn( repr( ONOSMastership[ i ] ) )
-        elif rolesResults and consistentMastership:
+        if rolesResults and consistentMastership:
             mastershipCheck = main.TRUE
             mastershipState = ONOSMastership[ 0 ]
 
         main.step( "Get the intents from each controller" )
         global intentState
         intentState = []
-        ONOSIntents = []
         intentCheck = main.FALSE
         consistentIntents = True
         intentsResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].intents,
-                             name="intents-" + str( i ),
-                             args=[],
-                             kwargs={ 'jsonFormat': True } )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSIntents.append( t.result )
+        ONOSIntents = snapshot.raw[ 'intents' ]
 
         for i in range( main.numCtrls ):
             if not ONOSIntents[ i ] or "Error" in ONOSIntents[ i ]:
@@ -1244,7 +1213,7 @@ class HAsanity:
             onfail="Error in reading intents from ONOS" )
 
         main.step( "Check for consistency in Intents from each controller" )
-        if all([ sorted( i ) == sorted( ONOSIntents[ 0 ] ) for i in ONOSIntents ] ):
+        if snapshot.consistent( 'intents' ):
             main.log.info( "Intents are consistent across all ONOS " +
                              "nodes" )
         else:
@@ -1271,16 +1240,17 @@ class HAsanity:
             keys = []
             try:
                 # Get the set of all intent keys
+                nodes = []
                 for nodeStr in ONOSIntents:
                     node = json.loads( nodeStr )
+                    nodes.append( node )
                     for intent in node:
                         keys.append( intent.get( 'id' ) )
                 keys = set( keys )
                 # For each intent key, print the state on each node
                 for key in keys:
                     row = "%-13s" % key
-                    for nodeStr in ONOSIntents:
-                        node = json.loads( nodeStr )
+                    for node in nodes:
                         for intent in node:
                             if intent.get( 'id', "Error" ) == key:
                                 row += "%-15s" % intent.get( 'state' )
@@ -1290,51 +1260,18 @@ class HAsanity:
                 main.log.exception( e )
                 main.log.debug( "nodeStr was: " + repr( nodeStr ) )
 
-        if intentsResults and not consistentIntents:
-            # print the json objects
-            n = len(ONOSIntents)
-            main.log.debug( "ONOS" + str( n ) + " intents: " )
-            main.log.debug( json.dumps( json.loads( ONOSIntents[ -1 ] ),
-                                        sort_keys=True,
-                                        indent=4,
-                                        separators=( ',', ': ' ) ) )
-            for i in range( main.numCtrls ):
-                if ONOSIntents[ i ] != ONOSIntents[ -1 ]:
-                    main.log.debug( "ONOS" + str( i + 1 ) + " intents: " )
-                    main.log.debug( json.dumps( json.loads( ONOSIntents[i] ),
-                                                sort_keys=True,
-                                                indent=4,
-                                                separators=( ',', ': ' ) ) )
-                else:
-                    main.log.debug( main.nodes[ i ].name + " intents match ONOS" +
-                                    str( n ) + " intents" )
-        elif intentsResults and consistentIntents:
+        if intentsResults and consistentIntents:
             intentCheck = main.TRUE
             intentState = ONOSIntents[ 0 ]
 
         main.step( "Get the flows from each controller" )
         global flowState
         flowState = []
-        ONOSFlows = []
         ONOSFlowsJson = []
         flowCheck = main.FALSE
         consistentFlows = True
         flowsResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].flows,
-                             name="flows-" + str( i ),
-                             args=[],
-                             kwargs={ 'jsonFormat': True } )
-            threads.append( t )
-            t.start()
-
-        # NOTE: Flows command can take some time to run
-        time.sleep(30)
-        for t in threads:
-            t.join()
-            result = t.result
-            ONOSFlows.append( result )
+        ONOSFlows = snapshot.raw[ 'flows' ]
 
         for i in range( main.numCtrls ):
             num = str( i + 1 )
@@ -1693,6 +1630,7 @@ class HAsanity:
         Check state after ONOS failure
         """
         import json
+        from drivers.common.cli.onossnapshot import ClusterSnapshot
         assert main.numCtrls, "main.numCtrls not defined"
         assert main, "main not defined"
         assert utilities.assert_equals, "utilities.assert_equals not defined"
@@ -1721,21 +1659,18 @@ class HAsanity:
             onfail="Some devices don't have a master assigned" )
 
         main.step( "Read device roles from ONOS" )
-        ONOSMastership = []
         mastershipCheck = main.FALSE
         consistentMastership = True
         rolesResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].roles,
-                             name="roles-" + str( i ),
-                             args=[] )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSMastership.append( t.result )
+        snapshot = ClusterSnapshot( main.CLIs[ :main.numCtrls ],
+                                    views=[ 'roles', 'intents' ] )
+        snapshot.capture()
+        if main.snapshot:
+            main.log.debug( "Roles changed since CASE5: " +
+                            str( snapshot.diff( main.snapshot, 'roles' ) ) )
+            main.log.debug( "Intents changed since CASE5: " +
+                            str( snapshot.diff( main.snapshot, 'intents' ) ) )
+        ONOSMastership = snapshot.raw[ 'roles' ]
 
         for i in range( main.numCtrls ):
             if not ONOSMastership[i] or "Error" in ONOSMastership[i]:
@@ -1752,7 +1687,7 @@ class HAsanity:
             onfail="Error in reading roles from ONOS" )
 
         main.step( "Check for consistency in roles from each controller" )
-        if all([ i == ONOSMastership[ 0 ] for i in ONOSMastership ] ):
+        if snapshot.consistent( 'roles' ):
             main.log.info(
                 "Switch roles are consistent across all ONOS nodes" )
         else:
@@ -1763,18 +1698,6 @@ class HAsanity:
             onpass="Switch roles are consistent across all ONOS nodes",
             onfail="ONOS nodes have different views of switch roles" )
 
-        if rolesResults and not consistentMastership:
-            for i in range( main.numCtrls ):
-                main.log.warn(
-                    "ONOS" + str( i + 1 ) + " roles: ",
-                    json.dumps(
-                        json.loads( ONOSMastership[ i ] ),
-                        sort_keys=True,
-                        indent=4,
-                        separators=( ',', ': ' ) ) )
-        elif rolesResults and not consistentMastership:
-            mastershipCheck = main.TRUE
-
         description2 = "Compare switch roles from before failure"
         main.step( description2 )
         try:
@@ -1808,22 +1731,10 @@ class HAsanity:
         mastershipCheck = mastershipCheck and consistentMastership
 
         main.step( "Get the intents and compare across all nodes" )
-        ONOSIntents = []
         intentCheck = main.FALSE
         consistentIntents = True
         intentsResults = True
-        threads = []
-        for i in range( main.numCtrls ):
-            t = main.Thread( target=main.CLIs[i].intents,
-                             name="intents-" + str( i ),
-                             args=[],
-                             kwargs={ 'jsonFormat': True } )
-            threads.append( t )
-            t.start()
-
-        for t in threads:
-            t.join()
-            ONOSIntents.append( t.result )
+        ONOSIntents = snapshot.raw[ 'intents' ]
 
         for i in range( main.numCtrls ):
             if not ONOSIntents[ i ] or "Error" in ONOSIntents[ i ]:
@@ -1839,7 +1750,7 @@ class HAsanity:
             onfail="Error in reading intents from ONOS" )
 
         main.step( "Check for consistency in Intents from each controller" )
-        if all([ sorted( i ) == sorted( ONOSIntents[ 0 ] ) for i in ONOSIntents ] ):
+        if snapshot.consistent( 'intents' ):
             main.log.info( "Intents are consistent across all ONOS " +
                              "nodes" )
         else:
@@ -1857,15 +1768,16 @@ class HAsanity:
         main.log.warn( title )
         # get all intent keys in the cluster
         keys = []
+        nodes = []
         for nodeStr in ONOSIntents:
             node = json.loads( nodeStr )
+            nodes.append( node )
             for intent in node:
                 keys.append( intent.get( 'id' ) )
         keys = set( keys )
         for key in keys:
             row = "%-13s" % key
-            for nodeStr in ONOSIntents:
-                node = json.loads( nodeStr )
+            for node in nodes:
                 for intent in node:
                     if intent.get( 'id' ) == key:
                         row += "%-15s" % intent.get( 'state' )
@@ -1891,15 +1803,7 @@ class HAsanity:
             out = [ (i, nodeStates.count( i ) ) for i in set( nodeStates ) ]
             main.log.info( dict( out ) )
 
-        if intentsResults and not consistentIntents:
-            for i in range( main.numCtrls ):
-                main.log.warn( "ONOS" + str( i + 1 ) + " intents: " )
-                main.log.warn( json.dumps(
-                    json.loads( ONOSIntents[ i ] ),
-                    sort_keys=True,
-                    indent=4,
-                    separators=( ',', ': ' ) ) )
-        elif intentsResults and consistentIntents:
+        if intentsResults and consistentIntents:
             intentCheck = main.TRUE
 
         # NOTE: Store has no durability, so intents are lost across system
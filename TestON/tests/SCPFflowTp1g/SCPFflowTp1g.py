@@ -43,6 +43,7 @@ class SCPFflowTp1g:
             global ONOSIp                   #list of ONOS IP addresses
             global scale
             global commit
+            global resultsDB
 
             clusterCount = 0
             ONOSIp = [ 0 ]
@@ -75,8 +76,15 @@ class SCPFflowTp1g:
             commit = main.ONOSbench.getVersion()
             commit = (commit.split(" "))[1]
 
-            resultsDB = open("/tmp/flowTP1gDB", "w+")
-            resultsDB.close()
+            resultsDB = main.resultSink("/tmp/flowTP1gDB",
+                                        [("commit", str), ("network", str),
+                                         ("flows", int), ("scale", int),
+                                         ("neighbors", int),
+                                         ("throughput", float),
+                                         ("stdDev", float)],
+                                        backend="csv", header=False,
+                                        dialect="sqlvalues")
+            resultsDB.clear()
 
         # -- END OF INIT SECTION --#
 
@@ -362,16 +370,11 @@ class SCPFflowTp1g:
             main.log.info("Average thoughput:  " + str(avgTP) + " Kflows/second" )
             main.log.info("Standard deviation of throughput: " + str(stdTP) + " Kflows/second")
 
-            resultsLog = open("/tmp/flowTP1gDB","a")
-            resultString = ("'" + commit + "',")
-            resultString += ("'1gig',")
-            resultString += ((main.params[ 'TEST' ][ 'flows' ]) + ",")
-            resultString += (str(clusterCount) + ",")
-            resultString += (str(n) + ",")
-            resultString += (str(avgTP) + "," + str(stdTP) + "\n")
-            resultsLog.write(resultString)
-            resultsLog.close()
-
-            main.log.report("Result line to file: " + resultString)
+            record = resultsDB.add(commit=commit, network="1gig",
+                                   flows=main.params[ 'TEST' ][ 'flows' ],
+                                   scale=clusterCount, neighbors=n,
+                                   throughput=avgTP, stdDev=stdTP)
+
+            main.log.report("Result line to file: " + str(record))
 
         main.ONOSbench.logReport(ONOSIp[1], ["ERROR", "WARNING", "EXCEPT"], outputMode="d")
@@ -53,6 +53,8 @@ class SCPFintentEventTp:
             global ONOSIp                   #list of ONOS IP addresses
             global scale
             global commit
+            global resultsDB
+            global resultsHistory
 
             clusterCount = 0
             ONOSIp = main.ONOSbench.getOnosIps()
@@ -85,8 +87,19 @@ class SCPFintentEventTp:
             commit = (commit.split(" "))[1]
 
             main.log.step("Creating results file")
-            resultsDB = open("/tmp/IntentEventTPDB", "w+")
-            resultsDB.close()
+            # One row per node and run, posted to the results database
+            resultsSchema = [("commit", str), ("network", str),
+                             ("scale", int), ("node", str),
+                             ("neighbors", int), ("rate", float),
+                             ("stdDev", float)]
+            resultsDB = main.resultSink("/tmp/IntentEventTPDB", resultsSchema,
+                                        backend="csv", header=False,
+                                        dialect="sqlvalues")
+            resultsDB.clear()
+            # Kept across runs to compare with the previous commits
+            resultsHistory = main.resultSink(
+                os.path.expanduser(main.params['DB']['history']),
+                resultsSchema)
 
         # -- END OF INIT SECTION --#
 
@@ -262,6 +275,13 @@ class SCPFintentEventTp:
             main.ONOSbench.handle.sendline("onos $OC1 cfg set org.onosproject.intentperf.IntentPerfInstaller cyclePeriod " + cyclePeriod )
             main.ONOSbench.handle.expect(":~")
 
+            # Follow the throughput lines as they are logged instead of
+            # grepping the whole log of each node at every poll
+            throughputLog = "SNAPSHOT | Throughput"
+            main.ONOSbench.subscribeLog( throughputLog )
+            main.ONOSbench.startLogTail( ONOSIp[ :clusterCount ] )
+            runStart = time.time()
+
             cmd = "onos $OC1 intent-perf-start"
             main.ONOSbench.handle.sendline(cmd)
             main.ONOSbench.handle.expect(":~")
@@ -276,35 +296,19 @@ class SCPFintentEventTp:
                 for node in range (1, clusterCount + 1):
                     groupResult.append(0)
 
-                    cmd = " onos-ssh $OC" + str(node) +  """ cat /opt/onos/log/karaf.log | grep "SNAPSHOT | Throughput" | tail -1  """
-                    main.log.info("COMMAND: " + str(cmd))
-
-                    x = 0
-                    while True:
-                        main.ONOSbench.handle.sendline(cmd)
-                        time.sleep(6)
-                        main.ONOSbench.handle.expect(":~")
-                        raw = main.ONOSbench.handle.before
-                        if "OVERALL=" in raw:
-                            break
-                        x += 1
-                        if x > 10:
-                            main.log.error("Expected output not being recieved... continuing")
-                            break
-                        time.sleep(2)
-
-                    raw = raw.splitlines()
-                    splitResults = []
-                    for line in raw:
-                        splitResults.extend(line.split(" "))
-
+                    event = main.ONOSbench.latestLogEvent( ONOSIp[ node - 1 ],
+                                                           throughputLog,
+                                                           since=runStart,
+                                                           timeout=80 )
                     myResult = "--"
-                    for field in splitResults:
-                        if "OVERALL" in field:
-                            myResult = field
+                    if event:
+                        for field in event[ 'line' ].split(" "):
+                            if "OVERALL" in field:
+                                myResult = field
 
                     if myResult == "--":
-                        main.log.error("Parsing/Pexpect error\n" + str(splitResults))
+                        main.log.error("Expected output not being recieved... continuing")
+                        continue
 
                     myResult = myResult.replace(";", "")
                     myResult = myResult.replace("OVERALL=","")
@@ -321,20 +325,26 @@ class SCPFintentEventTp:
             main.ONOSbench.handle.sendline(cmd)
             main.ONOSbench.handle.expect(":~")
             main.log.info("Stopping intentperf" )
-
-            resultsDB = open("/tmp/IntentEventTPDB", "a")
-            for node in groupResult:
-
-                resultString = "'" + commit + "',"
-                resultString += "'1gig',"
-                resultString += str(clusterCount) + ","
-                resultString += "'baremetal" + str(int(groupResult.index(node)) + 1) + "',"
-                resultString += n + ","
-                resultString += str(node) + ","
-                resultString += str(0) + "\n" #no stddev
-                resultsDB.write(resultString)
-
-            resultsDB.close()
+            main.ONOSbench.stopLogTail()
+
+            for node in range(0, len(groupResult)):
+                record = {"commit": commit,
+                          "network": "1gig",
+                          "scale": clusterCount,
+                          "node": "baremetal" + str(node + 1),
+                          "neighbors": int(n),
+                          "rate": groupResult[node],
+                          "stdDev": 0} #no stddev
+                change = resultsHistory.compare(record, ["rate"],
+                        ["scale", "node", "neighbors"])["rate"]
+                if change["change"] is not None:
+                    main.log.report("Node " + str(node + 1) + " rate " +
+                            str(record["rate"]) + ", " +
+                            str(round(change["change"] * 100, 1)) +
+                            "% from the average of the previous runs: " +
+                            str(change["baseline"]))
+                resultsDB.add(record)
+                resultsHistory.add(record)
 
             main.ONOSbench.logReport(ONOSIp[1], ["ERROR", "WARNING", "EXCEPT"])
 
@@ -43,6 +43,7 @@ class SCPFintentInstallWithdrawLat:
             global ONOSIp                   #list of ONOS IP addresses
             global scale
             global commit
+            global resultsDB
 
             clusterCount = 0
             ONOSIp = [ 0 ]
@@ -71,8 +72,16 @@ class SCPFintentInstallWithdrawLat:
             commit = main.ONOSbench.getVersion()
             commit = (commit.split(" "))[1]
 
-            resultsDB = open("/tmp/IntentInstallWithdrawLatDB", "w+")
-            resultsDB.close()
+            resultsDB = main.resultSink("/tmp/IntentInstallWithdrawLatDB",
+                                        [("commit", str), ("scale", int),
+                                         ("intents", int),
+                                         ("installedAverage", float),
+                                         ("installedStdDev", float),
+                                         ("withdrawnAverage", float),
+                                         ("withdrawnStdDev", float)],
+                                        backend="csv", header=False,
+                                        dialect="sqlvalues")
+            resultsDB.clear()
 
         # -- END OF INIT SECTION --#
 
@@ -143,7 +152,7 @@ class SCPFintentInstallWithdrawLat:
     def CASE2( self, main ):
 
         import time
-        import numpy
+        from core import latencystats
 
         testStatus = "pass"
         sampleSize = int(main.params[ 'TEST' ][ 'sampleSize' ])
@@ -254,22 +263,23 @@ class SCPFintentInstallWithdrawLat:
             main.log.report("----------------------------------------------------")
             main.log.report("Scale: " + str(clusterCount) + "\tIntent batch size: " + str(intentSize))
             main.log.report("Data samples: " + str(sampleSize) + "\tWarm up tests: " + str(warmUp))
-            main.log.report("Installed average: " + str(numpy.mean(installed)))
-            main.log.report("Installed standard deviation: " + str(numpy.std(installed)))
-            main.log.report("Withdraw average: " + str(numpy.mean(withdrawn)))
-            main.log.report("Withdraw standard deviation: " + str(numpy.std(withdrawn)))
+            installedStats = latencystats.summarize("Installed", installed)
+            withdrawnStats = latencystats.summarize("Withdraw", withdrawn)
+            main.log.report("Installed average: " + str(installedStats['mean']))
+            main.log.report("Installed standard deviation: " + str(installedStats['std']))
+            main.log.report("Withdraw average: " + str(withdrawnStats['mean']))
+            main.log.report("Withdraw standard deviation: " + str(withdrawnStats['std']))
+            for line in latencystats.summaryLines(installedStats) +\
+                    latencystats.summaryLines(withdrawnStats):
+                main.log.report(line)
             main.log.report("     ")
 
-            resultString = "'" + commit + "',"
-            resultString += str(clusterCount) + ","
-            resultString += str(intentSize) + ","
-            resultString += str(numpy.mean(installed)) + ","
-            resultString += str(numpy.std(installed)) + ","
-            resultString += str(numpy.mean(withdrawn)) + ","
-            resultString += str(numpy.std(withdrawn)) + "\n"
-            resultsDB = open("/tmp/IntentInstallWithdrawLatDB", "a")
-            resultsDB.write(resultString)
-            resultsDB.close()
+            resultsDB.add(commit=commit, scale=clusterCount,
+                          intents=intentSize,
+                          installedAverage=installedStats['mean'],
+                          installedStdDev=installedStats['std'],
+                          withdrawnAverage=withdrawnStats['mean'],
+                          withdrawnStdDev=withdrawnStats['std'])
 
             main.ONOSbench.logReport(ONOSIp[1], ["ERROR", "WARNING", "EXCEPT"])
             time.sleep(20)
@@ -43,6 +43,7 @@ class SCPFintentRerouteLat:
             global ONOSIp                   #list of ONOS IP addresses
             global scale
             global commit
+            global resultsDB
 
             clusterCount = 0
             ONOSIp = [ 0 ]
@@ -72,8 +73,13 @@ class SCPFintentRerouteLat:
             commit = main.ONOSbench.getVersion()
             commit = (commit.split(" "))[1]
 
-            resultsDB = open("/tmp/IntentRerouteLatDB", "w+")
-            resultsDB.close()
+            resultsDB = main.resultSink("/tmp/IntentRerouteLatDB",
+                                        [("commit", str), ("scale", int),
+                                         ("intents", int), ("average", float),
+                                         ("stdDev", float)],
+                                        backend="csv", header=False,
+                                        dialect="sqlvalues")
+            resultsDB.clear()
 
         # -- END OF INIT SECTION --#
 
@@ -167,7 +173,7 @@ class SCPFintentRerouteLat:
         import time
         import numpy
         import datetime
-        #from scipy import stats
+        from core import latencystats
 
         ts = time.time()
         date = datetime.datetime.fromtimestamp(ts).strftime('%Y-%m-%d')
@@ -203,6 +209,8 @@ class SCPFintentRerouteLat:
         for intents in intentsList:
             main.log.report("Intent Batch size: " + str(intents) + "\n      ")
             myResult = [["latency", "lastNode"] for x in range(sampleSize)]
+            # Runs without an installed timestamp are left out
+            rerouteLatencies = latencystats.emptyMatrix(1, sampleSize)
 
             for run in range(0, (warmUp + sampleSize)):
                 if run > warmUp:
@@ -333,6 +341,7 @@ class SCPFintentRerouteLat:
                             main.log.report("Reroute latency:" + str(rerouteLatency) + " (seconds)\n    ")
                             myResult[run-warmUp][0] = rerouteLatency
                             myResult[run-warmUp][1] = indexOfMax
+                            rerouteLatencies[0][run-warmUp] = numpy.multiply(rerouteLatency, 1000)
                             if debug: main.log.info("Latency: " + str(myResult[run-warmUp][0]))
                             if debug: main.log.info("last node: " + str(myResult[run-warmUp][1]))
 
@@ -368,10 +377,8 @@ class SCPFintentRerouteLat:
                     main.log.info("Warm up run " + str(run+1) + " completed")
 
             if debug: main.log.info(myResult)
-            latTemp = []
             nodeTemp = []
             for i in myResult:
-                latTemp.append(i[0])
                 nodeTemp.append(i[1])
 
             mode = {}
@@ -385,25 +392,21 @@ class SCPFintentRerouteLat:
                 if mode[i] == max(mode.values()):
                     nodeMode = i
 
-            average = numpy.average(latTemp)
-            stdDev = numpy.std(latTemp)
-
-            average = numpy.multiply(average, 1000)
-            stdDev = numpy.multiply(stdDev, 1000)
+            rerouteStats = latencystats.summarize("Reroute latency",
+                    rerouteLatencies)
+            average = rerouteStats['mean']
+            stdDev = rerouteStats['std']
 
             main.log.report("Scale: " + str(clusterCount) + "  \tIntent batch: " + str(intents))
             main.log.report("Latency average:................" + str(average))
             main.log.report("Latency standard deviation:....." + str(stdDev))
             main.log.report("Mode of last node to respond:..." + str(nodeMode))
+            for line in latencystats.summaryLines(rerouteStats):
+                main.log.report(line)
             main.log.report("________________________________________________________")
 
-            resultsDB = open("/tmp/IntentRerouteLatDB", "a")
-            resultsDB.write("'" + commit + "',")
-            resultsDB.write(str(clusterCount) + ",")
-            resultsDB.write(str(intents) + ",")
-            resultsDB.write(str(average) + ",")
-            resultsDB.write(str(stdDev) + "\n")
-            resultsDB.close()
+            resultsDB.add(commit=commit, scale=clusterCount, intents=intents,
+                          average=average, stdDev=stdDev)
 
             main.ONOSbench.logReport(ONOSIp[1], ["ERROR", "WARNING", "EXCEPT"])
 
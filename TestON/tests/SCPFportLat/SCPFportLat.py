@@ -186,7 +186,8 @@ class SCPFportLat:
         import os
         import requests
         import json
-        import numpy
+        from core import ofpcap
+        from core import latencystats
 
         ONOSUser = main.params['CTRL']['user']
         numIter = main.params['TEST']['numIter']
@@ -196,9 +197,13 @@ class SCPFportLat:
         graphTimestampKey = main.params['JSON']['graphTimestamp']
         linkTimestampKey = main.params['JSON']['linkTimestamp']
 
-        tsharkPortUp = '/tmp/tshark_port_up.txt'
-        tsharkPortDown = '/tmp/tshark_port_down.txt'
-        tsharkPortStatus = main.params[ 'TSHARK' ][ 'ofpPortStatus' ]
+        # The port status messages are read from a capture of the
+        # control channel
+        tsharkPortUp = '/tmp/tshark_port_up.pcap'
+        tsharkPortDown = '/tmp/tshark_port_down.pcap'
+        ofPort = int(main.params['TSHARK']['ofPort'])
+        tsharkInterface = main.params['TSHARK']['interface']
+        tsharkFilter = 'tcp port ' + str(ofPort)
 
         debugMode = main.params['TEST']['debugMode']
         postToDB = main.params['DB']['postToDB']
@@ -231,20 +236,21 @@ class SCPFportLat:
 
         time.sleep(15)
 
-        portUpEndToEndNodeIter = numpy.zeros((clusterCount, int(numIter)))
-        portUpOfpToDevNodeIter = numpy.zeros((clusterCount, int(numIter)))
-        portUpDevToLinkNodeIter = numpy.zeros((clusterCount, int(numIter)))
-        portUpLinkToGraphNodeIter = numpy.zeros((clusterCount, int(numIter)))
+        portUpEndToEndNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
+        portUpOfpToDevNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
+        portUpDevToLinkNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
+        portUpLinkToGraphNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
 
-        portDownEndToEndNodeIter = numpy.zeros((clusterCount, int(numIter)))
-        portDownOfpToDevNodeIter = numpy.zeros((clusterCount, int(numIter)))
-        portDownDevToLinkNodeIter = numpy.zeros((clusterCount, int(numIter)))
-        portDownLinkToGraphNodeIter = numpy.zeros((clusterCount, int(numIter)))
+        portDownEndToEndNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
+        portDownOfpToDevNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
+        portDownDevToLinkNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
+        portDownLinkToGraphNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
 
         for i in range(0, int(numIter)):
             main.log.report('Iteration: ' + str(i+1) + ' ClusterCount: ' + str(clusterCount))
             main.step('Starting wireshark capture for port status down')
-            main.ONOSbench.tsharkGrep(tsharkPortStatus, tsharkPortDown)
+            main.ONOSbench.tsharkPcap(tsharkInterface, tsharkPortDown,
+                    captureFilter=tsharkFilter)
 
             time.sleep(2)
 
@@ -264,22 +270,17 @@ class SCPFportLat:
 
             main.ONOSbench.tsharkStop()
 
-            fPortDown = open(tsharkPortDown, 'r')
-            fLine = fPortDown.readline()
-            objDown = fLine.split(' ')
-            if len(fLine) > 0:
-                timestampBeginPtDown = int(float(objDown[1]) * 1000)
-                # At times, tshark reports timestamp at the 3rd
-                # index of the array. If initial readings were
-                # unlike the epoch timestamp, then check the 3rd
-                # index and set that as a timestamp
-                if timestampBeginPtDown < 1400000000000:
-                   timestampBeginPtDown = int(float(objDown[2]) * 1000)
+            try:
+                portStatus = ofpcap.eventTimes(tsharkPortDown, ofPort=ofPort,
+                        names=['PORT_STATUS']).get('PORT_STATUS')
+            except (IOError, ValueError):
+                main.log.exception('Could not read ' + tsharkPortDown)
+                portStatus = None
+            if portStatus:
+                timestampBeginPtDown = int(portStatus[0])
             else:
-                main.log.info('Tshark output file returned unexpected' +
-                        ' results: ' + str(objDown))
+                main.log.info('Capture has no port status message')
                 timestampBeginPtDown = 0
-            fPortDown.close()
 
             for node in range(0, clusterCount):
                 nodeNum = node+1
@@ -307,42 +308,23 @@ class SCPFportLat:
                 ptDownDeviceToLink = float(linkTimestamp) - float(deviceTimestamp)
                 ptDownLinkToGraph = float(graphTimestamp) - float(linkTimestamp)
 
-                if ptDownEndToEnd < downThresholdMin or ptDownEndToEnd >= downThresholdMax:
-                    main.log.info("ONOS " +str(nodeNum) + " surpassed threshold - port down End-to-end: "+ str(ptDownEndToEnd) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+str(nodeNum) + " warming up - port down End-to-end: "+ str(ptDownEndToEnd) + " ms")
-                else:
-                    portDownEndToEndNodeIter[node][i] = ptDownEndToEnd
-                    main.log.info("ONOS "+str(nodeNum) + " port down End-to-end: "+ str(ptDownEndToEnd) + " ms")
-
-                if ptDownOfpToDevice < downThresholdMin or ptDownOfpToDevice >= downThresholdMax:
-                    main.log.info("ONOS " +str(nodeNum) + " surpassed threshold - port down Ofp-to-device: "+ str(ptDownOfpToDevice) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+str(nodeNum) + " warming up - port down Ofp-to-device: "+ str(ptDownOfpToDevice) + " ms")
-                else:
-                    portDownOfpToDevNodeIter[node][i] = ptDownOfpToDevice
-                    main.log.info("ONOS "+str(nodeNum) + " port down Ofp-to-device: "+ str(ptDownOfpToDevice) + " ms")
-
-                if ptDownDeviceToLink < downThresholdMin or ptDownDeviceToLink >= downThresholdMax:
-                    main.log.info("ONOS " +str(nodeNum) + " surpassed threshold - port down Device-to-link: "+ str(ptDownDeviceToLink) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+str(nodeNum) + " warming up - port down Device-to-link: "+ str(ptDownDeviceToLink) + " ms")
-                else:
-                    portDownDevToLinkNodeIter[node][i] = ptDownDeviceToLink
-                    main.log.info("ONOS "+str(nodeNum) + " port down Device-to-link: "+ str(ptDownDeviceToLink) + " ms")
-
-                if ptDownLinkToGraph < downThresholdMin or ptDownLinkToGraph >= downThresholdMax:
-                    main.log.info("ONOS " +str(nodeNum) + " surpassed threshold - port down Link-to-graph: "+ str(ptDownLinkToGraph) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+str(nodeNum) + " warming up - port down Link-to-graph: "+ str(ptDownLinkToGraph) + " ms")
-                else:
-                    portDownLinkToGraphNodeIter[node][i] = ptDownLinkToGraph
-                    main.log.info("ONOS "+str(nodeNum) + " port down Link-to-graph: "+ str(ptDownLinkToGraph) + " ms")
+                # Warm-up iterations and measurements out of the
+                # threshold are dropped by latencystats
+                portDownEndToEndNodeIter[node][i] = ptDownEndToEnd
+                portDownOfpToDevNodeIter[node][i] = ptDownOfpToDevice
+                portDownDevToLinkNodeIter[node][i] = ptDownDeviceToLink
+                portDownLinkToGraphNodeIter[node][i] = ptDownLinkToGraph
+                main.log.info("ONOS " + str(nodeNum) + " port down End-to-end: " +
+                        str(ptDownEndToEnd) + " ms, Ofp-to-device: " +
+                        str(ptDownOfpToDevice) + " ms, Device-to-link: " +
+                        str(ptDownDeviceToLink) + " ms, Link-to-graph: " +
+                        str(ptDownLinkToGraph) + " ms")
 
             time.sleep(3)
 
             main.step('Starting wireshark capture for port status up')
-            main.ONOSbench.tsharkGrep(tsharkPortStatus, tsharkPortUp)
+            main.ONOSbench.tsharkPcap(tsharkInterface, tsharkPortUp,
+                    captureFilter=tsharkFilter)
 
             time.sleep(5)
             main.step('Enable port and obtain timestamp')
@@ -361,17 +343,17 @@ class SCPFportLat:
 
             time.sleep(3)
 
-            fPortUp = open(tsharkPortUp, 'r')
-            fLine = fPortUp.readline()
-            objUp = fLine.split(' ')
-            if len(fLine) > 0:
-                timestampBeginPtUp = int(float(objUp[1]) * 1000)
-                if timestampBeginPtUp < 1400000000000:
-                    timestampBeginPtUp = int(float(objUp[2]) * 1000)
+            try:
+                portStatus = ofpcap.eventTimes(tsharkPortUp, ofPort=ofPort,
+                        names=['PORT_STATUS']).get('PORT_STATUS')
+            except (IOError, ValueError):
+                main.log.exception('Could not read ' + tsharkPortUp)
+                portStatus = None
+            if portStatus:
+                timestampBeginPtUp = int(portStatus[0])
             else:
-                main.log.info('Tshark output file returned unexpected' + ' results.')
+                main.log.info('Capture has no port status message')
                 timestampBeginPtUp = 0
-            fPortUp.close()
 
             for node in range(0, clusterCount):
                 nodeNum = node+1
@@ -400,139 +382,51 @@ class SCPFportLat:
                 ptUpDeviceToLink = float(linkTimestamp) - float(deviceTimestamp)
                 ptUpLinkToGraph = float(graphTimestamp) - float(linkTimestamp)
 
-                if ptUpEndToEnd < upThresholdMin or ptUpEndToEnd >= upThresholdMax:
-                    main.log.info("ONOS " +str(nodeNum) + " surpassed threshold - port up End-to-end: "+ str(ptUpEndToEnd) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+str(nodeNum) + " warming up - port up End-to-end: "+ str(ptUpEndToEnd) + " ms")
-                else:
-                    portUpEndToEndNodeIter[node][i] = ptUpEndToEnd
-                    main.log.info("ONOS "+str(nodeNum) + " port up End-to-end: "+ str(ptUpEndToEnd) + " ms")
-
-                if ptUpOfpToDevice < upThresholdMin or ptUpOfpToDevice >= upThresholdMax:
-                    main.log.info("ONOS " + str(nodeNum) + " surpassed threshold - port up Ofp-to-device: "+ str(ptUpOfpToDevice) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+ str(nodeNum) + " warming up - port up Ofp-to-device: "+ str(ptUpOfpToDevice) + " ms")
-                else:
-                    portUpOfpToDevNodeIter[node][i] = ptUpOfpToDevice
-                    main.log.info("ONOS "+ str(nodeNum) + " port up Ofp-to-device: "+ str(ptUpOfpToDevice) + " ms")
-
-                if ptUpDeviceToLink < upThresholdMin or ptUpDeviceToLink >= upThresholdMax:
-                    main.log.info("ONOS " +str(nodeNum) + " surpassed threshold - port up Device-to-link: "+ str(ptUpDeviceToLink) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS "+str(nodeNum) + " warming up - port up Device-to-link: "+ str(ptUpDeviceToLink) + " ms")
-                else:
-                    portUpDevToLinkNodeIter[node][i] = ptUpDeviceToLink
-                    main.log.info("ONOS "+str(nodeNum) + " port up Device-to-link: "+ str(ptUpDeviceToLink) + " ms")
-
-                if ptUpLinkToGraph < upThresholdMin or ptUpLinkToGraph >= upThresholdMax:
-                    main.log.info("ONOS " + str(nodeNum) + " surpassed threshold - port up Link-to-graph: " + str(ptUpLinkToGraph) + " ms")
-                elif i < iterIgnore:
-                    main.log.info("ONOS " + str(nodeNum) + " warming up - port up Link-to-graph: " + str(ptUpLinkToGraph) + " ms")
-                else:
-                    portUpLinkToGraphNodeIter[node][i] = ptUpLinkToGraph
-                    main.log.info("ONOS " + str(nodeNum) + " port up Link-to-graph: " + str(ptUpLinkToGraph) + " ms")
+                portUpEndToEndNodeIter[node][i] = ptUpEndToEnd
+                portUpOfpToDevNodeIter[node][i] = ptUpOfpToDevice
+                portUpDevToLinkNodeIter[node][i] = ptUpDeviceToLink
+                portUpLinkToGraphNodeIter[node][i] = ptUpLinkToGraph
+                main.log.info("ONOS " + str(nodeNum) + " port up End-to-end: " +
+                        str(ptUpEndToEnd) + " ms, Ofp-to-device: " +
+                        str(ptUpOfpToDevice) + " ms, Device-to-link: " +
+                        str(ptUpDeviceToLink) + " ms, Link-to-graph: " +
+                        str(ptUpLinkToGraph) + " ms")
+
+        upOptions = {'warmUp': iterIgnore, 'lower': upThresholdMin,
+                'upper': upThresholdMax}
+        downOptions = {'warmUp': iterIgnore, 'lower': downThresholdMin,
+                'upper': downThresholdMax}
+        # Same order as the columns of port_latency_details
+        latencyRecords = [
+            latencystats.summarize('Port up End-to-end',
+                portUpEndToEndNodeIter, **upOptions),
+            latencystats.summarize('Port up Ofp-to-device',
+                portUpOfpToDevNodeIter, **upOptions),
+            latencystats.summarize('Port up Device-to-link',
+                portUpDevToLinkNodeIter, **upOptions),
+            latencystats.summarize('Port up Link-to-graph',
+                portUpLinkToGraphNodeIter, **upOptions),
+            latencystats.summarize('Port down End-to-end',
+                portDownEndToEndNodeIter, **downOptions),
+            latencystats.summarize('Port down Ofp-to-device',
+                portDownOfpToDevNodeIter, **downOptions),
+            latencystats.summarize('Port down Device-to-link',
+                portDownDevToLinkNodeIter, **downOptions),
+            latencystats.summarize('Port down Link-to-graph',
+                portDownLinkToGraphNodeIter, **downOptions)]
+
+        for record in latencyRecords:
+            for line in latencystats.summaryLines(record):
+                main.log.report(line)
 
         dbCmdList = []
         for node in range(0, clusterCount):
-            portUpEndToEndList = []
-            portUpOfpToDevList = []
-            portUpDevToLinkList = []
-            portUpLinkToGraphList = []
-
-            portDownEndToEndList = []
-            portDownOfpToDevList = []
-            portDownDevToLinkList = []
-            portDownLinkToGraphList = []
-
-            portUpEndToEndAvg = 0
-            portUpOfpToDevAvg = 0
-            portUpDevToLinkAvg = 0
-            portUpLinkToGraphAvg = 0
-
-            portDownEndToEndAvg = 0
-            portDownOfpToDevAvg = 0
-            portDownDevToLinkAvg = 0
-            portDownLinkToGraphAvg = 0
-
-            # TODO: Update for more pythonic way to get list
-            # portUpDevList = [item for item in portUpDevNodeIter[node]
-            #        if item > 0.0]
-            for item in portUpEndToEndNodeIter[node]:
-                if item > 0.0:
-                    portUpEndToEndList.append(item)
-
-            for item in portUpOfpToDevNodeIter[node]:
-                if item > 0.0:
-                    portUpOfpToDevList.append(item)
-
-            for item in portUpDevToLinkNodeIter[node]:
-                if item > 0.0:
-                    portUpDevToLinkList.append(item)
-
-            for item in portUpLinkToGraphNodeIter[node]:
-                if item >= 0.0:
-                    portUpLinkToGraphList.append(item)
-
-            for item in portDownEndToEndNodeIter[node]:
-                if item > 0.0:
-                    portDownEndToEndList.append(item)
-
-            for item in portDownOfpToDevNodeIter[node]:
-                if item > 0.0:
-                    portDownOfpToDevList.append(item)
-
-            for item in portDownDevToLinkNodeIter[node]:
-                if item >= 0.0:
-                    portDownDevToLinkList.append(item)
-
-            for item in portDownLinkToGraphNodeIter[node]:
-                if item >= 0.0:
-                    portDownLinkToGraphList.append(item)
-
-            portUpEndToEndAvg = round(numpy.mean(portUpEndToEndList), 2)
-            portUpOfpToDevAvg = round(numpy.mean(portUpOfpToDevList), 2)
-            portUpDevToLinkAvg = round(numpy.mean(portUpDevToLinkList), 2)
-            portUpLinkToGraphAvg = round(numpy.mean(portUpLinkToGraphList), 2)
-
-            portDownEndToEndAvg = round(numpy.mean(portDownEndToEndList), 2)
-            portDownOfpToDevAvg = round(numpy.mean(portDownOfpToDevList), 2)
-            portDownDevToLinkAvg = round(numpy.mean(portDownDevToLinkList), 2)
-            portDownLinkToGraphAvg = round(numpy.mean(portDownLinkToGraphList), 2)
-
-            portUpStdDev = round(numpy.std(portUpEndToEndList), 2)
-            portDownStdDev = round(numpy.std(portDownEndToEndList), 2)
-
-            main.log.report(' - Node ' + str(node + 1) + ' Summary ---------------- ')
-            main.log.report(' Port up End-to-end ' +
-                    str(portUpEndToEndAvg) + ' ms')
-            main.log.report(' Port up Ofp-to-device ' +
-                    str(portUpOfpToDevAvg) + ' ms')
-            main.log.report(' Port up Device-to-link ' +
-                    str(portUpDevToLinkAvg) + ' ms')
-            main.log.report(' Port up Link-to-graph ' +
-                    str(portUpLinkToGraphAvg) + ' ms')
-
-            main.log.report(' Port down End-to-end ' +
-                    str(round(portDownEndToEndAvg, 2)) + ' ms')
-            main.log.report(' Port down Ofp-to-device ' +
-                    str(portDownOfpToDevAvg) + ' ms')
-            main.log.report(' Port down Device-to-link ' +
-                    str(portDownDevToLinkAvg) + ' ms')
-            main.log.report(' Port down Link-to-graph' +
-                    str(portDownLinkToGraphAvg) + ' ms')
-
             dbCmdList.append("INSERT INTO port_latency_details VALUES('" +
                     timeToPost + "','port_latency_results'," + jenkinsBuildNumber +
                     ',' + str(clusterCount) + ",'baremetal" + str(node + 1) +
                     "'," +
-                    str(portUpEndToEndAvg) +',' +
-                    str(portUpOfpToDevAvg) + ',' +
-                    str(portUpDevToLinkAvg) + ',' +
-                    str(portUpLinkToGraphAvg) + ',' +
-                    str(portDownEndToEndAvg) + ',' +
-                    str(portDownOfpToDevAvg) + ',' +
-                    str(portDownDevToLinkAvg) + ',' +
-                    str(portDownLinkToGraphAvg) +
+                    ','.join(str(round(record['nodes'][node]['mean'], 2))
+                             for record in latencyRecords) +
                     ');')
 
         fResult = open(resultPath, 'a')
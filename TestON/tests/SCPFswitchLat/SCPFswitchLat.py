@@ -202,7 +202,8 @@ class SCPFswitchLat:
         import json
         import requests
         import os
-        import numpy
+        from core import ofpcap
+        from core import latencystats
 
         ONOSUser = main.params['CTRL']['user']
         numIter = main.params['TEST']['numIter']
@@ -219,49 +220,43 @@ class SCPFswitchLat:
         thresholdMin = int(thresholdObj[0])
         thresholdMax = int(thresholdObj[1])
 
-        # Look for 'role-request' messages,
-        # which replaces the 'vendor' messages previously seen
-        # on OVS 2.0.1
-        tsharkTcpString = main.params[ 'TSHARK' ][ 'tcpSynAck' ]
-        tsharkFeatureReply = main.params[ 'TSHARK' ][ 'featureReply' ]
-        tsharkRoleRequest = main.params[ 'TSHARK' ][ 'roleRequest' ]
-        tsharkOfString = main.params[ 'TSHARK' ][ 'ofpRoleReply' ]
-        tsharkFinAckSequence = main.params[ 'TSHARK' ][ 'finAckSequence' ]
-
-        tsharkOfOutput = '/tmp/tshark_of_topo.txt'
-        tsharkTcpOutput = '/tmp/tshark_tcp_topo.txt'
-        tsharkRoleOutput = '/tmp/tshark_role_request.txt'
-        tsharkFeatureOutput = '/tmp/tshark_feature_reply.txt'
-        tsharkFinAckOutput = '/tmp/tshark_fin_ack.txt'
+        # The control channel is captured once per iteration and the
+        # timestamps of the handshake, the role request / reply and the
+        # teardown are all read from the pcap in one pass
+        ofPort = int(main.params['TSHARK']['ofPort'])
+        tsharkInterface = main.params['TSHARK']['interface']
+        tsharkFilter = 'tcp port ' + str(ofPort)
+        pcapUpOutput = '/tmp/tshark_sw_up.pcap'
+        pcapDownOutput = '/tmp/tshark_sw_down.pcap'
 
         # Switch connect measurement list
         # TCP Syn/Ack -> Feature Reply latency collection for each node
-        tcpToFeatureLatNodeIter = numpy.zeros((clusterCount, int(numIter)))
+        tcpToFeatureLatNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
         # Feature Reply -> Role Request latency collection for each node
-        featureToRoleRequestLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
+        featureToRoleRequestLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
         # Role Request -> Role Reply latency collection for each node
-        roleRequestToRoleReplyLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
+        roleRequestToRoleReplyLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
         # Role Reply -> Device Update latency collection for each node
-        roleReplyToDeviceLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
+        roleReplyToDeviceLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
         # Device Update -> Graph Update latency collection for each node
-        deviceToGraphLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
-        endToEndLatNodeIter = numpy.zeros((clusterCount, int(numIter)))
+        deviceToGraphLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
+        endToEndLatNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
 
         # Switch disconnect measurement lists
         # Mininet Fin / Ack -> Mininet Ack
-        finAckTransactionLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
+        finAckTransactionLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
         # Mininet Ack -> Device Event
-        ackToDeviceLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
+        ackToDeviceLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
         # Device event -> Graph event
-        deviceToGraphDiscLatNodeIter = numpy.zeros((clusterCount,
-            int(numIter)))
-        endToEndDiscLatNodeIter = numpy.zeros((clusterCount, int(numIter)))
+        deviceToGraphDiscLatNodeIter = latencystats.emptyMatrix(clusterCount,
+            numIter)
+        endToEndDiscLatNodeIter = latencystats.emptyMatrix(clusterCount, numIter)
 
         assertion = main.TRUE
         localTime = time.strftime('%x %X')
@@ -279,10 +274,8 @@ class SCPFswitchLat:
 
         for i in range(0, int(numIter)):
             main.log.info('Starting tshark capture')
-            main.ONOSbench.tsharkGrep(tsharkTcpString, tsharkTcpOutput)
-            main.ONOSbench.tsharkGrep(tsharkOfString, tsharkOfOutput)
-            main.ONOSbench.tsharkGrep(tsharkRoleRequest, tsharkRoleOutput)
-            main.ONOSbench.tsharkGrep(tsharkFeatureReply, tsharkFeatureOutput)
+            main.ONOSbench.tsharkPcap(tsharkInterface, pcapUpOutput,
+                    captureFilter=tsharkFilter)
 
             time.sleep(10)
 
@@ -302,90 +295,45 @@ class SCPFswitchLat:
 
             time.sleep(5)
 
-            '''
-            main.log.info('Copying over tshark files')
-            os.system('scp ' + ONOSUser + '@' + main.ONOSIp[0] +
-                    ':' + tsharkTcpOutput + ' /tmp/')
-            os.system('scp ' + ONOSUser + '@' + main.ONOSIp[0] +
-                    ':' + tsharkRoleOutput + ' /tmp/')
-            os.system('scp ' + ONOSUser + '@' + main.ONOSIp[0] +
-                    ':' + tsharkFeatureOutput + ' /tmp/')
-            os.system('scp ' + ONOSUser + '@' +
-                      main.ONOSIp[0] + ':' + tsharkOfOutput + ' /tmp/')
-            '''
-
-            # Get tcp syn / ack output
+            # Get the first tcp syn, the first feature reply, the first
+            # role request and the last role reply
             time.sleep(1)
-
-            tcpFile = open(tsharkTcpOutput, 'r')
-            tempText = tcpFile.readline()
-            tempText = tempText.split(' ')
-            main.log.info('Object read in from TCP capture: ' + str(tempText))
-
-            if len(tempText) > 1:
-                t0Tcp = float(tempText[1]) * 1000.0
+            try:
+                ofTimes = ofpcap.eventTimes(pcapUpOutput, ofPort=ofPort)
+            except (IOError, ValueError):
+                main.log.exception('Could not read ' + pcapUpOutput)
+                ofTimes = {}
+            main.log.info('Events read in from capture: ' +
+                    str(dict((name, len(times)) for name, times in
+                             ofTimes.items())))
+
+            if ofTimes.get('SYN'):
+                t0Tcp = ofTimes['SYN'][0]
             else:
-                main.log.error('Tshark output file for TCP' + ' returned unexpected results')
+                main.log.error('Capture has no TCP SYN')
                 t0Tcp = 0
                 assertion = main.FALSE
-            tcpFile.close()
-
-            # Get Role reply output
-            ofFile = open(tsharkOfOutput, 'r')
-            lineOfp = ''
-            while True:
-                tempText = ofFile.readline()
-                if tempText != '':
-                    lineOfp = tempText
-                else:
-                    break
-            obj = lineOfp.split(' ')
-            main.log.info('Object read in from OFP capture: ' +
-                    str(lineOfp))
-            if len(obj) > 1:
-                t0Ofp = float(obj[1]) * 1000.0
+
+            if ofTimes.get('ROLE_REPLY'):
+                t0Ofp = ofTimes['ROLE_REPLY'][-1]
             else:
-                main.log.error('Tshark output file for OFP' +
-                        ' returned unexpected results')
+                main.log.error('Capture has no OFP role reply')
                 t0Ofp = 0
                 assertion = main.FALSE
-            ofFile.close()
-
-            # Get role request output
-            roleFile = open(tsharkRoleOutput, 'r')
-            tempText = roleFile.readline()
-            tempText = tempText.split(' ')
-            if len(tempText) > 1:
-                main.log.info('Object read in from role request capture:' +
-                        str(tempText))
-                roleTimestamp = float(tempText[1]) * 1000.0
+
+            if ofTimes.get('ROLE_REQUEST'):
+                roleTimestamp = ofTimes['ROLE_REQUEST'][0]
             else:
-                main.log.error('Tshark output file for role request' +
-                        ' returned unexpected results')
-                timeRoleRequest = 0
+                main.log.error('Capture has no OFP role request')
+                roleTimestamp = 0
                 assertion = main.FALSE
-            roleFile.close()
-
-            # Get feature reply output
-            featureFile = open(tsharkFeatureOutput, 'r')
-            tempText = featureFile.readline()
-            tempText = tempText.split(' ')
-            if len(tempText) > 1:
-                main.log.info('Object read in from feature reply capture: '+
-                        str(tempText))
-                if tempText[1] != ' ' and float(tempText[1]) > 1400000000.0:
-                    temp = tempText[1]
-                elif tempText[2] != ' ' and float(tempText[2]) > 1400000000.0:
-                    temp = tempText[2]
-                else:
-                    temp = 0
-                featureTimestamp = float(temp) * 1000.0
+
+            if ofTimes.get('FEATURES_REPLY'):
+                featureTimestamp = ofTimes['FEATURES_REPLY'][0]
             else:
-                main.log.error('Tshark output file for feature reply' +
-                        ' returned unexpected results')
-                timeFeatureReply = 0
+                main.log.error('Capture has no OFP feature reply')
+                featureTimestamp = 0
                 assertion = main.FALSE
-            featureFile.close()
 
             for node in range(0, clusterCount):
                 nodeNum = node+1
@@ -421,79 +369,21 @@ class SCPFswitchLat:
                 # For now, this will be treated as 0 ms if less than 1 ms
                 deviceToGraph = int(graphTimestamp) - int(deviceTimestamp)
 
-                if endToEnd >= thresholdMin and\
-                   endToEnd < thresholdMax and i >= iterIgnore:
-                    endToEndLatNodeIter[node][i] = endToEnd
-                    main.log.info("ONOS "+str(nodeNum)+ " end-to-end: "+
-                            str(endToEnd) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+ " end-to-end "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(endToEnd))
-
-                if tcpToFeature >= thresholdMin and\
-                   tcpToFeature < thresholdMax and i >= iterIgnore:
-                    tcpToFeatureLatNodeIter[node][i] = tcpToFeature
-                    main.log.info("ONOS "+str(nodeNum)+ " tcp-to-feature: "+
-                            str(tcpToFeature) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+ " tcp-to-feature "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(tcpToFeature))
-
-                if featureToRole >= thresholdMin and\
-                   featureToRole < thresholdMax and i >= iterIgnore:
-                    featureToRoleRequestLatNodeIter[node][i] = featureToRole
-                    main.log.info("ONOS "+str(nodeNum)+ " feature-to-role: "+
-                            str(featureToRole) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+ " feature-to-role "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(featureToRole))
-
-                if roleToOfp >= thresholdMin and\
-                   roleToOfp < thresholdMax and i >= iterIgnore:
-                    roleRequestToRoleReplyLatNodeIter[node][i] = roleToOfp
-                    main.log.info("ONOS "+str(nodeNum)+ " role-to-reply: "+
-                            str(roleToOfp) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+ " role-to-reply "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(roleToOfp))
-
-                if ofpToDevice >= thresholdMin and\
-                   ofpToDevice < thresholdMax and i >= iterIgnore:
-                    roleReplyToDeviceLatNodeIter[node][i] = ofpToDevice
-                    main.log.info("ONOS "+str(nodeNum)+ " reply-to-device: "+
-                            str(ofpToDevice) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+ " reply-to-device "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(ofpToDevice))
-
-                if deviceToGraph >= thresholdMin and\
-                   deviceToGraph < thresholdMax and i >= iterIgnore:
-                    deviceToGraphLatNodeIter[node][i] = deviceToGraph
-                    main.log.info("ONOS "+str(nodeNum)+ " device-to-graph: "+
-                            str(deviceToGraph) + " ms")
-                else:
-                    if deviceToGraph == 0:
-                        deviceToGraphLatNodeIter[node][i] = 0
-                        main.log.info("ONOS "+str(nodeNum) +
-                            " device-to-graph measurement "+
-                            "was set to 0 ms because of precision "+
-                            "uncertainty. ")
-                    else:
-                        main.log.info("ONOS "+str(nodeNum)+
-                            " device-to-graph "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                        main.log.info(str(deviceToGraph))
+                # Warm-up iterations and measurements out of the
+                # threshold are dropped by latencystats
+                endToEndLatNodeIter[node][i] = endToEnd
+                tcpToFeatureLatNodeIter[node][i] = tcpToFeature
+                featureToRoleRequestLatNodeIter[node][i] = featureToRole
+                roleRequestToRoleReplyLatNodeIter[node][i] = roleToOfp
+                roleReplyToDeviceLatNodeIter[node][i] = ofpToDevice
+                deviceToGraphLatNodeIter[node][i] = deviceToGraph
+                main.log.info("ONOS " + str(nodeNum) + " end-to-end: " +
+                        str(endToEnd) + " ms, tcp-to-feature: " +
+                        str(tcpToFeature) + " ms, feature-to-role: " +
+                        str(featureToRole) + " ms, role-to-reply: " +
+                        str(roleToOfp) + " ms, reply-to-device: " +
+                        str(ofpToDevice) + " ms, device-to-graph: " +
+                        str(deviceToGraph) + " ms")
 
             # ********************
             time.sleep(5)
@@ -514,10 +404,8 @@ class SCPFswitchLat:
             # Device Event -> Graph Event
             # Capture switch down FIN / ACK packets
 
-            # The -A 1 grep option allows us to grab 1 extra line after the
-            # last tshark output grepped originally
-            main.ONOSbench.tsharkGrep( tsharkFinAckSequence, tsharkFinAckOutput,
-                    grepOptions = '-A 1' )
+            main.ONOSbench.tsharkPcap(tsharkInterface, pcapDownOutput,
+                    captureFilter=tsharkFilter)
 
             time.sleep( 5 )
 
@@ -543,52 +431,24 @@ class SCPFswitchLat:
             #if deviceId:
             main.ONOS1cli.deviceRemove(firstDevice)
 
-            #main.log.info('Copying over tshark files')
-            #os.system('scp ' + ONOSUser + '@' + main.ONOSIp[0] + ':' + tsharkFinAckOutput + ' /tmp/')
-
             time.sleep( 10 )
-            finAckOutputList = []
-            with open(tsharkFinAckOutput, 'r') as f:
-                tempLine = f.readlines()
-                main.log.info('Object read in from FinAck capture: ' +
-                    "\n".join(tempLine))
-
-                index = 1
-                for line in tempLine:
-                    obj = line.split(' ')
-
-                    # There are at least 3 objects in field (valid
-                    # tshark output is lengthy)
-                    if len(obj) > 2:
-                        # If first index of object is like an epoch time
-                        if obj[1] != ' ' and float(obj[1]) > 1400000000.0:
-                            temp = obj[1]
-                        elif obj[2] != ' 'and float(obj[2]) > 1400000000.0:
-                            temp = obj[2]
-                        elif obj[3] != ' 'and float(obj[3]) > 1400000000.0:
-                            temp = obj[3]
-                        else:
-                            temp = 0
-                        if index == 1:
-                            tFinAck = float(temp) * 1000.0
-                            main.log.info("DEBUG-- tFinAck: " + str(tFinAck))
-                        elif index == 3:
-                            tAck = float(temp) * 1000.0
-                            main.log.info("DEBUG-- tAck: " + str(tAck))
-                        else:
-                            tAck = 0
-                    else:
-                        main.log.error('Tshark output file for OFP' +
-                            ' returned unexpected results')
-                        tFinAck = 0
-                        tAck = 0
-                        assertion = main.FALSE
-
-                    index += 1
-                main.log.info("DEBUG-- tFinAck: " + str(tFinAck))
-                main.log.info("DEBUG-- tAck: " + str(tAck))
-
-            # with open() as f takes care of closing file
+            # The first FIN is sent by the switch, the last ack of a FIN
+            # ends the teardown
+            try:
+                ofTimes = ofpcap.eventTimes(pcapDownOutput, ofPort=ofPort)
+            except (IOError, ValueError):
+                main.log.exception('Could not read ' + pcapDownOutput)
+                ofTimes = {}
+            if ofTimes.get('FIN') and ofTimes.get('FIN_ACKED'):
+                tFinAck = ofTimes['FIN'][0]
+                tAck = ofTimes['FIN_ACKED'][-1]
+            else:
+                main.log.error('Capture has no TCP FIN / ACK sequence')
+                tFinAck = 0
+                tAck = 0
+                assertion = main.FALSE
+            main.log.info("DEBUG-- tFinAck: " + str(tFinAck))
+            main.log.info("DEBUG-- tAck: " + str(tAck))
 
             time.sleep(5)
 
@@ -615,232 +475,57 @@ class SCPFswitchLat:
                 endToEndDisc = int(graphTimestamp) - int(tFinAck)
                 main.log.info("DEBUG-- endToEndDisc = graphTimestamp - tFinAck  == (" + str(graphTimestamp) + "-" + str(tFinAck) + ")") 
 
-                if endToEndDisc >= thresholdMin and\
-                   endToEndDisc < thresholdMax and i >= iterIgnore:
-                    endToEndDiscLatNodeIter[node][i] = endToEndDisc
-                    main.log.info("ONOS "+str(nodeNum) +
-                            "end-to-end disconnection: "+
-                            str(endToEndDisc) + " ms" )
-                else:
-                    main.log.info("ONOS " + str(nodeNum) +
-                            " end-to-end disconnection "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(endToEndDisc))
-
-                if finAckTransaction >= thresholdMin and\
-                   finAckTransaction < thresholdMax and i >= iterIgnore:
-                    finAckTransactionLatNodeIter[node][i] = finAckTransaction
-                    main.log.info("ONOS "+str(nodeNum)+
-                            " fin/ack transaction: "+
-                            str(finAckTransaction) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+
-                            " fin/ack transaction "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(finAckTransaction))
-
-                if ackToDevice >= thresholdMin and\
-                   ackToDevice < thresholdMax and i >= iterIgnore:
-                    ackToDeviceLatNodeIter[node][i] = ackToDevice
-                    main.log.info("ONOS "+str(nodeNum)+
-                            " ack-to-device: "+
-                            str(ackToDevice) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+
-                            " ack-to-device "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(ackToDevice))
-
-                if deviceToGraph >= thresholdMin and\
-                   deviceToGraph < thresholdMax and i >= iterIgnore:
-                    deviceToGraphDiscLatNodeIter[node][i] = deviceToGraph
-                    main.log.info("ONOS "+str(nodeNum)+
-                            " device-to-graph disconnect: "+
-                            str(deviceToGraph) + " ms")
-                else:
-                    main.log.info("ONOS "+str(nodeNum)+
-                            " device-to-graph disconnect "+
-                            "measurement ignored due to excess in "+
-                            "threshold or premature iteration: ")
-                    main.log.info(str(deviceToGraph))
-
-        endToEndAvg = 0
-        ofpToGraphAvg = 0
+                endToEndDiscLatNodeIter[node][i] = endToEndDisc
+                finAckTransactionLatNodeIter[node][i] = finAckTransaction
+                ackToDeviceLatNodeIter[node][i] = ackToDevice
+                deviceToGraphDiscLatNodeIter[node][i] = deviceToGraph
+                main.log.info("ONOS " + str(nodeNum) +
+                        " end-to-end disconnection: " +
+                        str(endToEndDisc) + " ms, fin/ack transaction: " +
+                        str(finAckTransaction) + " ms, ack-to-device: " +
+                        str(ackToDevice) + " ms, device-to-graph " +
+                        "disconnect: " + str(deviceToGraph) + " ms")
+
+        statsOptions = {'warmUp': iterIgnore, 'lower': thresholdMin,
+                'upper': thresholdMax}
+        # Same order as the columns of switch_latency_details
+        latencyRecords = [
+            latencystats.summarize('End-to-end', endToEndLatNodeIter,
+                **statsOptions),
+            latencystats.summarize('Tcp-to-feature-reply',
+                tcpToFeatureLatNodeIter, **statsOptions),
+            latencystats.summarize('Feature-reply-to-role-request',
+                featureToRoleRequestLatNodeIter, **statsOptions),
+            latencystats.summarize('Role-request-to-role-reply',
+                roleRequestToRoleReplyLatNodeIter, **statsOptions),
+            latencystats.summarize('Role-reply-to-device',
+                roleReplyToDeviceLatNodeIter, **statsOptions),
+            latencystats.summarize('Device-to-graph',
+                deviceToGraphLatNodeIter, **statsOptions),
+            latencystats.summarize('End-to-end switch disconnect',
+                endToEndDiscLatNodeIter, **statsOptions),
+            latencystats.summarize('Fin/Ack-to-Ack',
+                finAckTransactionLatNodeIter, **statsOptions),
+            latencystats.summarize('Ack-to-device',
+                ackToDeviceLatNodeIter, **statsOptions),
+            latencystats.summarize('Device-to-graph (disconnect)',
+                deviceToGraphDiscLatNodeIter, **statsOptions)]
+
+        main.log.report(' - Switch Connection / Disconnection Statistics - ')
+        for record in latencyRecords:
+            for line in latencystats.summaryLines(record):
+                main.log.report(line)
+
         dbCmdList = []
         for node in range(0, clusterCount):
-            # List of latency for each node
-            endToEndList = []
-            tcpToFeatureList = []
-            featureToRoleList = []
-            roleToOfpList = []
-            ofpToDeviceList = []
-            deviceToGraphList = []
-
-            finAckTransactionList = []
-            ackToDeviceList = []
-            deviceToGraphDiscList = []
-            endToEndDiscList = []
-
-            # LatNodeIter 2d arrays contain all iteration latency
-            # for each node of the current scale cluster size
-            # Switch connection measurements
-            # Set further acceptance criteria for measurements
-            # here if you would like to filter reporting results
-            for item in endToEndLatNodeIter[node]:
-                if item > 0.0:
-                    endToEndList.append(item)
-
-            for item in tcpToFeatureLatNodeIter[node]:
-                if item > 0.0:
-                    tcpToFeatureList.append(item)
-
-            for item in featureToRoleRequestLatNodeIter[node]:
-                if item > 0.0:
-                    featureToRoleList.append(item)
-
-            for item in roleRequestToRoleReplyLatNodeIter[node]:
-                if item > 0.0:
-                    roleToOfpList.append(item)
-
-            for item in roleReplyToDeviceLatNodeIter[node]:
-                if item >= 0.0:
-                    ofpToDeviceList.append(item)
-
-            for item in featureToRoleRequestLatNodeIter[node]:
-                if item > 0.0:
-                    featureToRoleList.append(item)
-
-            for item in deviceToGraphLatNodeIter[node]:
-                if item >= 0.0:
-                    deviceToGraphList.append(item)
-
-            # Switch disconnect measurements
-            for item in endToEndDiscLatNodeIter[node]:
-                if item > 0.0:
-                    endToEndDiscList.append(item)
-
-            for item in finAckTransactionLatNodeIter[node]:
-                if item > 0.0:
-                    finAckTransactionList.append(item)
-
-            for item in ackToDeviceLatNodeIter[node]:
-                if item > 0.0:
-                    ackToDeviceList.append(item)
-
-            for item in deviceToGraphDiscLatNodeIter[node]:
-                if item >= 0.0:
-                    deviceToGraphDiscList.append(item)
-
-            endToEndAvg = round(numpy.mean(endToEndList), 2)
-            endToEndStdDev = round(numpy.std(endToEndList), 2)
-            main.log.info("endToEndList: " + str(endToEndList))
-
-            tcpToFeatureAvg = round(numpy.mean(tcpToFeatureList), 2)
-            tcpToFeatureStdDev = round(numpy.std(tcpToFeatureList), 2)
-            main.log.info("tcpToFeatureList: " + str(tcpToFeatureList))
-
-            featureToRoleAvg = round(numpy.mean(featureToRoleList), 2)
-            featureToRoleStdDev = round(numpy.std(featureToRoleList), 2)
-            main.log.info("featureToRoleList: " + str(featureToRoleList)) 
-
-            roleToOfpAvg = round(numpy.mean(roleToOfpList), 2)
-            roleToOfpStdDev = round(numpy.std(roleToOfpList), 2)
-            main.log.info("roleToOfList: " + str(roleToOfpList))
-
-            ofpToDeviceAvg = round(numpy.mean(ofpToDeviceList), 2)
-            ofpToDeviceStdDev = round(numpy.std(ofpToDeviceList), 2)
-            main.log.info("ofpToDeviceList: " + str(ofpToDeviceList))
-
-            deviceToGraphAvg = round(numpy.mean(deviceToGraphList), 2)
-            deviceToGraphStdDev = round(numpy.std(deviceToGraphList), 2)
-            main.log.info("deviceToGraphList: " + str(deviceToGraphList))
-
-            endToEndDiscAvg = round(numpy.mean(endToEndDiscList), 2)
-            endToEndDiscStdDev = round(numpy.std(endToEndDiscList), 2)
-            main.log.info("endToEndDiscList: " + str(endToEndDiscList))
-
-            finAckAvg = round(numpy.mean(finAckTransactionList), 2)
-            finAckStdDev = round(numpy.std(finAckTransactionList), 2)
-            main.log.info("finAckTransactionList: " + str(finAckTransactionList))
-
-            ackToDeviceAvg = round(numpy.mean(ackToDeviceList), 2)
-            ackToDeviceStdDev = round(numpy.std(ackToDeviceList), 2)
-            main.log.info("ackToDeviceList: " + str(ackToDeviceList))
-
-            deviceToGraphDiscAvg = round(numpy.mean(deviceToGraphDiscList), 2)
-            deviceToGraphDiscStdDev = round(numpy.std(deviceToGraphDiscList), 2)
-            main.log.info("deviceToGraphDiscList: " + str(deviceToGraphDiscList))
-
-            main.log.report(' - Node ' + str(node + 1) + ' Summary - ')
-            main.log.report(' - Switch Connection Statistics - ')
-
-            main.log.report(' End-to-end Avg: ' + str(endToEndAvg) +
-                    ' ms' + ' End-to-end Std dev: ' +
-                    str(endToEndStdDev) + ' ms')
-
-            main.log.report(' Tcp-to-feature-reply Avg: ' +
-                    str(tcpToFeatureAvg) + ' ms')
-            main.log.report(' Tcp-to-feature-reply Std dev: '+
-                    str(tcpToFeatureStdDev) + ' ms')
-
-            main.log.report(' Feature-reply-to-role-request Avg: ' +
-                    str(featureToRoleAvg) + ' ms')
-            main.log.report(' Feature-reply-to-role-request Std Dev: ' +
-                    str(featureToRoleStdDev) + ' ms')
-
-            main.log.report(' Role-request-to-role-reply Avg: ' +
-                    str(roleToOfpAvg) +' ms')
-            main.log.report(' Role-request-to-role-reply Std dev: ' +
-                    str(roleToOfpStdDev) + ' ms')
-
-            main.log.report(' Role-reply-to-device Avg: ' +
-                    str(ofpToDeviceAvg) +' ms')
-            main.log.report(' Role-reply-to-device Std dev: ' +
-                    str(ofpToDeviceStdDev) + ' ms')
-
-            main.log.report(' Device-to-graph Avg: ' +
-                    str(deviceToGraphAvg) + ' ms')
-            main.log.report( 'Device-to-graph Std dev: ' +
-                    str(deviceToGraphStdDev) + ' ms')
-
-            main.log.report(' - Switch Disconnection Statistics - ')
-            main.log.report(' End-to-end switch disconnect Avg: ' +
-                    str(endToEndDiscAvg) + ' ms')
-            main.log.report(' End-to-end switch disconnect Std dev: ' +
-                    str(endToEndDiscStdDev) + ' ms')
-            main.log.report(' Fin/Ack-to-Ack Avg: ' + str(finAckAvg) + ' ms')
-            main.log.report(' Fin/Ack-to-Ack Std dev: ' +
-                    str(finAckStdDev) + ' ms')
-
-            main.log.report(' Ack-to-device Avg: ' + str(ackToDeviceAvg) +
-                    ' ms')
-            main.log.report(' Ack-to-device Std dev: ' + str(ackToDeviceStdDev) +
-                    ' ms')
-
-            main.log.report(' Device-to-graph (disconnect) Avg: ' +
-                    str(deviceToGraphDiscAvg) + ' ms')
-            main.log.report(' Device-to-graph (disconnect) Std dev: ' +
-                    str(deviceToGraphDiscStdDev) + ' ms')
-
             # For database schema, refer to Amazon web services
             dbCmdList.append(
                     "INSERT INTO switch_latency_details VALUES('" +
                     timeToPost + "','switch_latency_results'," +
                     jenkinsBuildNumber + ',' + str(clusterCount) + ",'baremetal" +
                     str(node + 1) + "'," +
-                    str(endToEndAvg) + ',' +
-                    str(tcpToFeatureAvg) + ',' +
-                    str(featureToRoleAvg) + ',' +
-                    str(roleToOfpAvg) + ',' +
-                    str(ofpToDeviceAvg) + ',' +
-                    str(deviceToGraphAvg) + ',' +
-                    str(endToEndDiscAvg) + ',' +
-                    str(finAckAvg) + ',' +
-                    str(ackToDeviceAvg) + ',' +
-                    str(deviceToGraphDiscAvg) +
+                    ','.join(str(round(record['nodes'][node]['mean'], 2))
+                             for record in latencyRecords) +
                     ');')
 
         if debugMode == 'on':